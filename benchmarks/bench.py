@@ -0,0 +1,359 @@
+"""Benchmarks for the configuration, realmlist and launch paths.
+
+Run from the repository root:
+
+    python benchmarks/bench.py                          # 10, 1k, 100k and 1M configurations
+    python benchmarks/bench.py --sizes 10,1000 -o before.json
+    python benchmarks/bench.py --sizes 10,1000 -o after.json --compare before.json
+
+Everything runs in a temporary directory against synthetic data; the Listbox is replaced by a
+headless stand-in, so no display is needed. Results are printed (or written with -o) as JSON;
+each one is also shown on stderr as it comes in, unless -q is given.
+"""
+import argparse
+import json
+import os
+import platform
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import core  # noqa: E402
+import gui  # noqa: E402
+from listview import ConfigListView  # noqa: E402
+from metrics import metrics  # noqa: E402
+from store import ConfigStore  # noqa: E402
+
+DEFAULT_SIZES = (10, 1000, 100000, 1000000)
+VERSIONS = ("Vanilla (1.12.x)", "The Burning Crusade (2.4.3)", "Wrath of the Lich King (3.3.5)", "Cataclysm (4.3.4)")
+
+
+# Headless stand-in for tk.Listbox: keeps the rows in a list and runs `after` jobs when asked
+class HeadlessListbox:
+    def __init__(self):
+        self.items = []
+        self.selected = set()
+        self.jobs = []
+
+    def insert(self, index, *labels):
+        index = len(self.items) if index == 'end' else index
+        self.items[index:index] = labels
+
+    def delete(self, first, last=None):
+        if last == 'end':
+            del self.items[first:]
+            self.selected.clear()
+        else:
+            del self.items[first]
+            self.selected.discard(first)
+
+    def curselection(self):
+        return tuple(sorted(self.selected))
+
+    def selection_set(self, row):
+        self.selected.add(row)
+
+    def selection_clear(self, first, last=None):
+        self.selected.clear()
+
+    def selection_includes(self, row):
+        return row in self.selected
+
+    def see(self, row):
+        pass
+
+    def activate(self, row):
+        pass
+
+    def after(self, delay, callback, *args):
+        self.jobs.append((callback, args))
+        return len(self.jobs)
+
+    def after_cancel(self, job):
+        pass
+
+    def run_jobs(self):
+        while self.jobs:
+            callback, args = self.jobs.pop(0)
+            callback(*args)
+
+
+# Stand-in for the Entry/StringVar/BooleanVar/Label widgets of the form
+class HeadlessField:
+    def __init__(self, value=''):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+    def insert(self, index, text):
+        self.value = text
+
+    def delete(self, first, last=None):
+        self.value = ''
+
+    def config(self, **options):
+        pass
+
+
+def synthetic_configuration(i, directory):
+    return {
+        'name': f"Server {i:07d}",
+        'realmlist_path': os.path.join(directory, 'realmlist.wtf'),
+        'wow_exe_path': os.path.join(directory, 'WoW.exe'),
+        'server_address': f"logon{i % 997}.realm{i}.example.org",
+        'portal_address': '',
+        'version': VERSIONS[i % len(VERSIONS)],
+    }
+
+
+def synthetic_config(size, directory):
+    return {'configurations': [synthetic_configuration(i, directory) for i in range(size)]}
+
+
+@contextmanager
+def stopwatch(result):
+    started = time.perf_counter()
+    yield
+    result['seconds'] = time.perf_counter() - started
+
+
+def record(results, benchmark, size, iterations, seconds, **extra):
+    entry = {
+        'benchmark': benchmark,
+        'size': size,
+        'iterations': iterations,
+        'seconds': round(seconds, 6),
+        'per_op_ms': round(seconds * 1000.0 / iterations, 4) if iterations else None,
+        'ops_per_sec': round(iterations / seconds, 1) if seconds > 0 else None,
+    }
+    entry.update(extra)
+    results.append(entry)
+
+
+# One line of the progress table printed by the command line
+def format_entry(entry):
+    size = entry.get('size')
+    outcome = f"skipped: {entry['skipped']}" if 'skipped' in entry else f"{entry['per_op_ms']} ms/op"
+    return f"{entry['benchmark']:<28} n={size if size is not None else '-':<8} {outcome}"
+
+
+def bench_config_io(results, size, directory):
+    config = synthetic_config(size, directory)
+    core.CONFIG_FILE = os.path.join(directory, 'config.json')
+
+    timing = {}
+    with stopwatch(timing):
+        core.save_config(config)
+    file_bytes = os.path.getsize(core.CONFIG_FILE)
+    record(results, 'save_config', size, 1, timing['seconds'], bytes=file_bytes,
+           configs_per_sec=round(size / timing['seconds'], 1))
+
+    with stopwatch(timing):
+        loaded = core.load_config()
+    assert len(loaded['configurations']) == size
+    record(results, 'load_config', size, 1, timing['seconds'], bytes=file_bytes,
+           configs_per_sec=round(size / timing['seconds'], 1),
+           mb_per_sec=round(file_bytes / (1024 * 1024) / timing['seconds'], 1))
+
+    with stopwatch(timing):
+        store = ConfigStore(core.CONFIG_FILE).load()
+    record(results, 'open_config_store', size, 1, timing['seconds'])
+    return store
+
+
+# Duplicate detection and appends through the real add_configuration, half of them duplicates
+def bench_add_configuration(results, size, store, listbox, directory, iterations=200):
+    entry_fields = {key: HeadlessField() for key in ('name', 'realmlist', 'wow_exe', 'server_address', 'portal_address',
+                                                     'version', 'wine_prefix', 'wine_env', 'wine_persistent')}
+    label = HeadlessField()
+    timing = {}
+    with patch('gui.messagebox'), stopwatch(timing):
+        for i in range(iterations):
+            # Even iterations reuse an existing name and must be rejected
+            name = f"Server {(i * 7919) % size:07d}" if i % 2 == 0 else f"Added {i:07d}"
+            for key, value in (('name', name), ('realmlist', os.path.join(directory, 'realmlist.wtf')),
+                               ('wow_exe', os.path.join(directory, 'WoW.exe')),
+                               ('server_address', 'logon.example.org'), ('version', VERSIONS[0])):
+                entry_fields[key].set(value)
+            gui.add_configuration(store, entry_fields, label, label, listbox)
+    record(results, 'add_configuration', size, iterations, timing['seconds'], duplicates=iterations // 2)
+
+
+def bench_move_config(results, size, store, listbox, iterations=200):
+    listbox.listbox.selected = set()
+    listbox.selection_set(len(store) // 2)
+    timing = {}
+    with patch('gui.messagebox'), stopwatch(timing):
+        for i in range(iterations):
+            gui.move_config(store, listbox, 'up' if i % 2 == 0 else 'down')
+    record(results, 'move_config', size, iterations, timing['seconds'])
+
+    # A full rebuild, including the chunks normally inserted between Tk events
+    with stopwatch(timing):
+        gui.update_listbox(listbox, store)
+        listbox.listbox.run_jobs()
+    record(results, 'update_listbox', size, 1, timing['seconds'], rows=len(listbox.listbox.items))
+
+
+def bench_realmlist(results, directory, iterations=1000):
+    paths = [os.path.join(directory, f"realmlist-{i % 50}.wtf") for i in range(iterations)]
+    timing = {}
+    with stopwatch(timing):
+        for i, path in enumerate(paths):
+            core.update_realmlist(path, f"logon{i}.example.org", '', VERSIONS[i % len(VERSIONS)])
+    record(results, 'update_realmlist', None, iterations, timing['seconds'])
+
+    # Same content again: every write is skipped after a stat()
+    with stopwatch(timing):
+        for i in range(iterations):
+            core.update_realmlist(paths[i % 50], "logon.example.org", '', VERSIONS[0])
+    record(results, 'update_realmlist_unchanged', None, iterations, timing['seconds'])
+
+
+# Whole launch path (checks, realmlist write, spawn) against a stub executable, until the stub exits
+def bench_launch(results, directory, iterations=20):
+    if platform.system() not in ("Linux", "Windows"):
+        results.append({'benchmark': 'launch', 'skipped': f"unsupported OS {platform.system()}"})
+        return
+    bin_dir = os.path.join(directory, 'bin')
+    os.makedirs(bin_dir, exist_ok=True)
+    if platform.system() == "Linux":
+        # launch_configuration runs `wine WoW.exe`; a stub wine exits immediately
+        stub = os.path.join(bin_dir, 'wine')
+        with open(stub, 'w') as f:
+            f.write("#!/bin/sh\nexit 0\n")
+        os.chmod(stub, os.stat(stub).st_mode | stat.S_IXUSR)
+        exe = os.path.join(directory, 'WoW.exe')
+        with open(exe, 'wb') as f:
+            f.write(b'MZ')
+    else:
+        # Started through the shell like the real client
+        exe = os.path.join(directory, 'WoW.bat')
+        with open(exe, 'w') as f:
+            f.write("@exit 0\n")
+    cfg = synthetic_configuration(0, directory)
+    cfg['wow_exe_path'] = exe
+    open(cfg['realmlist_path'], 'w').close()
+
+    spawn_ms, total_ms = [], []
+    with patch.dict(os.environ, {'PATH': bin_dir + os.pathsep + os.environ.get('PATH', '')}):
+        for _ in range(iterations):
+            started = time.perf_counter()
+            process = core.launch_configuration(cfg)
+            spawn_ms.append((time.perf_counter() - started) * 1000.0)
+            process.wait()
+            total_ms.append((time.perf_counter() - started) * 1000.0)
+    record(results, 'launch', None, iterations, sum(total_ms) / 1000.0,
+           spawn_ms_mean=round(sum(spawn_ms) / iterations, 3), spawn_ms_max=round(max(spawn_ms), 3))
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# Runs every benchmark at each size; with `verbose`, results are printed to stderr as they come in
+def run(sizes, verbose=False):
+    results = []
+    printed = 0
+
+    def progress():
+        nonlocal printed
+        if verbose:
+            for entry in results[printed:]:
+                print(format_entry(entry), file=sys.stderr)
+        printed = len(results)
+
+    metrics.reset()
+    with tempfile.TemporaryDirectory() as directory, patch('core.CONFIG_FILE', core.CONFIG_FILE), \
+            patch('core.LOG_FILE', os.path.join(tempfile.gettempdir(), 'realmlist-bench.log')):
+        # Log like the app does, so its cost is part of the numbers
+        core.setup_logging()
+        for size in sizes:
+            size_dir = os.path.join(directory, str(size))
+            os.makedirs(size_dir)
+            store = bench_config_io(results, size, size_dir)
+            timing = {}
+            with stopwatch(timing):
+                listbox = ConfigListView(HeadlessListbox(), store)
+                listbox.listbox.run_jobs()
+            record(results, 'populate_listbox', size, 1, timing['seconds'])
+            progress()
+            bench_add_configuration(results, size, store, listbox, size_dir)
+            progress()
+            bench_move_config(results, size, store, listbox)
+            progress()
+            store.close()
+        bench_realmlist(results, directory)
+        progress()
+        bench_launch(results, directory)
+        progress()
+        core.stop_logging()
+    return {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+        'metrics': metrics.snapshot(),
+    }
+
+
+# Benchmarks whose per-op time grew by more than `threshold` (e.g. 0.2 = 20%) since `baseline`
+def regressions(baseline, report, threshold):
+    before = {(entry['benchmark'], entry.get('size')): entry for entry in baseline['results'] if 'per_op_ms' in entry}
+    found = []
+    for entry in report['results']:
+        old = before.get((entry['benchmark'], entry.get('size')))
+        if old is None or not old['per_op_ms'] or 'per_op_ms' not in entry:
+            continue
+        ratio = entry['per_op_ms'] / old['per_op_ms']
+        if ratio > 1.0 + threshold:
+            found.append({'benchmark': entry['benchmark'], 'size': entry.get('size'),
+                          'before_ms': old['per_op_ms'], 'after_ms': entry['per_op_ms'], 'ratio': round(ratio, 2)})
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the configuration, realmlist and launch paths")
+    parser.add_argument("--sizes", default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated numbers of configurations (default: %(default)s)")
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="report from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown counted as a regression with --compare (default: %(default)s)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="don't print each result to stderr as it comes in")
+    args = parser.parse_args(argv)
+
+    report = run([int(size) for size in args.sizes.split(',') if size], verbose=not args.quiet)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            report['regressions'] = regressions(json.load(f), report, args.threshold)
+        for entry in report['regressions']:
+            print(f"REGRESSION {entry['benchmark']} n={entry['size']}: {entry['before_ms']} -> {entry['after_ms']} ms/op",
+                  file=sys.stderr)
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,282 @@
+import argparse
+import logging
+import sys
+import time
+
+import core
+import fingerprint
+import history
+import wdb
+from metrics import metrics
+
+# Command-line interface. Nothing here imports tkinter, so launching from scripts or hotkeys
+# skips the GUI startup cost entirely. The importer, realm query and DNS modules (and asyncio with
+# them) are imported by the commands that use them, so `run` doesn't load them either.
+
+IMPORT_FORMATS = ('csv', 'jsonl', 'json')
+
+
+def find_configuration(store, name):
+    cfg = store.find(name)
+    if cfg is None:
+        core.report_error("Unknown Configuration", f"No configuration named '{name}'.")
+    return cfg
+
+
+def cmd_list(args, store):
+    for cfg in store['configurations']:
+        print(f"{cfg['name']}\t{cfg.get('server_address', '')}\t{cfg.get('version', '')}")
+    return 0
+
+
+def cmd_write_realmlist(args, store):
+    status = 0
+    selected = []
+    for name in args.names:
+        cfg = find_configuration(store, name)
+        if cfg is None:
+            status = 1
+        else:
+            selected.append(cfg)
+    if args.all:
+        selected.extend(store['configurations'])
+    if args.server:
+        pattern = args.server.lower()
+        selected.extend(cfg for cfg in store['configurations'] if pattern in cfg.get('server_address', '').lower())
+    if not selected:
+        return status
+
+    # Many files are written in parallel; unchanged files are left alone
+    for result in core.update_realmlists(selected, max_workers=args.jobs):
+        if result.error:
+            state = f"failed: {result.error}"
+            status = 1
+        else:
+            state = "written" if result.changed else "unchanged"
+        print(f"{result.path}\t{state}\t{result.elapsed_ms:.1f} ms")
+    return status
+
+
+def cmd_check_versions(args, store):
+    configurations = store['configurations']
+    builds = fingerprint.detect_builds(configurations, cache=args.fingerprint_cache)
+    args.fingerprint_cache.save()
+    mismatches = fingerprint.version_mismatches(configurations, builds)
+    for cfg, build in mismatches:
+        print(f"{cfg['name']}\tconfigured: {cfg.get('version', '')}\tclient: {build.version} (build {build})")
+    return 1 if mismatches else 0
+
+
+def cmd_import(args, store):
+    import importer
+
+    def progress(rows, fraction):
+        print(f"\r{rows} row(s), {fraction:.0%}", end='', file=sys.stderr, flush=True)
+
+    configurations = store['configurations']
+    try:
+        result = importer.read_import(args.path, configurations, args.format,
+                                      progress=progress if sys.stderr.isatty() else None,
+                                      default_paths=importer.paths_by_version(configurations))
+    except (OSError, ValueError) as e:
+        core.report_error("Import Failed", f"Could not import '{args.path}': {e}")
+        return 1
+    if sys.stderr.isatty():
+        print(file=sys.stderr)
+    store.extend(result.configurations)
+    print(result.describe())
+    return 0
+
+
+def cmd_realms(args, store):
+    import realms
+
+    configurations = store['configurations']
+    if args.names:
+        configurations = [cfg for cfg in (find_configuration(store, name) for name in args.names) if cfg is not None]
+    results = realms.query_configurations(configurations, timeout=args.timeout or realms.DEFAULT_TIMEOUT)
+    status = 0
+    for name, result in results.items():
+        latency = f"{result.latency_ms:.0f} ms" if result.latency_ms is not None else "-"
+        print(f"{name}\t{realms.format_realm_result(result)}\t{latency}")
+        for realm in result.realms:
+            print(f"\t{realm.name}\t{realm.address}\t{realm.type}\t{realm.population_label}")
+        if not result.reachable:
+            status = 1
+    return status
+
+
+def cmd_resolve(args, store):
+    import resolver
+
+    configurations = store['configurations']
+    if args.names:
+        configurations = [cfg for cfg in (find_configuration(store, name) for name in args.names) if cfg is not None]
+    results = resolver.resolve_configurations(configurations, timeout=args.timeout or resolver.DEFAULT_TIMEOUT)
+    status = 0
+    for name, result in results.items():
+        if result.ok:
+            print(f"{name}\t{result.host}\t{', '.join(result.addresses)}\t{result.latency_ms:.0f} ms\t"
+                  f"ttl {result.ttl:.0f}s")
+        else:
+            print(f"{name}\t{result.host}\tfailed: {result.error}")
+            status = 1
+    return status
+
+
+def cmd_purge_cache(args, store):
+    status = 0
+    for name in args.names:
+        cfg = find_configuration(store, name)
+        if cfg is None:
+            status = 1
+            continue
+        try:
+            trash = wdb.discard_cache(cfg)
+        except OSError as e:
+            core.report_error("Error", f"Could not purge the cache of '{name}': {e}")
+            status = 1
+            continue
+        if not trash:
+            print(f"{name}\tno cache")
+            continue
+        result = wdb.remove_trees(trash)
+        print(f"{name}\t{result.describe()}")
+        if result.error:
+            status = 1
+    return status
+
+
+def cmd_run(args, store):
+    cfg = find_configuration(store, args.name)
+    if cfg is None:
+        return 1
+
+    launch_history = history.open_launch_history()
+    started = time.time()
+    try:
+        process = core.launch_configuration(cfg)
+    except core.LaunchError as e:
+        record_history(launch_history, history.LaunchHistory.record_launch, cfg, started, error=str(e),
+                       ended=time.time())
+        if launch_history is not None:
+            launch_history.close()
+        core.report_error("Error", str(e))
+        return 1
+
+    elapsed_ms = (time.perf_counter() - args.started) * 1000.0
+    launch_id = record_history(launch_history, history.LaunchHistory.record_launch, cfg, started, elapsed_ms,
+                               process.pid)
+    logging.info(f"Time to launch '{cfg['name']}' from the command line: {elapsed_ms:.1f} ms")
+    if args.timing:
+        print(f"time-to-launch: {elapsed_ms:.1f} ms", file=sys.stderr)
+    status = 0
+    if args.wait:
+        status = process.wait()
+        if launch_id is not None:
+            record_history(launch_history, history.LaunchHistory.record_exit, launch_id, time.time(), status)
+    if launch_history is not None:
+        launch_history.close()
+    return status
+
+
+# History is best effort: a database that can't be opened or written never fails a launch
+def record_history(launch_history, record, *args, **kwargs):
+    if launch_history is None:
+        return None
+    try:
+        return record(launch_history, *args, **kwargs)
+    except Exception as e:
+        logging.warning(f"Could not record the launch in the history: {e}")
+        return None
+
+
+def cmd_history(args, store):
+    launch_history = history.open_launch_history()
+    if launch_history is None:
+        core.report_error("Launch History", "The launch history could not be opened; see app.log.")
+        return 1
+    since = time.time() - args.days * 24 * 3600 if args.days else 0.0
+    try:
+        if args.slowest:
+            for launch in launch_history.slowest_launches(since if args.days else None, args.limit):
+                when = time.strftime('%Y-%m-%d %H:%M', time.localtime(launch.started))
+                print(f"{launch.time_to_start_ms:.0f} ms\t{when}\t{launch.name}\t{launch.server}")
+        else:
+            for row in launch_history.sessions_by_server(since):
+                print(f"{row.server}\t{row.sessions} session(s)\taverage {history.format_duration(row.average_seconds)}"
+                      f"\ttotal {history.format_duration(row.total_seconds)}")
+    finally:
+        launch_history.close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Realmlist Manager (run without arguments for the GUI)")
+    parser.add_argument("--config", help=f"path to the configuration file (default: {core.CONFIG_FILE})")
+    parser.add_argument("--metrics", metavar="PATH", help="write timings of this run to PATH as JSON")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="list saved configurations")
+    list_parser.set_defaults(func=cmd_list)
+
+    run_parser = subparsers.add_parser("run", help="write realmlist.wtf and launch WoW for a configuration")
+    run_parser.add_argument("name")
+    run_parser.add_argument("--wait", action="store_true", help="wait for the client to exit")
+    run_parser.add_argument("--timing", action="store_true", help="print time-to-launch to stderr")
+    run_parser.set_defaults(func=cmd_run)
+
+    write_parser = subparsers.add_parser("write-realmlist", help="only write realmlist.wtf for configurations")
+    write_parser.add_argument("names", nargs="*", metavar="name")
+    write_parser.add_argument("--all", action="store_true", help="every saved configuration")
+    write_parser.add_argument("--server", help="every configuration whose server address contains this text")
+    write_parser.add_argument("--jobs", type=int, default=core.DEFAULT_REALMLIST_WORKERS,
+                              help="files written in parallel")
+    write_parser.set_defaults(func=cmd_write_realmlist)
+
+    check_parser = subparsers.add_parser("check-versions",
+                                         help="compare each configuration's version with its WoW.exe")
+    check_parser.set_defaults(func=cmd_check_versions)
+
+    import_parser = subparsers.add_parser("import", help="add servers from a CSV, JSON lines or config.json file")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=IMPORT_FORMATS, help="file format (default: from the extension)")
+    import_parser.set_defaults(func=cmd_import)
+
+    realms_parser = subparsers.add_parser("realms", help="query auth servers for their realm lists")
+    realms_parser.add_argument("names", nargs="*", metavar="name", help="configurations to query (default: all)")
+    realms_parser.add_argument("--timeout", type=float, help="seconds per server (default: 3)")
+    realms_parser.set_defaults(func=cmd_realms)
+
+    resolve_parser = subparsers.add_parser("resolve", help="look up server hostnames (lookup time, addresses, TTL)")
+    resolve_parser.add_argument("names", nargs="*", metavar="name", help="configurations to resolve (default: all)")
+    resolve_parser.add_argument("--timeout", type=float, help="seconds per host (default: 3)")
+    resolve_parser.set_defaults(func=cmd_resolve)
+
+    purge_parser = subparsers.add_parser("purge-cache", help="delete the WDB cache of configurations' clients")
+    purge_parser.add_argument("names", nargs="+", metavar="name")
+    purge_parser.set_defaults(func=cmd_purge_cache)
+
+    history_parser = subparsers.add_parser("history", help="session length per server, or the slowest launches")
+    history_parser.add_argument("--slowest", action="store_true",
+                                help="slowest click-to-process-start times (default: this week)")
+    history_parser.add_argument("--days", type=float, help="only launches from the last DAYS days")
+    history_parser.add_argument("--limit", type=int, default=10, help="launches listed with --slowest")
+    history_parser.set_defaults(func=cmd_history)
+    return parser
+
+
+def main(argv, started=None):
+    args = build_parser().parse_args(argv)
+    args.started = started if started is not None else time.perf_counter()
+    if args.config:
+        core.CONFIG_FILE = args.config
+    core.setup_logging()
+    args.fingerprint_cache = fingerprint.default_cache = fingerprint.FingerprintCache.load()
+
+    # Commands write at most once, so no background writer is needed
+    store = core.open_config_store(background=False)
+    status = args.func(args, store)
+    if args.metrics:
+        metrics.export(args.metrics)
+    return status
@@ -0,0 +1,392 @@
+import atexit
+import gzip
+import hashlib
+import os
+import queue
+import shutil
+import subprocess
+import platform
+import logging
+import logging.handlers
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import fingerprint
+import wdb
+import wine
+from metrics import metrics, timed
+from store import ConfigStore, ConfigWriter, atomic_write, read_snapshot, write_snapshot
+
+CONFIG_FILE = 'config.json'
+LOG_FILE = 'app.log'
+# app.log is rotated at this size; older logs are kept gzip-compressed as app.log.1.gz ... app.log.N.gz
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+# Threads used when writing many realmlist.wtf files at once (I/O bound, often on network shares)
+DEFAULT_REALMLIST_WORKERS = 8
+
+# Moves stale client caches aside while realmlist.wtf is being written
+cache_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="wdb-switch")
+
+# Where user-facing errors are reported; the GUI swaps in a message box
+error_handler = None
+
+# Called as handler(cfg, wdb.PurgeResult) from the purge thread once a stale client cache is deleted
+cache_purge_handler = None
+
+# Writes queued log records to LOG_FILE on its own thread; started by setup_logging()
+log_listener = None
+
+
+def _gzip_rotator(source, destination):
+    with open(source, 'rb') as f_in, gzip.open(destination, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+# app.log, rotated by size with the old files compressed. Rotation runs on the logging thread.
+def rotating_log_handler(path=None, max_bytes=None, backup_count=None):
+    handler = logging.handlers.RotatingFileHandler(path or LOG_FILE, maxBytes=max_bytes or LOG_MAX_BYTES,
+                                                   backupCount=backup_count or LOG_BACKUP_COUNT)
+    handler.namer = lambda name: name + '.gz'
+    handler.rotator = _gzip_rotator
+    return handler
+
+
+# Setup logging. Callers only put records on a queue; a QueueListener thread does the file I/O,
+# so logging never blocks the Tk thread or a launch.
+def setup_logging():
+    global log_listener
+    if log_listener is not None:
+        return
+    file_handler = rotating_log_handler()
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    log_queue = queue.SimpleQueue()
+    log_listener = logging.handlers.QueueListener(log_queue, file_handler)
+    log_listener.queue_handler = logging.handlers.QueueHandler(log_queue)
+    root = logging.getLogger()
+    log_listener.previous_level = root.level
+    root.addHandler(log_listener.queue_handler)
+    root.setLevel(logging.INFO)
+    log_listener.start()
+    atexit.register(stop_logging)
+
+
+# Write out everything still queued and close the log file
+def stop_logging():
+    global log_listener
+    if log_listener is None:
+        return
+    logging.getLogger().removeHandler(log_listener.queue_handler)
+    logging.getLogger().setLevel(log_listener.previous_level)
+    log_listener.stop()
+    for handler in log_listener.handlers:
+        handler.close()
+    log_listener = None
+
+
+def set_error_handler(handler):
+    global error_handler
+    error_handler = handler
+
+
+def set_cache_purge_handler(handler):
+    global cache_purge_handler
+    cache_purge_handler = handler
+
+
+def report_cache_purge(cfg, result):
+    if cache_purge_handler is not None:
+        cache_purge_handler(cfg, result)
+
+
+def report_error(title, message):
+    if error_handler is not None:
+        error_handler(title, message)
+    else:
+        print(f"{title}: {message}", file=sys.stderr)
+
+
+# Load or save configuration for server addresses and file paths
+@timed('config.load')
+def load_config():
+    return read_snapshot(CONFIG_FILE)
+
+
+@timed('config.save')
+def save_config(config):
+    if isinstance(config, ConfigStore):
+        config.compact()
+        return
+    write_snapshot(CONFIG_FILE, config)
+    logging.info(f"Configurations saved to '{CONFIG_FILE}'.")
+
+
+# Open the journaled configuration store (imports an existing config.json as-is).
+# With `background=True` writes are coalesced and performed atomically by a background writer.
+def open_config_store(background=True):
+    with metrics.timer('config.load'):
+        return ConfigStore(CONFIG_FILE, writer=ConfigWriter() if background else None).load()
+
+
+# Flush everything still queued for config.json before exiting
+def close_config_store(config):
+    config.close()
+    if config.writer is not None:
+        config.writer.stop()
+        logging.info(f"Config writer: {config.writer.requests} write request(s), "
+                     f"{config.writer.coalesced} coalesced.")
+
+
+# Contents of realmlist.wtf for a server
+def render_realmlist(server_address, portal_address, version):
+    # Write realmlist and portal
+    lines = [f"set realmlist {server_address}\n", f"set portal {portal_address}\n"]
+    # If the version is Cataclysm, add patchlist
+    if version == "Cataclysm (4.3.4)":
+        lines.append(f"set patchlist {server_address}\n")
+    return ''.join(lines)
+
+
+# Read the `set <key> <value>` lines of an existing realmlist.wtf into a dict (empty if unreadable)
+def read_realmlist(realmlist_path):
+    settings = {}
+    try:
+        with open(realmlist_path, 'r', errors='replace') as f:
+            for line in f:
+                parts = line.strip().split(None, 2)
+                if len(parts) == 3 and parts[0].lower() == 'set':
+                    settings[parts[1].lower()] = parts[2].strip().strip('"')
+    except OSError:
+        pass
+    return settings
+
+
+# Digest of each realmlist.wtf we've seen, keyed by path and validated by (size, mtime).
+# Lets an unchanged file be skipped with one stat() instead of a read, which matters on network shares.
+_realmlist_digests = {}
+_realmlist_digests_lock = threading.Lock()
+
+
+def _file_digest(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _realmlist_digests_lock:
+        cached = _realmlist_digests.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    with _realmlist_digests_lock:
+        _realmlist_digests[path] = (key, digest)
+    return digest
+
+
+def _remember_digest(path, digest):
+    stat = os.stat(path)
+    with _realmlist_digests_lock:
+        _realmlist_digests[path] = ((stat.st_size, stat.st_mtime_ns), digest)
+
+
+@dataclass
+class RealmlistResult:
+    path: str
+    changed: bool
+    elapsed_ms: float
+    error: Optional[str] = None
+
+
+# Write realmlist.wtf only if its content differs, replacing the file atomically. Raises on failure.
+def write_realmlist(realmlist_path, server_address, portal_address, version):
+    started = time.perf_counter()
+    content = render_realmlist(server_address, portal_address, version)
+    digest = hashlib.sha256(content.encode()).hexdigest()
+    if _file_digest(realmlist_path) == digest:
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        metrics.observe('realmlist.unchanged', elapsed_ms)
+        return RealmlistResult(realmlist_path, False, elapsed_ms)
+    atomic_write(realmlist_path, content.encode(), mode='wb')
+    _remember_digest(realmlist_path, digest)
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    metrics.observe('realmlist.write', elapsed_ms)
+    return RealmlistResult(realmlist_path, True, elapsed_ms)
+
+
+# Update realmlist.wtf with selected server address
+@timed('realmlist.update')
+def update_realmlist(realmlist_path, server_address, portal_address, version):
+    try:
+        result = write_realmlist(realmlist_path, server_address, portal_address, version)
+        if not result.changed:
+            logging.info(f"realmlist.wtf at {realmlist_path} already points to {server_address}; not rewritten.")
+            return True
+
+        logging.info(f"Updated realmlist.wtf at {realmlist_path} with server address: {server_address}")
+        logging.info(f"Updated realmlist.wtf at {realmlist_path} with portal address: {portal_address}")
+
+        if version == "Cataclysm (4.3.4)":
+            logging.info(f"Added patchlist for Cataclysm: {server_address}")
+        return True
+
+    except Exception as e:
+        logging.error(f"Failed to update realmlist.wtf: {e}")
+        report_error("Error", f"Failed to update realmlist.wtf: {e}")
+        return False
+
+
+# Update realmlist.wtf for many configurations at once on a thread pool.
+# Returns one RealmlistResult per distinct file, in input order; failures are recorded, not raised.
+def update_realmlists(configurations, max_workers=DEFAULT_REALMLIST_WORKERS):
+    jobs = {}
+    for cfg in configurations:
+        path = cfg['realmlist_path']
+        if path in jobs and jobs[path]['server_address'] != cfg['server_address']:
+            logging.warning(f"Several configurations write {path}; using '{cfg['name']}'.")
+        jobs[path] = cfg
+
+    def write(cfg):
+        started = time.perf_counter()
+        try:
+            return write_realmlist(cfg['realmlist_path'], *realmlist_addresses(cfg), effective_version(cfg))
+        except Exception as e:
+            return RealmlistResult(cfg['realmlist_path'], False, (time.perf_counter() - started) * 1000.0, str(e))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as executor:
+        results = list(executor.map(write, jobs.values()))
+
+    for result in results:
+        if result.error:
+            logging.error(f"Failed to update realmlist.wtf at {result.path}: {result.error}")
+    changed = sum(1 for result in results if result.changed)
+    logging.info(f"Batch realmlist update: {changed} written, {len(results) - changed} unchanged or failed, "
+                 f"{(time.perf_counter() - started) * 1000.0:.1f} ms total.")
+    return results
+
+
+# Server and portal address to write into realmlist.wtf. With "pin_ip" set, hostnames are replaced by
+# their resolved IPs (from resolver.default_cache while the record's TTL lasts) so the client skips the
+# lookup; config.json keeps the hostname. A failed lookup falls back to the hostname.
+def realmlist_addresses(cfg):
+    server_address, portal_address = cfg['server_address'], cfg.get('portal_address', '')
+    if cfg.get('pin_ip'):
+        import resolver  # Only pinned launches pay for asyncio and the DNS client
+        with metrics.timer('launch.resolve'):
+            server_address = resolver.pin_address(server_address, cache=resolver.default_cache)
+            portal_address = resolver.pin_address(portal_address, cache=resolver.default_cache)
+    return server_address, portal_address
+
+
+# Version to write realmlist.wtf for: the one detected from WoW.exe when it is known, otherwise the
+# configured one. A mismatch is logged, since it usually means the wrong version was picked.
+def effective_version(cfg):
+    configured = cfg.get('version', '')
+    if not cfg.get('wow_exe_path'):
+        return configured
+    build = fingerprint.detect_build(cfg['wow_exe_path'])
+    if build is None or build.version is None or build.version == configured:
+        return configured
+    logging.warning(f"'{cfg['name']}' is set to {configured or 'no version'} but {cfg['wow_exe_path']} "
+                    f"is build {build}; writing realmlist.wtf for {build.version}.")
+    return build.version
+
+
+class LaunchError(Exception):
+    pass
+
+
+# Start WoW.exe and return the process; raises if it cannot be started.
+# `env` is only used on Linux, where it carries WINEPREFIX and any per-configuration overrides.
+@timed('launch.spawn')
+def spawn_wow(wow_exe_path, env=None):
+    if platform.system() == "Windows":
+        process = subprocess.Popen(wow_exe_path, shell=True)
+    elif platform.system() == "Linux":
+        process = subprocess.Popen(['wine', wow_exe_path], env=env)
+    else:
+        logging.error(f"Unsupported OS: {platform.system()}")
+        raise LaunchError("This operating system is not supported.")
+    logging.info(f"WoW.exe run from: {wow_exe_path}")
+    return process
+
+
+# Start WoW.exe and return the process (None if it could not be started).
+# The client is not waited for, so callers return as soon as the process exists.
+def run_wow(wow_exe_path):
+    try:
+        return spawn_wow(wow_exe_path)
+    except LaunchError as e:
+        report_error("Unsupported OS", str(e))
+        return None
+    except Exception as e:
+        logging.error(f"Failed to run WoW.exe: {e}")
+        report_error("Error", f"Failed to run WoW.exe: {e}")
+        return None
+
+
+# Rename a stale WDB cache out of the way before launch (see wdb.switch_cache). A failure, e.g. a
+# cache still open by a running client on Windows, is logged and never blocks the launch.
+@timed('launch.cache_switch')
+def switch_client_cache(cfg, previous=None):
+    try:
+        return wdb.switch_cache(cfg, previous)
+    except OSError as e:
+        logging.warning(f"Could not switch the WDB cache of '{cfg['name']}': {e}")
+        return []
+
+
+# Everything "Run WoW" does for one configuration: check paths, write realmlist.wtf, start the client.
+# Raises LaunchError with a user-facing message on failure.
+def launch_configuration(cfg):
+    with metrics.timer('launch.path_checks'):
+        # Ensure realmlist.wtf file exists
+        realmlist_exists = os.path.exists(cfg['realmlist_path'])
+        # Ensure WoW.exe file exists
+        wow_exe_exists = realmlist_exists and os.path.exists(cfg['wow_exe_path'])
+    if not realmlist_exists:
+        logging.error(f"realmlist.wtf path not found: {cfg['realmlist_path']}")
+        raise LaunchError("realmlist.wtf path is invalid or not selected.")
+    if not wow_exe_exists:
+        logging.error(f"WoW.exe path not found: {cfg['wow_exe_path']}")
+        raise LaunchError("WoW.exe path is invalid or not selected.")
+
+    # If the client last ran against another server, move its WDB cache aside while realmlist.wtf
+    # is written; realmlist.wtf still names the previous server when no marker has been recorded yet
+    previous = read_realmlist(cfg['realmlist_path']).get('realmlist')
+    cache_switch = cache_executor.submit(switch_client_cache, cfg, previous)
+
+    # Update realmlist.wtf with server address
+    try:
+        with metrics.timer('launch.detect_version'):
+            version = effective_version(cfg)
+        write_realmlist(cfg['realmlist_path'], *realmlist_addresses(cfg), version)
+    except OSError as e:
+        logging.error(f"Failed to update realmlist.wtf: {e}")
+        raise LaunchError(f"Failed to update realmlist.wtf: {e}") from e
+    finally:
+        trash = cache_switch.result()
+    # The moved-aside cache is deleted while the client starts
+    if trash:
+        wdb.purge_in_background(trash, lambda result: report_cache_purge(cfg, result))
+
+    # Wine settings: per-configuration prefix/environment, and an optional warm wineserver
+    env = None
+    if platform.system() == "Linux" and (cfg.get('wine_prefix') or cfg.get('wine_env') or cfg.get('wine_persistent')):
+        env = wine.wine_environment(cfg)
+        if cfg.get('wine_persistent'):
+            with metrics.timer('launch.wine_session'):
+                wine.sessions.ensure(cfg)
+
+    # Run WoW.exe
+    try:
+        return spawn_wow(cfg['wow_exe_path'], env)
+    except OSError as e:
+        logging.error(f"Failed to run WoW.exe: {e}")
+        raise LaunchError(f"Failed to run WoW.exe: {e}") from e
@@ -0,0 +1,205 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from store import atomic_write
+
+FINGERPRINT_CACHE_FILE = 'fingerprint_cache.json'
+DEFAULT_DETECT_WORKERS = 8
+
+RT_VERSION = 16
+FIXED_FILE_INFO_SIGNATURE = b'\xbd\x04\xef\xfe'  # 0xFEEF04BD, little-endian
+
+# Version dropdown entry for each client major version
+VERSION_BY_MAJOR = {
+    1: "Vanilla (1.12.x)",
+    2: "The Burning Crusade (2.4.3)",
+    3: "Wrath of the Lich King (3.3.5)",
+    4: "Cataclysm (4.3.4)",
+}
+
+
+@dataclass
+class ClientBuild:
+    major: int
+    minor: int
+    patch: int
+    build: int
+
+    def __str__(self):
+        return f"{self.major}.{self.minor}.{self.patch} ({self.build})"
+
+    # The version option this build belongs to, or None for clients we don't know
+    @property
+    def version(self):
+        return VERSION_BY_MAJOR.get(self.major)
+
+
+class PEFormatError(ValueError):
+    pass
+
+
+def _u16(data, offset):
+    return struct.unpack_from('<H', data, offset)[0]
+
+
+def _u32(data, offset):
+    return struct.unpack_from('<I', data, offset)[0]
+
+
+def _rva_to_offset(sections, rva):
+    for virtual_address, virtual_size, raw_offset, raw_size in sections:
+        if virtual_address <= rva < virtual_address + max(virtual_size, raw_size):
+            return raw_offset + (rva - virtual_address)
+    raise PEFormatError(f"RVA {rva:#x} is outside every section")
+
+
+# File offset and size of the first RT_VERSION resource, following the PE headers
+def _version_resource(data):
+    if data[:2] != b'MZ':
+        raise PEFormatError("not an MZ executable")
+    pe_offset = _u32(data, 0x3C)
+    if data[pe_offset:pe_offset + 4] != b'PE\0\0':
+        raise PEFormatError("missing PE signature")
+    coff = pe_offset + 4
+    section_count = _u16(data, coff + 2)
+    optional_size = _u16(data, coff + 16)
+    optional = coff + 20
+    magic = _u16(data, optional)
+    if magic == 0x10b:
+        directories = optional + 96
+    elif magic == 0x20b:
+        directories = optional + 112
+    else:
+        raise PEFormatError(f"unknown optional header magic {magic:#x}")
+    resource_rva = _u32(data, directories + 2 * 8)
+    if not resource_rva:
+        raise PEFormatError("no resource directory")
+
+    sections = []
+    section_table = optional + optional_size
+    for i in range(section_count):
+        entry = section_table + i * 40
+        virtual_size, virtual_address, raw_size, raw_offset = struct.unpack_from('<IIII', data, entry + 8)
+        sections.append((virtual_address, virtual_size, raw_offset, raw_size))
+    resources = _rva_to_offset(sections, resource_rva)
+
+    # Three levels: type -> name -> language. Take RT_VERSION, then the first entry below it.
+    offset = resources
+    for level in range(3):
+        named, numbered = _u16(data, offset + 12), _u16(data, offset + 14)
+        entries = offset + 16
+        chosen = None
+        for i in range(named + numbered):
+            name, target = struct.unpack_from('<II', data, entries + i * 8)
+            if level > 0 or (not name & 0x80000000 and name == RT_VERSION):
+                chosen = target
+                break
+        if chosen is None:
+            raise PEFormatError("no version resource")
+        if level < 2:
+            if not chosen & 0x80000000:
+                raise PEFormatError("malformed resource directory")
+            offset = resources + (chosen & 0x7FFFFFFF)
+        else:
+            data_rva, size = struct.unpack_from('<II', data, resources + chosen)
+            return _rva_to_offset(sections, data_rva), size
+    raise PEFormatError("no version resource")
+
+
+# Read the FileVersion of a PE executable. The file is memory-mapped and only the headers and the
+# version resource are touched, so this costs a few page reads even for a multi-megabyte client.
+def read_client_build(path):
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                start, size = _version_resource(data)
+                position = data.find(FIXED_FILE_INFO_SIGNATURE, start, start + size)
+            except (PEFormatError, struct.error) as e:
+                logging.warning(f"Falling back to a signature search in {path}: {e}")
+                position = data.find(FIXED_FILE_INFO_SIGNATURE)
+            if position < 0:
+                raise PEFormatError(f"no version information in {path}")
+            # Signature, struct version, then the two FileVersion words
+            if position + 16 > len(data):
+                raise PEFormatError(f"truncated version information in {path}")
+            version_ms, version_ls = struct.unpack_from('<II', data, position + 8)
+    return ClientBuild(version_ms >> 16, version_ms & 0xFFFF, version_ls >> 16, version_ls & 0xFFFF)
+
+
+# Detected builds keyed by (path, size, mtime), so re-checking unchanged executables costs one stat()
+class FingerprintCache:
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def detect(self, path):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+        build = read_client_build(path)
+        with self._lock:
+            self._entries[key] = build
+        return build
+
+    def __len__(self):
+        return len(self._entries)
+
+    @classmethod
+    def load(cls, path=FINGERPRINT_CACHE_FILE):
+        cache = cls()
+        try:
+            with open(path, 'r') as f:
+                for exe_path, size, mtime_ns, build in json.load(f):
+                    cache._entries[(exe_path, size, mtime_ns)] = ClientBuild(*build)
+        except FileNotFoundError:
+            pass
+        except (ValueError, TypeError) as e:
+            logging.warning(f"Ignoring unreadable fingerprint cache '{path}': {e}")
+        return cache
+
+    def save(self, path=FINGERPRINT_CACHE_FILE):
+        with self._lock:
+            data = [[exe_path, size, mtime_ns, [b.major, b.minor, b.patch, b.build]]
+                    for (exe_path, size, mtime_ns), b in self._entries.items()]
+        atomic_write(path, json.dumps(data))
+
+
+default_cache = FingerprintCache()
+
+
+# Detected build for one executable (None if it can't be read or has no version information)
+def detect_build(wow_exe_path, cache=None):
+    try:
+        return (cache if cache is not None else default_cache).detect(wow_exe_path)
+    except (OSError, ValueError, struct.error) as e:
+        logging.warning(f"Could not detect the client build of {wow_exe_path}: {e}")
+        return None
+
+
+# Detect the build of every configuration's client in parallel: {name: ClientBuild or None}
+def detect_builds(configurations, cache=None, max_workers=DEFAULT_DETECT_WORKERS):
+    cache = cache if cache is not None else default_cache
+    paths = sorted({cfg['wow_exe_path'] for cfg in configurations if cfg.get('wow_exe_path')})
+    if not paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(paths)))) as executor:
+        builds = dict(zip(paths, executor.map(lambda path: detect_build(path, cache), paths)))
+    return {cfg['name']: builds.get(cfg.get('wow_exe_path')) for cfg in configurations}
+
+
+# Configurations whose chosen version disagrees with their client: [(cfg, ClientBuild)]
+def version_mismatches(configurations, builds):
+    mismatches = []
+    for cfg in configurations:
+        build = builds.get(cfg['name'])
+        if build is not None and build.version and build.version != cfg.get('version'):
+            mismatches.append((cfg, build))
+    return mismatches
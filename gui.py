@@ -0,0 +1,865 @@
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+import os
+import logging
+import platform
+import queue
+import threading
+import time
+
+from core import open_config_store, close_config_store, set_cache_purge_handler, set_error_handler, setup_logging
+from probe import ProbeCache, probe_configurations, sort_by_latency, format_probe_result
+from realms import query_configurations, format_realm_result
+from listview import ConfigListView
+from supervisor import ClientSupervisor
+from history import open_launch_history
+from scanner import ScanCache, scan_installations, propose_configurations
+from importer import ImportCancelled, paths_by_version, read_import
+from watcher import FileWatcher
+from tasks import LoopMonitor, TaskRunner
+import fingerprint
+import realms
+import resolver
+import wine
+from metrics import metrics
+
+# Runs everything that touches the disk or network off the Tk thread; created in main()
+tasks = None
+
+# Latest server probe results, keyed by configuration name
+probe_cache = ProbeCache()
+probe_results = {}
+
+# Realm lists (population and status) fetched from the auth servers, kept for a few minutes
+realm_cache = ProbeCache(ttl=realms.DEFAULT_TTL)
+
+# Extra text shown next to each configuration in the Listbox: {name: {source: text}}
+listbox_annotations = {}
+
+# Pending search filter job (debounces typing in the search box)
+filter_job = None
+
+# Tracks every client launched from the GUI; created in main()
+client_supervisor = None
+
+# Watches config.json for changes made by other instances or the CLI; created in main()
+config_watcher = None
+
+# Directory listings from previous installation scans, keyed by mtime; loaded by the first scan
+scan_cache = None
+
+
+# Browse for files. When a WoW.exe is picked and `version_var` is given, the version is set from the client.
+def browse_file(var, label, file_type="file", version_var=None):
+    if file_type == "realmlist":
+        file_path = filedialog.askopenfilename(title="Select realmlist.wtf", filetypes=[("Text Files", "*.wtf"),
+                                                                                        ("All Files", "*.*")])
+    else:
+        file_path = filedialog.askopenfilename(title="Select WoW.exe", filetypes=[("Executable Files", "*.exe"),
+                                                                                  ("All Files", "*.*")])
+    if file_path:
+        var.delete(0, tk.END)
+        var.insert(0, file_path)
+        label.config(text=os.path.basename(file_path))
+        if version_var is not None:
+            def set_version(build):
+                if build is not None and build.version:
+                    version_var.set(build.version)
+
+            tasks.submit("Reading client version", fingerprint.detect_build, file_path, on_success=set_version)
+
+
+# Function to run selected WoW (several selected configurations are launched together)
+def run_selected_wow(config, listbox):
+    clicked = time.perf_counter()
+    selected = listbox.curselection()
+    if not selected:
+        messagebox.showwarning("No Configuration Selected", "Please select a configuration to run.")
+        return
+
+    # Path checks, the realmlist.wtf write and the spawn all happen on the supervisor's workers;
+    # failures come back through client_supervisor.on_error
+    configurations = [config['configurations'][index] for index in selected]
+    if len(configurations) == 1:
+        futures = [client_supervisor.launch(configurations[0], requested_at=clicked)]
+    else:
+        futures = client_supervisor.launch_many(configurations, requested_at=clicked)
+    for cfg, future in zip(configurations, futures):
+        tasks.track(f"Launching {cfg['name']}", future)
+
+
+# Queue of callables to run on the Tk thread; worker threads must never touch widgets directly
+ui_queue = queue.Queue()
+
+
+def post_to_ui(func, *args):
+    ui_queue.put((func, args))
+
+
+def process_ui_queue(root):
+    while True:
+        try:
+            func, args = ui_queue.get_nowait()
+        except queue.Empty:
+            break
+        # One failing callback must not stop the queue from being drained and rescheduled
+        try:
+            func(*args)
+        except Exception as e:
+            logging.error(f"Error in UI callback {getattr(func, '__name__', func)!r}: {e}", exc_info=True)
+    root.after(100, process_ui_queue, root)
+
+
+# Error handler that is safe to call from any thread
+def show_error(title, message):
+    if threading.current_thread() is threading.main_thread():
+        messagebox.showerror(title, message)
+    else:
+        post_to_ui(messagebox.showerror, title, message)
+
+
+# Window listing every launched client with live pid, lifetime, exit status, CPU and memory
+def show_clients_window(root):
+    window = tk.Toplevel(root)
+    window.title("Clients")
+    clients_listbox = tk.Listbox(window, width=90, height=12)
+    clients_listbox.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+
+    def refresh():
+        if not window.winfo_exists():
+            return
+        lines = [client.describe() for client in client_supervisor.clients()]
+        if list(clients_listbox.get(0, tk.END)) != lines:
+            clients_listbox.delete(0, tk.END)
+            clients_listbox.insert(tk.END, *lines)
+        window.after(1000, refresh)
+
+    refresh()
+
+
+# Window showing the timing histograms of the hot paths, with an export to JSON
+def show_diagnostics_window(root):
+    window = tk.Toplevel(root)
+    window.title("Diagnostics")
+    metrics_listbox = tk.Listbox(window, width=100, height=14)
+    metrics_listbox.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+
+    def export():
+        path = filedialog.asksaveasfilename(parent=window, title="Export timings", defaultextension=".json",
+                                            filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")])
+        if path:
+            tasks.submit("Exporting timings", metrics.export, path,
+                         on_error=lambda description, e: messagebox.showerror(
+                             "Error", f"Failed to export timings: {e}", parent=window))
+
+    tk.Button(window, text="Export JSON", command=export).pack(padx=10, pady=(0, 10), anchor=tk.E)
+
+    def refresh():
+        if not window.winfo_exists():
+            return
+        lines = metrics.describe() or ["No timings recorded yet."]
+        if list(metrics_listbox.get(0, tk.END)) != lines:
+            metrics_listbox.delete(0, tk.END)
+            metrics_listbox.insert(tk.END, *lines)
+        window.after(1000, refresh)
+
+    refresh()
+
+
+# Add a new configuration
+def add_configuration(config, entry_fields, realmlist_label, wow_exe_label, listbox):
+    name = entry_fields["name"].get()
+    realmlist = entry_fields["realmlist"].get()
+    wow_exe = entry_fields["wow_exe"].get()
+    server_address = entry_fields["server_address"].get()
+    portal_address = entry_fields["portal_address"].get()
+    version = entry_fields["version"].get()
+
+    if not name or not realmlist or not wow_exe or not server_address:
+        messagebox.showwarning("Input Error", "Please fill in all fields.\n" + name + ", " + realmlist +
+                               ", " + wow_exe + ", " + server_address)
+        return
+
+    if name in config:
+        messagebox.showwarning("Duplicate Name", "A configuration with this name already exists.")
+        return
+    new_config = {
+        'name': name,
+        'realmlist_path': realmlist,
+        'wow_exe_path': wow_exe,
+        'server_address': server_address,
+        'portal_address': portal_address,
+        'version': version
+    }
+    try:
+        new_config.update(wine_settings(entry_fields))
+    except ValueError as e:
+        messagebox.showwarning("Input Error", f"Invalid Wine environment: {e}")
+        return
+    config.add(new_config)
+    listbox.append(new_config)
+    logging.info(f"Configuration '{name}' added.")
+
+    clear_input_fields(entry_fields, realmlist_label, wow_exe_label)
+
+
+# Clear input fields after adding/updating a configuration
+def clear_input_fields(entry_fields, realmlist_label, wow_exe_label):
+    # Clear the entry fields
+    entry_fields['name'].delete(0, tk.END)  # Clear name field
+    entry_fields['realmlist'].delete(0, tk.END)  # Clear realmlist field
+    entry_fields['wow_exe'].delete(0, tk.END)  # Clear wow_exe field
+    entry_fields['server_address'].delete(0, tk.END)  # Clear server_address field
+    entry_fields['portal_address'].delete(0, tk.END)  # Clear portal_address field
+
+    # Reset the labels for realmlist and wow_exe
+    realmlist_label.config(text="No file selected")
+    wow_exe_label.config(text="No file selected")
+
+    # Optionally reset version variable if you need to
+    entry_fields['version'].set("")  # Clear version field
+
+    # Reset the Wine settings
+    entry_fields['wine_prefix'].delete(0, tk.END)
+    entry_fields['wine_env'].delete(0, tk.END)
+    entry_fields['wine_persistent'].set(False)
+
+
+# Optional Wine settings from the form; only non-default values are stored
+# Configuration keys set from the Wine fields; left out when their field is cleared
+WINE_KEYS = ('wine_prefix', 'wine_env', 'wine_persistent')
+
+
+def wine_settings(entry_fields):
+    settings = {}
+    if 'wine_prefix' in entry_fields and entry_fields['wine_prefix'].get().strip():
+        settings['wine_prefix'] = entry_fields['wine_prefix'].get().strip()
+    if 'wine_env' in entry_fields and entry_fields['wine_env'].get().strip():
+        settings['wine_env'] = wine.parse_wine_env(entry_fields['wine_env'].get())
+    if 'wine_persistent' in entry_fields and entry_fields['wine_persistent'].get():
+        settings['wine_persistent'] = True
+    return settings
+
+
+# Main GUI setup
+def main():
+    global client_supervisor, config_watcher, tasks
+    setup_logging()
+    set_error_handler(show_error)
+    config = open_config_store()
+    client_supervisor = ClientSupervisor(history=open_launch_history())
+
+    # Start persistent wineservers for opted-in prefixes while the window comes up
+    if platform.system() == "Linux":
+        wine.sessions.warm_all(config['configurations'])
+    client_supervisor.on_error = lambda client: post_to_ui(messagebox.showerror, "Error", client.error)
+
+    root = tk.Tk()
+    root.title("Realmlist Updater")
+    status_var = tk.StringVar(value="Ready")
+    tasks = TaskRunner(post_to_ui, on_busy=lambda busy: show_busy(root, status_var, busy),
+                       on_error=lambda description, e: messagebox.showerror("Error", f"{description} failed: {e}"))
+
+    # Frames for organization
+    left_frame = tk.LabelFrame(root, text="Saved Configurations", padx=10, pady=10)
+    left_frame.pack(side=tk.LEFT, padx=10, pady=10)
+
+    right_frame = tk.LabelFrame(root, text="Add Configuration", padx=10, pady=10)
+    right_frame.pack(side=tk.RIGHT, padx=10, pady=10, fill=tk.BOTH, expand=True)
+
+    # Search box filtering by name, server address or version
+    search_var = tk.StringVar()
+    tk.Label(left_frame, text="Search:").grid(row=1, column=0, sticky=tk.W, padx=5)
+    tk.Entry(left_frame, textvariable=search_var).grid(row=1, column=1, padx=5, sticky="we")
+
+    # Listbox for configurations, wrapped in a filterable view that updates rows incrementally
+    config_listbox = tk.Listbox(left_frame, height=10, selectmode=tk.EXTENDED)
+    config_listbox.grid(row=2, column=0, columnspan=2, padx=5, pady=5, sticky="we")
+    scrollbar = tk.Scrollbar(left_frame, orient=tk.VERTICAL, command=config_listbox.yview)
+    scrollbar.grid(row=2, column=2, pady=5, sticky="ns")
+    config_listbox.config(yscrollcommand=scrollbar.set)
+    listbox = ConfigListView(config_listbox, config, label=listbox_label)
+    search_var.trace_add("write", lambda *args: schedule_filter(root, listbox, search_var.get()))
+    set_cache_purge_handler(lambda cfg, result: post_to_ui(show_cache_purged, listbox, cfg['name'], result))
+
+    # Merge edits made to config.json by other instances or the CLI while the app is open
+    config_watcher = FileWatcher([config.path, config.journal_path],
+                                 on_change=lambda: post_to_ui(apply_external_changes, config, listbox)).start()
+
+    # Move buttons below the listbox
+    move_up_button = tk.Button(left_frame, text="Move Up", command=lambda: move_config(config, listbox, direction='up'))
+    move_up_button.grid(row=3, column=0, padx=5, pady=5, sticky="w")
+
+    move_down_button = tk.Button(left_frame, text="Move Down", command=lambda: move_config(config, listbox, direction='down'))
+    move_down_button.grid(row=3, column=1, padx=5, pady=5, sticky="e")
+
+    # Add a "Run WoW" Button in the Right Frame
+    tk.Button(left_frame, text="Run WoW", command=lambda: run_selected_wow(config, listbox)
+              ).grid(row=4, column=0, columnspan=2, pady=5, sticky="we")
+
+    # Update Selected button
+    update_button = tk.Button(left_frame, text="Update Selected",
+                              command=lambda: update_selected(config, listbox, entry_fields, realmlist_label, wow_exe_label,
+                                                              right_frame, add_button))
+    update_button.grid(row=5, column=0, columnspan=2, padx=5, pady=5, sticky="we")
+
+    # Add Delete Selected button below the Update Selected button
+    delete_button = tk.Button(left_frame, text="Delete Selected", command=lambda: delete_configuration(config, listbox))
+    delete_button.grid(row=6, column=0, columnspan=2, padx=5, pady=5, sticky="we")
+
+    # Probe all servers concurrently and sort by the measured latency
+    probe_button = tk.Button(left_frame, text="Probe All",
+                             command=lambda: probe_all(root, config, listbox, probe_button))
+    probe_button.grid(row=7, column=0, padx=5, pady=5, sticky="we")
+
+    sort_button = tk.Button(left_frame, text="Sort by Latency", command=lambda: sort_configs_by_latency(config, listbox))
+    sort_button.grid(row=7, column=1, padx=5, pady=5, sticky="we")
+
+    # Live status of every launched client
+    tk.Button(left_frame, text="Clients", command=lambda: show_clients_window(root)
+              ).grid(row=8, column=0, columnspan=2, padx=5, pady=5, sticky="we")
+
+    # Find installations on disk instead of browsing for each file
+    scan_button = tk.Button(left_frame, text="Scan for Installations",
+                            command=lambda: scan_for_installations(root, config, listbox, scan_button))
+    scan_button.grid(row=9, column=0, columnspan=2, padx=5, pady=5, sticky="we")
+
+    # Timings of config I/O, realmlist writes and launches
+    tk.Button(left_frame, text="Diagnostics", command=lambda: show_diagnostics_window(root)
+              ).grid(row=10, column=0, columnspan=2, padx=5, pady=5, sticky="we")
+
+    # Bulk import of server lists (CSV, JSON lines or another user's config.json)
+    import_button = tk.Button(left_frame, text="Import Servers...",
+                              command=lambda: import_servers(root, config, listbox, import_button))
+    import_button.grid(row=11, column=0, columnspan=2, padx=5, pady=5, sticky="we")
+
+    # Ask every auth server for its realm list (population, online/offline)
+    realms_button = tk.Button(left_frame, text="Query Realms",
+                              command=lambda: query_all_realms(root, config, listbox, realms_button))
+    realms_button.grid(row=12, column=0, padx=5, pady=5, sticky="we")
+
+    # Look up every server's hostname at once; shows lookup time or failure, and fills the cache used by "pin_ip"
+    resolve_button = tk.Button(left_frame, text="Resolve DNS",
+                               command=lambda: resolve_all(config['configurations'], listbox, resolve_button))
+    resolve_button.grid(row=12, column=1, padx=5, pady=5, sticky="we")
+
+    # What is running in the background right now
+    tk.Label(left_frame, textvariable=status_var, anchor=tk.W, fg="gray30"
+             ).grid(row=13, column=0, columnspan=2, padx=5, pady=(5, 0), sticky="we")
+
+    # Right Frame: Add New Configuration and Display Selected
+    # Define fields in the right panel (Name, realmlist.wtf, WoW.exe, Server Address)
+    entry_fields = {
+        'name': tk.Entry(right_frame),
+        'realmlist': tk.Entry(right_frame),
+        'wow_exe': tk.Entry(right_frame),
+        'server_address': tk.Entry(right_frame),
+        'portal_address': tk.Entry(right_frame),
+        'version': tk.StringVar(right_frame),
+        'wine_prefix': tk.Entry(right_frame),
+        'wine_env': tk.Entry(right_frame),
+        'wine_persistent': tk.BooleanVar(right_frame)
+    }
+
+    # Labels and Entry widgets for the form fields
+    tk.Label(right_frame, text="Name:").grid(row=0, column=0, sticky=tk.W, pady=2)
+    entry_fields['name'].grid(row=0, column=1, pady=2)  # Use the existing entry field from the dictionary
+
+    tk.Label(right_frame, text="Select realmlist.wtf:").grid(row=1, column=0, sticky=tk.W, pady=2)
+    realmlist_label = tk.Label(right_frame, text="No file selected")
+    realmlist_label.grid(row=1, column=1, pady=2, sticky=tk.W)
+    tk.Button(right_frame, text="Browse", command=lambda: browse_file(entry_fields["realmlist"], realmlist_label,
+                                                                      "realmlist")).grid(row=1, column=2, padx=5, pady=2)
+
+    tk.Label(right_frame, text="Select WoW.exe:").grid(row=2, column=0, sticky=tk.W, pady=2)
+    wow_exe_label = tk.Label(right_frame, text="No file selected")
+    wow_exe_label.grid(row=2, column=1, pady=2, sticky=tk.W)
+    tk.Button(right_frame, text="Browse", command=lambda: browse_file(entry_fields["wow_exe"], wow_exe_label, "exe",
+                                                                      entry_fields['version'])).grid(
+        row=2, column=2, padx=5, pady=2)
+
+    tk.Label(right_frame, text="Server Address:").grid(row=3, column=0, sticky=tk.W, pady=2)
+    entry_fields['server_address'].grid(row=3, column=1, pady=2)  # Use the existing entry field from the dictionary
+
+    tk.Label(right_frame, text="(Optional) Portal Address:").grid(row=4, column=0, sticky=tk.W, pady=2)
+    entry_fields['portal_address'].grid(row=4, column=1, pady=2)  # Use the existing entry field from the dictionary
+
+    # Add a label and a dropdown (OptionMenu) for WoW version
+    version_var = tk.StringVar(value="Vanilla (1.12.x)")  # Default value
+
+    # Define the options for the dropdown
+    version_options = list(fingerprint.VERSION_BY_MAJOR.values())
+
+    # Add label and dropdown to the right frame
+    tk.Label(right_frame, text="WoW Version:").grid(row=5, column=0, sticky=tk.W, pady=2)
+    version_dropdown = tk.OptionMenu(right_frame, version_var, *version_options)
+    version_dropdown.grid(row=5, column=1, pady=2)
+
+    # Update the 'entry_fields' dictionary to include the version
+    entry_fields['version'] = version_var
+
+    # Wine settings (Linux): prefix, extra environment, and a wineserver kept warm between launches
+    tk.Label(right_frame, text="(Optional) Wine Prefix:").grid(row=6, column=0, sticky=tk.W, pady=2)
+    entry_fields['wine_prefix'].grid(row=6, column=1, pady=2)
+
+    tk.Label(right_frame, text="(Optional) Wine Env:").grid(row=7, column=0, sticky=tk.W, pady=2)
+    entry_fields['wine_env'].grid(row=7, column=1, pady=2)
+
+    tk.Checkbutton(right_frame, text="Keep Wine session warm", variable=entry_fields['wine_persistent']
+                   ).grid(row=8, column=1, sticky=tk.W, pady=2)
+
+    # Add button, default state
+    add_button = tk.Button(right_frame, text="Add", command=lambda: add_configuration(config, entry_fields, realmlist_label,
+                                                                                      wow_exe_label, listbox))
+    add_button.grid(row=9, column=0, columnspan=2, pady=20, sticky="we")  # Stretched across the panel
+
+    check_client_versions(root, config, listbox)
+    # Warm the DNS cache for configurations that write resolved IPs into realmlist.wtf
+    pinned = [cfg for cfg in config['configurations'] if cfg.get('pin_ip')]
+    if pinned:
+        resolve_all(pinned, listbox)
+    process_ui_queue(root)
+    LoopMonitor(root.after).start()
+    root.mainloop()
+    config_watcher.stop()
+    tasks.shutdown()
+    client_supervisor.stop()
+    if client_supervisor.history is not None:
+        client_supervisor.history.close()
+    close_config_store(config)
+
+
+# Show what is running in the background, with a busy cursor while anything is
+def show_busy(root, status_var, busy):
+    if not busy:
+        status_var.set("Ready")
+    elif len(busy) == 1:
+        status_var.set(f"{busy[0]}...")
+    else:
+        status_var.set(f"{busy[0]}... (+{len(busy) - 1} more)")
+    root.config(cursor="watch" if busy else "")
+
+
+# Note next to a configuration how much a purge of its client's stale WDB cache reclaimed
+def show_cache_purged(listbox, name, result):
+    listbox_annotations.setdefault(name, {})['cache'] = (f"cache purged: {result.bytes / (1024 * 1024):.0f} MB, "
+                                                         f"{result.files} files")
+    listbox.refresh()
+
+
+# Reload what another process changed in config.json (on a worker) and update only the affected rows
+def apply_external_changes(config, listbox):
+    # Only the file reads run on the worker; the merge happens here on the Tk thread in one step,
+    # so the list never changes under a handler that is indexing into it
+    def apply(changes):
+        diff = config.apply_changes(changes)
+        if diff is None:
+            # This instance saved or edited something meanwhile; read again from the new state
+            apply_external_changes(config, listbox)
+        elif diff:
+            listbox.apply_diff(diff)
+
+    tasks.submit(f"Reloading {os.path.basename(config.path)}", config.read_changes, on_success=apply)
+
+
+# Delete a configuration
+def delete_configuration(config, listbox):
+    if listbox.curselection():
+        index = listbox.curselection()[0]
+        cfg = config['configurations'][index]
+        config.delete(index)
+        listbox.remove(index, cfg)
+        logging.info("Configuration deleted.")
+
+
+# Function to move configuration up or down
+def move_config(config, listbox, direction):
+    try:
+        selected_index = listbox.curselection()[0]
+
+        # Determine new position
+        if direction == 'up' and selected_index > 0:
+            new_index = selected_index - 1
+        elif direction == 'down' and selected_index < len(config['configurations']) - 1:
+            new_index = selected_index + 1
+        else:
+            return  # Do nothing if already at top or bottom
+
+        # Swap the configurations (journaled by the store)
+        config.swap(selected_index, new_index)
+
+        # Update only the two affected rows
+        listbox.swap(selected_index, new_index)
+
+        # Set focus back to the moved item
+        listbox.selection_set(new_index)
+        listbox.activate(new_index)
+
+    except IndexError:
+        messagebox.showwarning("No Configuration Selected", "Please select a configuration to move.")
+    except Exception as e:
+        logging.error(f"Error moving configuration: {e}")
+        messagebox.showerror("Error", f"An error occurred while moving the configuration: {e}")
+
+
+# Helper function to update the listbox after the configurations were reordered in bulk
+def update_listbox(listbox, config):
+    listbox.rebuild()
+
+
+# Apply the search filter once typing pauses, so each keystroke doesn't re-filter the list
+def schedule_filter(root, listbox, query, delay=150):
+    global filter_job
+    if filter_job is not None:
+        root.after_cancel(filter_job)
+    filter_job = root.after(delay, lambda: apply_filter(listbox, query))
+
+
+def apply_filter(listbox, query):
+    global filter_job
+    filter_job = None
+    listbox.set_filter(query)
+
+
+# Text shown for a configuration in the Listbox, including any annotations (e.g. latency)
+def listbox_label(cfg):
+    notes = [text for text in listbox_annotations.get(cfg['name'], {}).values() if text]
+    if notes:
+        return f"{cfg['name']}  [{' | '.join(notes)}]"
+    return cfg['name']
+
+
+# Probe every configuration's auth server at once, then annotate the Listbox with the latency
+def probe_all(root, config, listbox, probe_button):
+    configurations = list(config['configurations'])
+    probe_button.config(state=tk.DISABLED, text="Probing...")
+
+    def finish(results):
+        probe_button.config(state=tk.NORMAL, text="Probe All")
+        probe_results.clear()
+        probe_results.update(results)
+        for name, result in results.items():
+            listbox_annotations.setdefault(name, {})['probe'] = format_probe_result(result)
+        reachable = sum(1 for result in results.values() if result.reachable)
+        logging.info(f"Probe finished: {reachable}/{len(results)} server(s) reachable.")
+        listbox.refresh()
+
+    def failed(description, e):
+        probe_button.config(state=tk.NORMAL, text="Probe All")
+        messagebox.showerror("Error", f"Failed to probe servers: {e}")
+
+    tasks.submit("Probing servers", lambda: probe_configurations(configurations, cache=probe_cache),
+                 on_success=finish, on_error=failed)
+
+
+# Query every configuration's auth server for its realm list, then annotate the Listbox with the result
+def query_all_realms(root, config, listbox, realms_button):
+    configurations = list(config['configurations'])
+    realms_button.config(state=tk.DISABLED, text="Querying...")
+
+    def finish(results):
+        realms_button.config(state=tk.NORMAL, text="Query Realms")
+        for name, result in results.items():
+            listbox_annotations.setdefault(name, {})['realms'] = format_realm_result(result)
+        answered = sum(1 for result in results.values() if result.reachable)
+        logging.info(f"Realm query finished: {answered}/{len(results)} auth server(s) answered.")
+        listbox.refresh()
+
+    def failed(description, e):
+        realms_button.config(state=tk.NORMAL, text="Query Realms")
+        messagebox.showerror("Error", f"Failed to query realm lists: {e}")
+
+    tasks.submit("Querying realm lists", lambda: query_configurations(configurations, cache=realm_cache),
+                 on_success=finish, on_error=failed)
+
+
+# Resolve the hostnames of `configurations` in the background and annotate the Listbox with the
+# lookup time or the failure. Results go to resolver.default_cache, which launches use for "pin_ip".
+def resolve_all(configurations, listbox, resolve_button=None):
+    configurations = list(configurations)
+    if resolve_button is not None:
+        resolve_button.config(state=tk.DISABLED, text="Resolving...")
+
+    def done():
+        if resolve_button is not None:
+            resolve_button.config(state=tk.NORMAL, text="Resolve DNS")
+
+    def finish(results):
+        done()
+        for name, result in results.items():
+            listbox_annotations.setdefault(name, {})['dns'] = resolver.format_resolution(result)
+        failed = sum(1 for result in results.values() if not result.ok)
+        logging.info(f"DNS lookup finished: {len(results) - failed}/{len(results)} server(s) resolved.")
+        listbox.refresh()
+
+    def failed(description, e):
+        done()
+        messagebox.showerror("Error", f"Failed to resolve server addresses: {e}")
+
+    tasks.submit("Resolving server addresses",
+                 lambda: resolver.resolve_configurations(configurations, cache=resolver.default_cache),
+                 on_success=finish, on_error=failed)
+
+
+# Detect every client's version in the background and flag configurations set to a different one.
+# Builds are cached in fingerprint_cache.json by (path, size, mtime), so this is nearly free after the first run.
+def check_client_versions(root, config, listbox):
+    configurations = list(config['configurations'])
+
+    def detect():
+        fingerprint.default_cache = fingerprint.FingerprintCache.load()
+        builds = fingerprint.detect_builds(configurations)
+        fingerprint.default_cache.save()
+        return fingerprint.version_mismatches(configurations, builds)
+
+    def finish(mismatches):
+        for cfg, build in mismatches:
+            logging.warning(f"'{cfg['name']}' is set to {cfg.get('version')} but its client is build {build}.")
+            listbox_annotations.setdefault(cfg['name'], {})['version'] = f"client is {build.version}"
+        if mismatches:
+            listbox.refresh()
+
+    # A failure is only logged; nothing depends on the check
+    tasks.submit("Checking client versions", detect, on_success=finish, on_error=lambda description, e: None)
+
+
+# Scan a folder for WoW installations in the background and offer the ones not configured yet
+def scan_for_installations(root, config, listbox, scan_button):
+    directory = filedialog.askdirectory(title="Select a folder to scan for WoW installations")
+    if not directory:
+        return
+    existing = list(config['configurations'])
+    scan_button.config(state=tk.DISABLED, text="Scanning...")
+
+    def scan():
+        global scan_cache
+        if scan_cache is None:
+            scan_cache = ScanCache.load()
+        installations = scan_installations([directory], scan_cache)
+        scan_cache.save()
+        return propose_configurations(installations, existing)
+
+    def finish(proposals):
+        scan_button.config(state=tk.NORMAL, text="Scan for Installations")
+        if not proposals:
+            messagebox.showinfo("Scan Complete", "No new WoW installations were found.")
+            return
+        show_proposals_window(root, config, listbox, proposals)
+
+    def failed(description, e):
+        scan_button.config(state=tk.NORMAL, text="Scan for Installations")
+        messagebox.showerror("Error", f"Failed to scan {directory}: {e}")
+
+    tasks.submit(f"Scanning {directory}", scan, on_success=finish, on_error=failed)
+
+
+# Import a server list in the background with a progress window; nothing is added if it is cancelled
+def import_servers(root, config, listbox, import_button):
+    path = filedialog.askopenfilename(title="Import servers", filetypes=[
+        ("Server lists", "*.csv *.jsonl *.ndjson *.json"), ("All Files", "*.*")])
+    if not path:
+        return
+    existing = list(config['configurations'])
+    cancel = threading.Event()
+    import_button.config(state=tk.DISABLED)
+
+    window = tk.Toplevel(root)
+    window.title("Importing")
+    status = tk.Label(window, text=f"Reading {os.path.basename(path)}...", width=50, anchor=tk.W)
+    status.pack(padx=10, pady=(10, 5), fill=tk.X)
+    progress_bar = ttk.Progressbar(window, maximum=1.0, length=350)
+    progress_bar.pack(padx=10, pady=5, fill=tk.X)
+    tk.Button(window, text="Cancel", command=cancel.set).pack(padx=10, pady=(5, 10))
+    window.protocol("WM_DELETE_WINDOW", cancel.set)
+
+    def show_progress(rows, fraction):
+        if window.winfo_exists():
+            status.config(text=f"{rows} row(s) read")
+            progress_bar.config(value=fraction)
+
+    def finish(result):
+        import_button.config(state=tk.NORMAL)
+        window.destroy()
+        # Configurations added while the import was running win over imported ones
+        new = [cfg for cfg in result.configurations if cfg['name'] not in config]
+        config.extend(new)
+        listbox.extend(new)
+        messagebox.showinfo("Import Complete", result.describe())
+
+    def failed(description, e):
+        import_button.config(state=tk.NORMAL)
+        window.destroy()
+        if isinstance(e, ImportCancelled):
+            logging.info(f"Import of '{path}' cancelled.")
+            messagebox.showinfo("Import Cancelled", "The import was cancelled; nothing was added.")
+        else:
+            messagebox.showerror("Error", f"Failed to import {path}: {e}")
+
+    def read():
+        return read_import(path, existing, progress=lambda *args: post_to_ui(show_progress, *args),
+                           cancel=cancel, default_paths=paths_by_version(existing))
+
+    tasks.submit(f"Importing {os.path.basename(path)}", read, on_success=finish, on_error=failed)
+
+
+# Let the user pick which scanned installations to add as configurations
+def show_proposals_window(root, config, listbox, proposals):
+    window = tk.Toplevel(root)
+    window.title("Found Installations")
+    proposals_listbox = tk.Listbox(window, width=100, height=12, selectmode=tk.EXTENDED)
+    proposals_listbox.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+    for proposal in proposals:
+        server = proposal['server_address'] or "no server set"
+        proposals_listbox.insert(tk.END, f"{proposal['name']}  -  {proposal['realmlist_path']}  ({server})")
+    proposals_listbox.selection_set(0, tk.END)
+
+    def add_selected():
+        for row in proposals_listbox.curselection():
+            proposal = proposals[row]
+            if proposal['name'] in config:
+                continue
+            config.add(proposal)
+            listbox.append(proposal)
+            logging.info(f"Configuration '{proposal['name']}' added from scan.")
+        window.destroy()
+
+    tk.Button(window, text="Add Selected", command=add_selected).pack(padx=10, pady=(0, 10), fill=tk.X)
+
+
+# Reorder the saved configurations by the latest probe results (fastest first)
+def sort_configs_by_latency(config, listbox):
+    if not probe_results:
+        messagebox.showinfo("No Probe Results", "Run \"Probe All\" before sorting by latency.")
+        return
+    config.reorder(sort_by_latency(config['configurations'], probe_results))
+    update_listbox(listbox, config)
+    logging.info("Configurations sorted by latency.")
+
+
+def update_selected(config, listbox, entry_fields, realmlist_label, wow_exe_label, right_frame, add_button):
+    try:
+        # Get selected configuration index
+        selected_index = listbox.curselection()[0]
+        selected_config = config['configurations'][selected_index]
+
+        # Update right panel label to "Edit Configuration"
+        right_frame.config(text="Edit Configuration")
+
+        # Ensure the fields are enabled and ready for input
+        entry_fields['name'].config(state=tk.NORMAL)
+        entry_fields['realmlist'].config(state=tk.NORMAL)
+        entry_fields['wow_exe'].config(state=tk.NORMAL)
+        entry_fields['server_address'].config(state=tk.NORMAL)
+        entry_fields['portal_address'].config(state=tk.NORMAL)
+
+        # Pre-fill the entry fields with the selected configuration's values
+        entry_fields['name'].delete(0, tk.END)
+        entry_fields['name'].insert(0, selected_config.get('name', ''))
+
+        entry_fields['realmlist'].delete(0, tk.END)
+        entry_fields['realmlist'].insert(0, selected_config.get('realmlist_path', ''))
+
+        entry_fields['wow_exe'].delete(0, tk.END)
+        entry_fields['wow_exe'].insert(0, selected_config.get('wow_exe_path', ''))
+
+        entry_fields['server_address'].delete(0, tk.END)
+        entry_fields['server_address'].insert(0, selected_config.get('server_address', ''))
+
+        entry_fields['portal_address'].delete(0, tk.END)
+        entry_fields['portal_address'].insert(0, selected_config.get('portal_address', ''))
+
+        entry_fields['wine_prefix'].delete(0, tk.END)
+        entry_fields['wine_prefix'].insert(0, selected_config.get('wine_prefix', ''))
+
+        entry_fields['wine_env'].delete(0, tk.END)
+        entry_fields['wine_env'].insert(0, wine.format_wine_env(selected_config.get('wine_env')))
+
+        entry_fields['wine_persistent'].set(bool(selected_config.get('wine_persistent')))
+
+        # Force the UI to update to reflect changes
+        entry_fields['name'].update_idletasks()
+        entry_fields['server_address'].update_idletasks()
+        entry_fields['portal_address'].update_idletasks()
+
+        # Update the labels to reflect the selected file paths
+        realmlist_label.config(text=os.path.basename(selected_config.get('realmlist_path', '')))
+        wow_exe_label.config(text=os.path.basename(selected_config.get('wow_exe_path', '')))
+
+        # Replace the "Add" button with a "Save" button
+        # Remembered by name: external changes merged while the form is open can move the row
+        old_name = selected_config['name']
+        add_button.config(text="Save", command=lambda: save_configuration(config, listbox, entry_fields, old_name,
+                                                                          right_frame, add_button, realmlist_label,
+                                                                          wow_exe_label))
+
+    except IndexError:
+        messagebox.showwarning("No Configuration Selected", "Please select a configuration to update.")
+
+    except KeyError as e:
+        print(f"KeyError: {e}. Check that the keys are correct in your selected configuration.")
+
+
+def save_configuration(config, listbox, entry_fields, old_name, right_frame, add_button, realmlist_label,
+                       wow_exe_label):
+    index = config.index_of(old_name)
+    if index is None:
+        messagebox.showwarning("Configuration Removed",
+                               f"'{old_name}' was removed or renamed elsewhere while you were editing it.")
+        return
+
+    # Update the selected configuration with new values
+    selected_version = entry_fields['version'].get()
+    server_address = entry_fields['server_address'].get()
+    portal_address = entry_fields['portal_address'].get()
+
+    name = entry_fields['name'].get()
+    if config.index_of(name) not in (None, index):
+        messagebox.showwarning("Duplicate Name", "A configuration with this name already exists.")
+        return
+
+    # Keys without a form field (pin_ip, auth_account, wdb_policy, ...) are kept as they were
+    old_config = config['configurations'][index]
+    updated_config = dict(old_config)
+    for key in WINE_KEYS + ('patchlist',):
+        updated_config.pop(key, None)
+    updated_config.update({
+        'name': name,
+        'realmlist_path': entry_fields['realmlist'].get(),
+        'wow_exe_path': entry_fields['wow_exe'].get(),
+        'server_address': server_address,
+        'portal_address': portal_address,
+        'version': selected_version
+    })
+
+    # Check if version is Cataclysm and add patchlist if necessary
+    if selected_version == "Cataclysm (4.3.4)":
+        updated_config['patchlist'] = server_address  # Add patchlist as server_address
+
+    try:
+        updated_config.update(wine_settings(entry_fields))
+    except ValueError as e:
+        messagebox.showwarning("Input Error", f"Invalid Wine environment: {e}")
+        return
+
+    # Save configuration (journaled by the store) and update its row
+    listbox_annotations.get(old_config['name'], {}).pop('version', None)  # re-checked on next start
+    config.replace(index, updated_config)
+    listbox.replace(index, old_config, updated_config)
+
+    # Revert back to "Add Configuration" mode
+    right_frame.config(text="Add Configuration")
+    add_button.config(text="Add", command=lambda: add_configuration(config, entry_fields, realmlist_label, wow_exe_label,
+                                                                    listbox))
+
+    # Clear the entry fields for a new entry
+    clear_entry_fields(entry_fields)
+
+
+def clear_entry_fields(entry_fields):
+    for field in entry_fields.values():
+        if isinstance(field, tk.Entry):
+            field.delete(0, tk.END)  # Clear Entry fields
+        elif isinstance(field, tk.StringVar):
+            field.set('')  # Clear StringVar fields
+        elif isinstance(field, tk.BooleanVar):
+            field.set(False)  # Clear checkboxes
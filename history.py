@@ -0,0 +1,129 @@
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+HISTORY_FILE = 'history.db'
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS launches (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    server TEXT NOT NULL,
+    version TEXT NOT NULL,
+    started REAL NOT NULL,
+    ended REAL,
+    exit_code INTEGER,
+    time_to_start_ms REAL,
+    pid INTEGER,
+    error TEXT
+);
+-- Time-window queries ("this week") and per-server/per-configuration aggregates stay index-only
+CREATE INDEX IF NOT EXISTS launches_started ON launches (started, time_to_start_ms);
+CREATE INDEX IF NOT EXISTS launches_server ON launches (server, started, ended, error);
+CREATE INDEX IF NOT EXISTS launches_name ON launches (name, started);
+"""
+
+WEEK = 7 * 24 * 3600
+
+
+@dataclass
+class Launch:
+    id: int
+    name: str
+    server: str
+    version: str
+    started: float
+    ended: Optional[float]
+    exit_code: Optional[int]
+    time_to_start_ms: Optional[float]
+    pid: Optional[int]
+    error: Optional[str]
+
+    @property
+    def session_seconds(self):
+        return self.ended - self.started if self.ended is not None else None
+
+
+@dataclass
+class ServerSessions:
+    server: str
+    sessions: int
+    average_seconds: float
+    total_seconds: float
+
+
+# Launch history in SQLite: one row per launch, completed when the client exits.
+#
+# Safe to use from several threads (the supervisor records launches from its launch pool and exits
+# from its monitor thread); every statement runs under one lock on a single connection.
+class LaunchHistory:
+    def __init__(self, path=HISTORY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        with self._lock:
+            self._db.executescript(SCHEMA)
+            self._db.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # Record a launch (successful or not) and return its id for record_exit()
+    def record_launch(self, cfg, started, time_to_start_ms=None, pid=None, error=None, ended=None):
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT INTO launches (name, server, version, started, ended, time_to_start_ms, pid, error) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (cfg['name'], cfg.get('server_address', ''), cfg.get('version', ''), started, ended,
+                 time_to_start_ms, pid, error))
+            return cursor.lastrowid
+
+    def record_exit(self, launch_id, ended, exit_code):
+        with self._lock:
+            self._db.execute('UPDATE launches SET ended = ?, exit_code = ? WHERE id = ?', (ended, exit_code, launch_id))
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._db.execute(sql, parameters).fetchall()
+
+    def recent(self, limit=20):
+        rows = self._query('SELECT * FROM launches ORDER BY started DESC LIMIT ?', (limit,))
+        return [Launch(*row) for row in rows]
+
+    # Slowest click-to-process-start times since `since` (default: the last seven days)
+    def slowest_launches(self, since=None, limit=10):
+        since = since if since is not None else time.time() - WEEK
+        rows = self._query('SELECT * FROM launches WHERE started >= ? AND time_to_start_ms IS NOT NULL '
+                           'ORDER BY time_to_start_ms DESC LIMIT ?', (since, limit))
+        return [Launch(*row) for row in rows]
+
+    # Finished sessions per server since `since` (default: all time), longest average first.
+    # Launches without a recorded exit (e.g. the app was closed while the client ran) don't count.
+    def sessions_by_server(self, since=0.0):
+        rows = self._query('SELECT server, COUNT(*), AVG(ended - started), SUM(ended - started) FROM launches '
+                           'WHERE started >= ? AND ended IS NOT NULL AND error IS NULL '
+                           'GROUP BY server ORDER BY AVG(ended - started) DESC', (since,))
+        return [ServerSessions(*row) for row in rows]
+
+
+# The launch history, or None if it can't be opened (read-only, locked or corrupt database); callers
+# still launch, just unrecorded
+def open_launch_history(path=HISTORY_FILE):
+    try:
+        return LaunchHistory(path)
+    except Exception as e:
+        logging.error(f"Could not open the launch history: {e}")
+        return None
+
+
+def format_duration(seconds):
+    seconds = int(seconds or 0)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}"
@@ -0,0 +1,226 @@
+import csv
+import io
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+
+from fingerprint import VERSION_BY_MAJOR
+
+# Progress is reported at most this often (seconds)
+PROGRESS_INTERVAL = 0.1
+# Bytes read at a time when streaming a config.json
+READ_SIZE = 1024 * 1024
+
+FORMATS = ('csv', 'jsonl', 'json')
+
+# Column names accepted for each configuration field (compared case-insensitively)
+FIELD_ALIASES = {
+    'name': ('name', 'server_name', 'title'),
+    'server_address': ('server_address', 'server', 'address', 'realmlist', 'host'),
+    'portal_address': ('portal_address', 'portal'),
+    'version': ('version', 'expansion', 'client', 'patch'),
+    'realmlist_path': ('realmlist_path',),
+    'wow_exe_path': ('wow_exe_path', 'wow_exe'),
+}
+
+# Spellings of each version found in public server lists
+VERSION_ALIASES = {
+    "Vanilla (1.12.x)": ('vanilla', 'classic', '1.12', '1.12.1', '1.12.2', '1.12.x'),
+    "The Burning Crusade (2.4.3)": ('tbc', 'the burning crusade', 'burning crusade', '2.4.3', '2.4'),
+    "Wrath of the Lich King (3.3.5)": ('wotlk', 'wrath', 'wrath of the lich king', '3.3.5', '3.3.5a'),
+    "Cataclysm (4.3.4)": ('cata', 'cataclysm', '4.3.4', '4.3'),
+}
+_VERSIONS = {alias: version for version, aliases in VERSION_ALIASES.items() for alias in aliases}
+_VERSIONS.update({version.lower(): version for version in VERSION_BY_MAJOR.values()})
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+@dataclass
+class ImportResult:
+    configurations: list = field(default_factory=list)
+    rows: int = 0
+    duplicate_names: int = 0
+    duplicate_servers: int = 0
+    invalid: int = 0
+    elapsed: float = 0.0
+
+    def describe(self):
+        return (f"{len(self.configurations)} new configuration(s) from {self.rows} row(s); "
+                f"skipped {self.duplicate_names} duplicate name(s), {self.duplicate_servers} duplicate server(s) "
+                f"and {self.invalid} invalid row(s).")
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    return 'json'
+
+
+def normalize_version(text):
+    return _VERSIONS.get(str(text or '').strip().lower())
+
+
+def _read_csv(f):
+    reader = csv.DictReader(f)
+    columns = {}
+    for column in reader.fieldnames or ():
+        for key, aliases in FIELD_ALIASES.items():
+            if column.strip().lower() in aliases and key not in columns:
+                columns[key] = column
+    for row in reader:
+        yield {key: row.get(column) or '' for key, column in columns.items()}
+
+
+def _read_jsonl(f):
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            logging.warning(f"Skipping unreadable line {number}: {e}")
+            yield None
+
+
+# Yield the entries of a config.json ({"configurations": [...]}) or of a bare JSON array one at a
+# time, reading the file in chunks so a huge export is never held in memory as a whole
+def _read_json(f):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def more():
+        nonlocal buffer, position, eof
+        chunk = f.read(READ_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        eof = not chunk
+
+    # Find the opening bracket of the list of configurations
+    more()
+    while True:
+        if buffer.lstrip().startswith('['):
+            position = buffer.index('[') + 1
+            break
+        key = buffer.find('"configurations"')
+        start = buffer.find('[', key) if key >= 0 else -1
+        if start >= 0:
+            position = start + 1
+            break
+        if eof:
+            raise ValueError("no list of configurations found")
+        more()
+
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position >= len(buffer):
+            if eof:
+                raise ValueError("unexpected end of file")
+            more()
+            continue
+        if buffer[position] == ']':
+            return
+        try:
+            entry, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if eof:
+                raise
+            more()
+            continue
+        position = end
+        yield entry
+
+
+_READERS = {'csv': _read_csv, 'jsonl': _read_jsonl, 'json': _read_json}
+
+
+# A configuration from one imported entry, or None if it has no server address
+def normalize_entry(entry, default_paths=None):
+    if not isinstance(entry, dict):
+        return None
+    server_address = str(entry.get('server_address') or entry.get('server') or entry.get('realmlist') or '').strip()
+    if not server_address:
+        return None
+    version = normalize_version(entry.get('version')) or "Vanilla (1.12.x)"
+    realmlist_path, wow_exe_path = (default_paths or {}).get(version, ('', ''))
+    cfg = {
+        'name': str(entry.get('name') or server_address).strip(),
+        'realmlist_path': entry.get('realmlist_path') or realmlist_path,
+        'wow_exe_path': entry.get('wow_exe_path') or wow_exe_path,
+        'server_address': server_address,
+        'portal_address': str(entry.get('portal_address') or entry.get('portal') or '').strip(),
+        'version': version,
+    }
+    if version == "Cataclysm (4.3.4)":
+        cfg['patchlist'] = server_address
+    return cfg
+
+
+# Client paths of an existing configuration for each version, used for imported servers
+def paths_by_version(configurations):
+    paths = {}
+    for cfg in configurations:
+        if cfg.get('realmlist_path') and cfg.get('wow_exe_path'):
+            paths.setdefault(cfg.get('version'), (cfg['realmlist_path'], cfg['wow_exe_path']))
+    return paths
+
+
+# Stream an import file and return the configurations that are new.
+#
+# Entries are dropped when their name is already taken, or when a configuration for the same
+# server address and version already exists (in `existing` or earlier in the file). Both checks
+# are set lookups, so the whole import is linear in the number of rows. `progress(rows, fraction)`
+# is called periodically from this thread; setting the `cancel` event raises ImportCancelled.
+def read_import(path, existing=(), file_format=None, progress=None, cancel=None, default_paths=None):
+    file_format = file_format or detect_format(path)
+    if file_format not in _READERS:
+        raise ValueError(f"Unknown import format '{file_format}'")
+    started = time.perf_counter()
+    names = {cfg['name'] for cfg in existing}
+    servers = {(cfg.get('server_address', '').lower(), cfg.get('version')) for cfg in existing}
+    result = ImportResult()
+    total = os.path.getsize(path) or 1
+    reported = started
+
+    with open(path, 'rb') as raw:
+        f = io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace', newline='')
+        for entry in _READERS[file_format](f):
+            result.rows += 1
+            cfg = normalize_entry(entry, default_paths)
+            if cfg is None:
+                result.invalid += 1
+            elif (cfg['server_address'].lower(), cfg['version']) in servers:
+                result.duplicate_servers += 1
+            elif cfg['name'] in names:
+                result.duplicate_names += 1
+            else:
+                names.add(cfg['name'])
+                servers.add((cfg['server_address'].lower(), cfg['version']))
+                result.configurations.append(cfg)
+
+            if result.rows % 256 == 0:
+                if cancel is not None and cancel.is_set():
+                    raise ImportCancelled()
+                now = time.perf_counter()
+                if progress is not None and now - reported >= PROGRESS_INTERVAL:
+                    reported = now
+                    progress(result.rows, min(raw.tell() / total, 1.0))
+
+    if cancel is not None and cancel.is_set():
+        raise ImportCancelled()
+    result.elapsed = time.perf_counter() - started
+    if progress is not None:
+        progress(result.rows, 1.0)
+    logging.info(f"Import of '{path}' ({file_format}) in {result.elapsed:.2f}s: {result.describe()}")
+    return result
@@ -0,0 +1,205 @@
+import tkinter as tk
+from bisect import bisect_left
+
+from search import SearchIndex
+
+# Rows inserted immediately when the list is (re)built; the rest follow in batches between events
+FIRST_CHUNK = 200
+CHUNK_SIZE = 2000
+
+
+# Filterable view of the saved configurations on top of a tk.Listbox.
+#
+# Everything is addressed by configuration index (the position in config['configurations']),
+# so `curselection()`/`selection_set()` work the same whether or not a filter is active.
+# Edits touch only the affected rows; full rebuilds are inserted in chunks so a huge list
+# never blocks the Tk loop in one go.
+class ConfigListView:
+    def __init__(self, listbox, config, label=lambda cfg: cfg['name']):
+        self.listbox = listbox
+        self.config = config
+        self.label = label
+        self.index = SearchIndex(config['configurations'])
+        self.query = ''
+        self._rows = []     # configuration index shown on each row, ascending
+        self._labels = []   # text currently shown on each populated row
+        self._populate_job = None
+        self.rebuild()
+
+    def curselection(self):
+        return tuple(self._rows[row] for row in self.listbox.curselection() if row < len(self._rows))
+
+    def selection_set(self, index):
+        row = self._row_of(index)
+        self.listbox.selection_clear(0, tk.END)
+        if row is not None:
+            self.listbox.selection_set(row)
+            self.listbox.see(row)
+
+    def activate(self, index):
+        row = self._row_of(index)
+        if row is not None:
+            self.listbox.activate(row)
+
+    def __len__(self):
+        return len(self._rows)
+
+    # Show only configurations whose name, server address or version contains `query`
+    def set_filter(self, query):
+        if query.strip() == self.query.strip():
+            return
+        self.query = query
+        self.rebuild()
+
+    # Re-read the whole list (e.g. after the configurations were reordered in bulk)
+    def rebuild(self):
+        self._cancel_population()
+        if self.query.strip():
+            matches = self.index.search(self.query)
+            self._rows = sorted(self.config.index_of(name) for name in matches)
+        else:
+            self._rows = list(range(len(self.config['configurations'])))
+        self._labels = []
+        self.listbox.delete(0, tk.END)
+        self._populate(FIRST_CHUNK)
+
+    # Re-render labels (e.g. new annotations), touching only rows whose text changed
+    def refresh(self):
+        self._finish_population()
+        configurations = self.config['configurations']
+        for row, index in enumerate(self._rows):
+            self._set_row(row, self.label(configurations[index]))
+
+    # A configuration was appended to the store
+    def append(self, cfg):
+        self._finish_population()
+        self.index.add(cfg)
+        if self._visible(cfg):
+            self._rows.append(len(self.config['configurations']) - 1)
+            self._labels.append(self.label(cfg))
+            self.listbox.insert(tk.END, self._labels[-1])
+
+    # Many configurations were appended to the store; their rows are inserted in chunks like a rebuild
+    def extend(self, configurations):
+        self._finish_population()
+        first = len(self.config['configurations']) - len(configurations)
+        for offset, cfg in enumerate(configurations):
+            self.index.add(cfg)
+            if self._visible(cfg):
+                self._rows.append(first + offset)
+        self._populate(FIRST_CHUNK)
+
+    # Apply a store.ConfigDiff (e.g. changes made to config.json by another process)
+    def apply_diff(self, diff):
+        if diff.reordered:
+            self.index = SearchIndex(self.config['configurations'])
+            self.rebuild()
+            return
+        for index, cfg in sorted(diff.removed, key=lambda item: item[0], reverse=True):
+            self.remove(index, cfg)
+        count = len(self.config['configurations'])
+        if diff.added and diff.added[0][0] == count - len(diff.added):
+            self.extend([cfg for index, cfg in diff.added])   # all appended, e.g. an import
+        else:
+            for index, cfg in diff.added:
+                self.insert(index, cfg)
+        for index, old_cfg, new_cfg in diff.changed:
+            self.replace(index, old_cfg, new_cfg)
+
+    # A configuration was inserted into the store at `index`
+    def insert(self, index, cfg):
+        self._finish_population()
+        self.index.add(cfg)
+        row = bisect_left(self._rows, index)
+        for later in range(row, len(self._rows)):
+            self._rows[later] += 1
+        if self._visible(cfg):
+            self._rows.insert(row, index)
+            self._labels.insert(row, self.label(cfg))
+            self.listbox.insert(row, self._labels[row])
+
+    # The configuration at `index` (previously `cfg`) was deleted from the store
+    def remove(self, index, cfg):
+        self._finish_population()
+        self.index.remove(cfg['name'])
+        start = bisect_left(self._rows, index)
+        if start < len(self._rows) and self._rows[start] == index:
+            self.listbox.delete(start)
+            del self._rows[start]
+            del self._labels[start]
+        for row in range(start, len(self._rows)):
+            self._rows[row] -= 1
+
+    # The configuration at `index` was replaced: `old_cfg` became `new_cfg`
+    def replace(self, index, old_cfg, new_cfg):
+        self._finish_population()
+        self.index.update(old_cfg['name'], new_cfg)
+        row = self._row_of(index)
+        visible = self._visible(new_cfg)
+        if row is not None and visible:
+            self._set_row(row, self.label(new_cfg))
+        elif row is not None:
+            self.listbox.delete(row)
+            del self._rows[row]
+            del self._labels[row]
+        elif visible:
+            row = bisect_left(self._rows, index)
+            self._rows.insert(row, index)
+            self._labels.insert(row, self.label(new_cfg))
+            self.listbox.insert(row, self._labels[row])
+
+    # Configurations at `i` and `j` were swapped in the store
+    def swap(self, i, j):
+        self._finish_population()
+        row_i, row_j = self._row_of(i), self._row_of(j)
+        configurations = self.config['configurations']
+        if row_i is not None and row_j is not None:
+            self._set_row(row_i, self.label(configurations[i]))
+            self._set_row(row_j, self.label(configurations[j]))
+        elif abs(i - j) != 1 and (row_i is not None or row_j is not None):
+            self.rebuild()
+        elif row_i is not None:
+            # Neighbour is filtered out: the visible entry keeps its row but moves to index j
+            self._rows[row_i] = j
+        elif row_j is not None:
+            self._rows[row_j] = i
+
+    def _visible(self, cfg):
+        return not self.query.strip() or self.index.matches(cfg['name'], self.query)
+
+    def _row_of(self, index):
+        row = bisect_left(self._rows, index)
+        if row < len(self._rows) and self._rows[row] == index:
+            return row
+        return None
+
+    def _set_row(self, row, text):
+        if self._labels[row] == text:
+            return
+        selected = self.listbox.selection_includes(row)
+        self.listbox.delete(row)
+        self.listbox.insert(row, text)
+        self._labels[row] = text
+        if selected:
+            self.listbox.selection_set(row)
+
+    def _populate(self, count):
+        self._populate_job = None
+        configurations = self.config['configurations']
+        start = len(self._labels)
+        labels = [self.label(configurations[index]) for index in self._rows[start:start + count]]
+        if labels:
+            self.listbox.insert(tk.END, *labels)
+            self._labels.extend(labels)
+        if len(self._labels) < len(self._rows):
+            self._populate_job = self.listbox.after(1, self._populate, CHUNK_SIZE)
+
+    def _finish_population(self):
+        if self._populate_job is not None:
+            self._cancel_population()
+            self._populate(len(self._rows))
+
+    def _cancel_population(self):
+        if self._populate_job is not None:
+            self.listbox.after_cancel(self._populate_job)
+            self._populate_job = None
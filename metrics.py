@@ -0,0 +1,113 @@
+import bisect
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in milliseconds, roughly logarithmic; the last bucket is open-ended
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+# Fixed-bucket latency histogram. Constant memory however many samples are recorded; percentiles
+# are reported as the upper bound of the bucket they fall into.
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.mean, 3),
+            'min_ms': round(self.min or 0.0, 3),
+            'p50_ms': round(self.percentile(0.5), 3),
+            'p95_ms': round(self.percentile(0.95), 3),
+            'p99_ms': round(self.percentile(0.99), 3),
+            'max_ms': round(self.max or 0.0, 3),
+            'buckets': {(f"<={bound}" if i < len(BUCKETS_MS) else f">{BUCKETS_MS[-1]}"): count
+                        for i, (bound, count) in enumerate(zip(BUCKETS_MS + (None,), self.counts)) if count},
+        }
+
+
+# Named histograms for the app's hot paths (config load/save, realmlist writes, launches).
+# Recording is a lock and a few additions, so it is cheap enough to leave on all the time.
+class Metrics:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, ms):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(ms)
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - started) * 1000.0)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: histogram.to_dict() for name, histogram in sorted(self._histograms.items())}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=4)
+
+    def export(self, path):
+        with open(path, 'w') as f:
+            f.write(self.to_json())
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    # One line per metric for the diagnostics window
+    def describe(self):
+        return [f"{name}: n={data['count']}  mean {data['mean_ms']:.1f} ms  p50 {data['p50_ms']:.1f}  "
+                f"p95 {data['p95_ms']:.1f}  max {data['max_ms']:.1f}"
+                for name, data in self.snapshot().items()]
+
+
+metrics = Metrics()
+
+
+# Decorator recording every call's duration under `name`
+def timed(name):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
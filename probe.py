@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+DEFAULT_AUTH_PORT = 3724
+DEFAULT_TIMEOUT = 3.0
+DEFAULT_TTL = 120.0
+# Upper bound on simultaneously open sockets so huge lists don't exhaust file descriptors
+DEFAULT_CONCURRENCY = 256
+
+
+@dataclass
+class ProbeResult:
+    host: str
+    port: int
+    reachable: bool
+    latency_ms: Optional[float]
+    error: Optional[str]
+    timestamp: float
+
+
+# Split "host", "host:port" or "[ipv6]:port" into host and port
+def parse_server_address(server_address, default_port=DEFAULT_AUTH_PORT):
+    address = server_address.strip()
+    if address.startswith('['):
+        host, _, rest = address[1:].partition(']')
+        if rest.startswith(':') and rest[1:].isdigit():
+            return host, int(rest[1:])
+        return host, default_port
+    if address.count(':') == 1:
+        host, _, port_text = address.partition(':')
+        if port_text.isdigit():
+            return host, int(port_text)
+    return address, default_port
+
+
+# Work out which host/port to probe for a configuration
+def probe_target(cfg, port=None):
+    default_port = port or cfg.get('auth_port') or DEFAULT_AUTH_PORT
+    return parse_server_address(cfg.get('server_address', ''), int(default_port))
+
+
+# Thread-safe cache of probe results keyed by (host, port), or by the key given to put()
+class ProbeCache:
+    def __init__(self, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._results = {}
+        self._lock = threading.Lock()
+
+    # Current time on the cache's clock; results stored here are timestamped with it
+    def now(self):
+        return self._clock()
+
+    def get(self, key):
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                return None
+            if self._clock() - result.timestamp > self.ttl:
+                del self._results[key]
+                return None
+            return result
+
+    def put(self, result, key=None):
+        with self._lock:
+            self._results[key if key is not None else (result.host, result.port)] = result
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+async def probe_one(host, port, timeout=DEFAULT_TIMEOUT, clock=time.monotonic):
+    started = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except asyncio.TimeoutError:
+        return ProbeResult(host, port, False, None, f"timed out after {timeout:g}s", clock())
+    except OSError as e:
+        return ProbeResult(host, port, False, None, str(e) or e.__class__.__name__, clock())
+    latency_ms = (time.perf_counter() - started) * 1000.0
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return ProbeResult(host, port, True, latency_ms, None, clock())
+
+
+# Probe every (host, port) pair at the same time, bounded by `concurrency`
+async def probe_many(targets, timeout=DEFAULT_TIMEOUT, concurrency=DEFAULT_CONCURRENCY, clock=time.monotonic):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(host, port):
+        async with semaphore:
+            return await probe_one(host, port, timeout, clock)
+
+    unique_targets = list(dict.fromkeys(targets))
+    results = await asyncio.gather(*(bounded(host, port) for host, port in unique_targets))
+    return {(r.host, r.port): r for r in results}
+
+
+# Probe all configurations concurrently and return {name: ProbeResult}.
+# Fresh results are served from `cache`; everything else is probed in one asyncio run.
+def probe_configurations(configurations, port=None, timeout=DEFAULT_TIMEOUT, cache=None,
+                         concurrency=DEFAULT_CONCURRENCY):
+    targets = {}
+    for cfg in configurations:
+        if cfg.get('server_address'):
+            targets[cfg['name']] = probe_target(cfg, port)
+
+    known = {}
+    missing = []
+    for target in set(targets.values()):
+        cached = cache.get(target) if cache is not None else None
+        if cached is not None:
+            known[target] = cached
+        else:
+            missing.append(target)
+
+    if missing:
+        clock = cache.now if cache is not None else time.monotonic
+        started = time.perf_counter()
+        fresh = asyncio.run(probe_many(missing, timeout, concurrency, clock))
+        logging.info(f"Probed {len(missing)} server(s) in {time.perf_counter() - started:.2f}s "
+                     f"({len(known)} served from cache).")
+        for result in fresh.values():
+            if cache is not None:
+                cache.put(result)
+        known.update(fresh)
+
+    return {name: known[target] for name, target in targets.items()}
+
+
+# Order configurations by measured latency: reachable first (fastest on top),
+# then unreachable, then anything that was not probed. The sort is stable.
+def sort_by_latency(configurations, results):
+    def key(cfg):
+        result = results.get(cfg['name'])
+        if result is None:
+            return (2, 0.0)
+        if not result.reachable:
+            return (1, 0.0)
+        return (0, result.latency_ms)
+
+    return sorted(configurations, key=key)
+
+
+# Short annotation shown next to a configuration in the Listbox
+def format_probe_result(result):
+    if result is None:
+        return ""
+    if result.reachable:
+        return f"{result.latency_ms:.0f} ms"
+    return "unreachable"
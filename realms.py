@@ -0,0 +1,313 @@
+import asyncio
+import hashlib
+import logging
+import os
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from probe import DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, probe_target
+
+CMD_AUTH_LOGON_CHALLENGE = 0x00
+CMD_AUTH_LOGON_PROOF = 0x01
+CMD_REALM_LIST = 0x10
+
+# Client build announced for each version option: (major, minor, patch, build, protocol version)
+CLIENT_BUILDS = {
+    "Vanilla (1.12.x)": (1, 12, 1, 5875, 3),
+    "The Burning Crusade (2.4.3)": (2, 4, 3, 8606, 8),
+    "Wrath of the Lich King (3.3.5)": (3, 3, 5, 12340, 8),
+    "Cataclysm (4.3.4)": (4, 3, 4, 15595, 8),
+}
+
+# Result codes of the logon challenge and proof
+LOGON_RESULTS = {
+    0x03: "account banned",
+    0x04: "unknown account",
+    0x05: "incorrect password",
+    0x06: "account already online",
+    0x07: "no game time left",
+    0x08: "server busy",
+    0x09: "client version not accepted",
+    0x0A: "client download required",
+    0x0C: "account suspended",
+    0x10: "account locked",
+}
+
+REALM_TYPES = {0: "Normal", 1: "PvP", 4: "Normal", 6: "RP", 8: "RP-PvP"}
+REALM_FLAG_OFFLINE = 0x02
+REALM_FLAG_SPECIFY_BUILD = 0x04
+REALM_FLAG_FULL = 0x80
+
+# The client's SRP6 multiplier
+SRP6_K = 3
+
+# Cached results older than this are queried again
+DEFAULT_TTL = 300.0
+
+
+@dataclass
+class Realm:
+    name: str
+    address: str
+    type: str
+    flags: int
+    population: float
+    characters: int = 0
+    locked: bool = False
+
+    @property
+    def online(self):
+        return not self.flags & REALM_FLAG_OFFLINE
+
+    @property
+    def population_label(self):
+        if not self.online:
+            return "Offline"
+        if self.flags & REALM_FLAG_FULL:
+            return "Full"
+        if self.population >= 2.0:
+            return "High"
+        if self.population >= 1.0:
+            return "Medium"
+        return "Low"
+
+
+# What the auth server behind a configuration told us. `status` is "realms" when the realm list
+# was fetched, "up" when the server answered the logon challenge but no login was possible
+# (no credentials configured), and "error" otherwise.
+@dataclass
+class RealmQueryResult:
+    host: str
+    port: int
+    status: str
+    realms: list = field(default_factory=list)
+    error: Optional[str] = None
+    latency_ms: Optional[float] = None
+    timestamp: float = 0.0
+
+    @property
+    def reachable(self):
+        return self.status != "error"
+
+
+class AuthError(Exception):
+    pass
+
+
+def _int(data):
+    return int.from_bytes(data, 'little')
+
+
+def _bytes(number, length=32):
+    return number.to_bytes(length, 'little')
+
+
+def _sha1(*parts):
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part)
+    return digest.digest()
+
+
+def build_logon_challenge(account, version):
+    major, minor, patch, build, protocol = CLIENT_BUILDS.get(version, CLIENT_BUILDS["Vanilla (1.12.x)"])
+    account = account.upper().encode()
+    body = (b'WoW\0' + bytes([major, minor, patch]) + struct.pack('<H', build)
+            + b'68x\0' + b'niW\0' + b'SUne' + struct.pack('<iI', 0, 0x0100007F)
+            + bytes([len(account)]) + account)
+    return struct.pack('<BBH', CMD_AUTH_LOGON_CHALLENGE, protocol, len(body)) + body
+
+
+# Client side of the server's SRP6 challenge: returns (A, M1, session key K), all little-endian bytes
+def srp6_client_proof(account, password, B, g, N, salt, a=None):
+    account, password = account.upper().encode(), password.upper().encode()
+    n, g_value, b_value = _int(N), _int(g), _int(B)
+    if n == 0 or g_value == 0 or b_value % n == 0:
+        raise AuthError("server sent an invalid SRP6 challenge")
+    x = _int(_sha1(salt, _sha1(account, b':', password)))
+    a = a if a is not None else _int(os.urandom(19))
+    A = _bytes(pow(g_value, a, n), len(N))
+    u = _int(_sha1(A, B))
+    S = _bytes(pow(b_value - SRP6_K * pow(g_value, x, n), a + u * x, n), len(N))
+    # Session key: SHA1 of the even and odd bytes of S, interleaved
+    even, odd = _sha1(S[0::2]), _sha1(S[1::2])
+    K = bytes(byte for pair in zip(even, odd) for byte in pair)
+    n_hash, g_hash = _sha1(N), _sha1(g)
+    M1 = _sha1(bytes(x ^ y for x, y in zip(n_hash, g_hash)), _sha1(account), salt, A, B, K)
+    return A, M1, K
+
+
+def _cstring(payload, offset):
+    end = payload.index(b'\0', offset)
+    return payload[offset:end].decode('utf-8', errors='replace'), end + 1
+
+
+# Parse the body of a REALM_LIST response (after cmd and size); the layout changed in 2.x
+def parse_realm_list(payload, major):
+    offset = 4  # unused
+    if major < 2:
+        count = payload[offset]
+        offset += 1
+    else:
+        count = struct.unpack_from('<H', payload, offset)[0]
+        offset += 2
+    realms = []
+    for _ in range(count):
+        if major < 2:
+            realm_type, flags = struct.unpack_from('<IB', payload, offset)
+            locked = False
+            offset += 5
+        else:
+            realm_type, locked, flags = struct.unpack_from('<BBB', payload, offset)
+            offset += 3
+        name, offset = _cstring(payload, offset)
+        address, offset = _cstring(payload, offset)
+        population, characters = struct.unpack_from('<fB', payload, offset)
+        offset += 7  # population, characters, timezone, realm id
+        if major >= 2 and flags & REALM_FLAG_SPECIFY_BUILD:
+            offset += 5
+        realms.append(Realm(name, address, REALM_TYPES.get(realm_type, str(realm_type)), flags, population,
+                            characters, bool(locked)))
+    return realms
+
+
+async def _handshake(reader, writer, account, password, version):
+    major = CLIENT_BUILDS.get(version, CLIENT_BUILDS["Vanilla (1.12.x)"])[0]
+    # Without credentials any name will do: the answer alone shows the server is up
+    writer.write(build_logon_challenge(account or "REALMLIST", version))
+    await writer.drain()
+    command, _, result = await reader.readexactly(3)
+    if command != CMD_AUTH_LOGON_CHALLENGE:
+        raise AuthError(f"unexpected reply {command:#04x} to the logon challenge")
+    if not account or not password:
+        return "up", [], None
+    if result != 0:
+        raise AuthError(LOGON_RESULTS.get(result, f"login refused ({result:#04x})"))
+
+    B = await reader.readexactly(32)
+    g = await reader.readexactly((await reader.readexactly(1))[0])
+    N = await reader.readexactly((await reader.readexactly(1))[0])
+    salt = await reader.readexactly(32)
+    await reader.readexactly(16)  # client file checksum seed
+    if (await reader.readexactly(1))[0]:
+        raise AuthError("two-factor login is not supported")
+
+    A, M1, K = srp6_client_proof(account, password, B, g, N, salt)
+    writer.write(bytes([CMD_AUTH_LOGON_PROOF]) + A + M1 + bytes(20) + b'\0\0')
+    await writer.drain()
+    command, result = await reader.readexactly(2)
+    if command != CMD_AUTH_LOGON_PROOF:
+        raise AuthError(f"unexpected reply {command:#04x} to the logon proof")
+    if result != 0:
+        raise AuthError(LOGON_RESULTS.get(result, f"login refused ({result:#04x})"))
+    M2 = await reader.readexactly(20)
+    await reader.readexactly(4 if major < 2 else 10)
+    if M2 != _sha1(A, M1, K):
+        raise AuthError("server proof did not match")
+
+    writer.write(bytes([CMD_REALM_LIST]) + bytes(4))
+    await writer.drain()
+    command, size = struct.unpack('<BH', await reader.readexactly(3))
+    if command != CMD_REALM_LIST:
+        raise AuthError(f"unexpected reply {command:#04x} to the realm list request")
+    return "realms", parse_realm_list(await reader.readexactly(size), major), None
+
+
+# Logon challenge (plus SRP6 login and REALM_LIST when credentials are given) against one server
+async def query_realms(host, port, account=None, password=None, version="Vanilla (1.12.x)",
+                       timeout=DEFAULT_TIMEOUT, clock=time.monotonic):
+    started = time.perf_counter()
+    writer = None
+    try:
+        async def run():
+            nonlocal writer
+            reader, writer = await asyncio.open_connection(host, port)
+            connected = (time.perf_counter() - started) * 1000.0
+            return connected, await _handshake(reader, writer, account, password, version)
+
+        latency_ms, (status, realms, error) = await asyncio.wait_for(run(), timeout)
+        return RealmQueryResult(host, port, status, realms, error, latency_ms, clock())
+    except asyncio.TimeoutError:
+        error = f"timed out after {timeout:g}s"
+    except asyncio.IncompleteReadError:
+        error = "connection closed by the server"
+    except (AuthError, ValueError, IndexError, struct.error) as e:
+        error = str(e) or e.__class__.__name__
+    except OSError as e:
+        error = str(e) or e.__class__.__name__
+    except Exception as e:
+        # Whatever a broken server sends, it must not fail the queries of every other server
+        logging.warning(f"Unexpected error querying {host}:{port}: {e!r}")
+        error = f"unexpected reply ({e.__class__.__name__})"
+    finally:
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+    return RealmQueryResult(host, port, "error", [], error, None, clock())
+
+
+# What to query for a configuration; configurations with the same target share one query
+def query_target(cfg):
+    host, port = probe_target(cfg)
+    return host, port, cfg.get('auth_account') or None, cfg.get('auth_password') or None, cfg.get('version', '')
+
+
+# Query every configuration's auth server concurrently and return {name: RealmQueryResult}.
+# Each server gets its own `timeout`; fresh results are served from `cache` (a probe.ProbeCache).
+def query_configurations(configurations, timeout=DEFAULT_TIMEOUT, cache=None, concurrency=DEFAULT_CONCURRENCY):
+    targets = {cfg['name']: query_target(cfg) for cfg in configurations if cfg.get('server_address')}
+    known = {}
+    missing = []
+    for target in set(targets.values()):
+        cached = cache.get(target) if cache is not None else None
+        if cached is not None:
+            known[target] = cached
+        else:
+            missing.append(target)
+
+    if missing:
+        clock = cache.now if cache is not None else time.monotonic
+
+        async def run_all():
+            limit = asyncio.Semaphore(concurrency)
+
+            async def bounded(target):
+                host, port, account, password, version = target
+                async with limit:
+                    return target, await query_realms(host, port, account, password, version, timeout, clock)
+
+            return await asyncio.gather(*(bounded(target) for target in missing))
+
+        started = time.perf_counter()
+        for target, result in asyncio.run(run_all()):
+            if cache is not None:
+                cache.put(result, key=target)
+            known[target] = result
+        logging.info(f"Queried {len(missing)} auth server(s) in {time.perf_counter() - started:.2f}s "
+                     f"({len(targets) - len(missing)} served from cache).")
+
+    return {name: known[target] for name, target in targets.items()}
+
+
+# Short annotation shown next to a configuration in the Listbox
+def format_realm_result(result):
+    if result is None:
+        return ""
+    if result.status == "error":
+        return f"auth: {result.error}"
+    if result.status == "up":
+        return "auth up"
+    if not result.realms:
+        return "no realms"
+    online = [realm for realm in result.realms if realm.online]
+    if len(result.realms) == 1:
+        realm = result.realms[0]
+        return f"{realm.name}: {realm.population_label}"
+    busiest = max(online, key=lambda realm: realm.population, default=None)
+    summary = f"{len(online)}/{len(result.realms)} realms up"
+    return f"{summary}, {busiest.name}: {busiest.population_label}" if busiest else summary
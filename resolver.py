@@ -0,0 +1,314 @@
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from probe import DEFAULT_CONCURRENCY, parse_server_address
+
+DEFAULT_TIMEOUT = 3.0
+# Used when the answer carries no TTL (system resolver); records are kept between these bounds
+DEFAULT_TTL = 300.0
+MIN_TTL = 30.0
+MAX_TTL = 24 * 3600.0
+# Failed lookups are retried after this long
+NEGATIVE_TTL = 30.0
+# Time allowed for the DNS server to answer before falling back to the system resolver
+DNS_QUERY_TIMEOUT = 1.0
+RESOLV_CONF = '/etc/resolv.conf'
+
+TYPE_A = 1
+TYPE_CNAME = 5
+RCODE_NXDOMAIN = 3
+
+
+@dataclass
+class Resolution:
+    host: str
+    addresses: list = field(default_factory=list)
+    ttl: float = NEGATIVE_TTL
+    latency_ms: Optional[float] = None
+    error: Optional[str] = None
+    timestamp: float = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None and bool(self.addresses)
+
+    # Address written in place of the hostname: the first IPv4 one, which every client understands
+    @property
+    def address(self):
+        for address in self.addresses:
+            if ':' not in address:
+                return address
+        return self.addresses[0] if self.addresses else None
+
+
+# Thread-safe cache of resolutions keyed by hostname; each entry expires after its own TTL
+class ResolutionCache:
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._results = {}
+        self._lock = threading.Lock()
+
+    # Current time on the cache's clock; resolutions stored here are timestamped with it
+    def now(self):
+        return self._clock()
+
+    def get(self, host):
+        key = host.lower()
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                return None
+            if self._clock() - result.timestamp > result.ttl:
+                del self._results[key]
+                return None
+            return result
+
+    def put(self, result):
+        with self._lock:
+            self._results[result.host.lower()] = result
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+def _is_ip(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+# The operating system's resolver (hosts file, mDNS, ...). It does not report TTLs.
+class SystemResolver:
+    async def resolve(self, host):
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        return list(dict.fromkeys(info[4][0] for info in infos)), None
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, future):
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+def build_query(query_id, host):
+    question = b''.join(bytes([len(label)]) + label for label in host.rstrip('.').encode('idna').split(b'.'))
+    return struct.pack('>HHHHHH', query_id, 0x0100, 1, 0, 0, 0) + question + b'\0' + struct.pack('>HH', TYPE_A, 1)
+
+
+def _skip_name(data, offset):
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        if length == 0:
+            return offset + 1
+        offset += 1 + length
+
+
+# (IPv4 addresses, lowest TTL along the answer chain) from a DNS response; raises OSError if there are none
+def parse_response(data, query_id):
+    response_id, flags, questions, answers = struct.unpack_from('>HHHH', data)
+    if response_id != query_id:
+        raise OSError("DNS answer does not match the query")
+    if flags & 0x0200:
+        raise OSError("DNS answer truncated")
+    if flags & 0x000F == RCODE_NXDOMAIN:
+        raise OSError("no such host")
+    if flags & 0x000F:
+        raise OSError(f"DNS error {flags & 0x000F}")
+    offset = 12
+    for _ in range(questions):
+        offset = _skip_name(data, offset) + 4
+    addresses, ttls = [], []
+    for _ in range(answers):
+        offset = _skip_name(data, offset)
+        record_type, _, ttl, length = struct.unpack_from('>HHIH', data, offset)
+        offset += 10
+        if record_type == TYPE_A and length == 4:
+            addresses.append(socket.inet_ntoa(data[offset:offset + 4]))
+            ttls.append(ttl)
+        elif record_type == TYPE_CNAME:
+            ttls.append(ttl)
+        offset += length
+    if not addresses:
+        raise OSError("no address records")
+    return addresses, min(ttls)
+
+
+# Asks a DNS server directly (UDP), which is the only way to learn the record's TTL. Anything it
+# can't answer (hosts-file names, NXDOMAIN, truncation, no reply) goes to `fallback`.
+class DnsResolver:
+    def __init__(self, nameserver, port=53, fallback=None, query_timeout=DNS_QUERY_TIMEOUT):
+        self.nameserver = nameserver
+        self.port = port
+        self.fallback = fallback
+        self.query_timeout = query_timeout
+
+    async def query(self, host):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        query_id = int.from_bytes(os.urandom(2), 'big')
+        transport, _ = await loop.create_datagram_endpoint(lambda: _DatagramProtocol(future),
+                                                           remote_addr=(self.nameserver, self.port))
+        try:
+            transport.sendto(build_query(query_id, host))
+            data = await asyncio.wait_for(future, self.query_timeout)
+        finally:
+            transport.close()
+        return parse_response(data, query_id)
+
+    async def resolve(self, host):
+        try:
+            return await self.query(host)
+        except (OSError, asyncio.TimeoutError, struct.error, IndexError, UnicodeError) as e:
+            if self.fallback is None:
+                raise OSError(str(e) or e.__class__.__name__) from e
+            return await self.fallback.resolve(host)
+
+
+def system_nameservers(path=RESOLV_CONF):
+    nameservers = []
+    try:
+        with open(path, 'r', errors='replace') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == 'nameserver':
+                    nameservers.append(parts[1])
+    except OSError:
+        pass
+    return nameservers
+
+
+# Query the configured DNS server where there is one (Linux/macOS), otherwise use the system resolver
+def default_resolver():
+    nameservers = system_nameservers()
+    if nameservers:
+        return DnsResolver(nameservers[0], fallback=SystemResolver())
+    return SystemResolver()
+
+
+async def resolve_one(host, resolver, timeout=DEFAULT_TIMEOUT, clock=time.monotonic):
+    if _is_ip(host):
+        return Resolution(host, [host], MAX_TTL, 0.0, None, clock())
+    started = time.perf_counter()
+    try:
+        addresses, ttl = await asyncio.wait_for(resolver.resolve(host), timeout)
+    except asyncio.TimeoutError:
+        return Resolution(host, error=f"timed out after {timeout:g}s", timestamp=clock())
+    except (OSError, UnicodeError) as e:
+        return Resolution(host, error=str(e) or e.__class__.__name__, timestamp=clock())
+    if not addresses:
+        return Resolution(host, error="no addresses", timestamp=clock())
+    latency_ms = (time.perf_counter() - started) * 1000.0
+    ttl = DEFAULT_TTL if ttl is None else min(max(float(ttl), MIN_TTL), MAX_TTL)
+    return Resolution(host, addresses, ttl, latency_ms, None, clock())
+
+
+# Hostnames of a configuration's server and portal addresses (without ports)
+def configuration_hosts(cfg):
+    hosts = []
+    for key in ('server_address', 'portal_address'):
+        if cfg.get(key):
+            hosts.append(parse_server_address(cfg[key])[0])
+    return hosts
+
+
+# Resolve every hostname at once and return {host: Resolution}; fresh results come from `cache`
+def resolve_hosts(hosts, resolver=None, timeout=DEFAULT_TIMEOUT, cache=None, concurrency=DEFAULT_CONCURRENCY):
+    known = {}
+    missing = []
+    for host in dict.fromkeys(hosts):
+        cached = cache.get(host) if cache is not None else None
+        if cached is not None:
+            known[host] = cached
+        else:
+            missing.append(host)
+
+    if missing:
+        resolver = resolver or default_resolver()
+        clock = cache.now if cache is not None else time.monotonic
+
+        async def run_all():
+            limit = asyncio.Semaphore(concurrency)
+
+            async def bounded(host):
+                async with limit:
+                    return await resolve_one(host, resolver, timeout, clock)
+
+            return await asyncio.gather(*(bounded(host) for host in missing))
+
+        started = time.perf_counter()
+        for result in asyncio.run(run_all()):
+            if cache is not None:
+                cache.put(result)
+            known[result.host] = result
+        failed = sum(1 for host in missing if not known[host].ok)
+        logging.info(f"Resolved {len(missing)} hostname(s) in {time.perf_counter() - started:.2f}s, {failed} failed "
+                     f"({len(known) - len(missing)} served from cache).")
+    return known
+
+
+# The resolution that matters most for a launch: a failure before a success, then the slower lookup
+def _worst(results):
+    return min(results, key=lambda result: (result.ok, -(result.latency_ms or 0.0)))
+
+
+# Resolve the server and portal addresses of every configuration; returns {name: Resolution}, the
+# worse of the two lookups, so a failing portal shows up even when the server resolves
+def resolve_configurations(configurations, resolver=None, timeout=DEFAULT_TIMEOUT, cache=None,
+                           concurrency=DEFAULT_CONCURRENCY):
+    configurations = [cfg for cfg in configurations if cfg.get('server_address')]
+    hosts = [host for cfg in configurations for host in configuration_hosts(cfg)]
+    results = resolve_hosts(hosts, resolver, timeout, cache, concurrency)
+    return {cfg['name']: _worst([results[host] for host in configuration_hosts(cfg)]) for cfg in configurations}
+
+
+# `address` ("host" or "host:port") with the host replaced by its resolved IP, or unchanged if
+# the lookup fails. Uses `cache` when it has a fresh answer.
+def pin_address(address, resolver=None, cache=None, timeout=DEFAULT_TIMEOUT):
+    if not address:
+        return address
+    host, port = parse_server_address(address)
+    result = resolve_hosts([host], resolver, timeout, cache)[host]
+    if not result.ok:
+        logging.warning(f"Could not resolve {host} ({result.error}); writing the hostname instead.")
+        return address
+    ip = result.address
+    if ip == host:
+        return address
+    if ':' in ip:
+        ip = f"[{ip}]"
+    return f"{ip}:{port}" if address.strip() != host else ip
+
+
+# Shared by every launch in this process; the GUI fills it in the background
+default_cache = ResolutionCache()
+
+
+# Annotation shown next to a configuration in the Listbox
+def format_resolution(result):
+    if result is None:
+        return ""
+    if not result.ok:
+        return f"dns: {result.error}"
+    if _is_ip(result.host):
+        return ""
+    return f"dns {result.latency_ms:.0f} ms"
@@ -0,0 +1,190 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+
+from core import read_realmlist
+from fingerprint import detect_build
+from store import atomic_write
+
+SCAN_CACHE_FILE = 'scan_cache.json'
+DEFAULT_SCAN_WORKERS = 16
+
+# Client executables we recognise (compared case-insensitively)
+EXECUTABLES = {'wow.exe', 'wow-64.exe'}
+REALMLIST = 'realmlist.wtf'
+# Directory names never worth descending into
+SKIPPED_PREFIXES = ('.', '$')
+SKIPPED_NAMES = {'system volume information', 'node_modules', '__pycache__'}
+
+
+@dataclass
+class Installation:
+    path: str
+    wow_exe_path: str
+    realmlist_paths: list = field(default_factory=list)
+
+
+# Directory listings keyed by path and validated by the directory's mtime.
+#
+# A directory's mtime changes when entries are added, removed or renamed in it, so an unchanged
+# mtime means the cached listing is still right and the directory needn't be read again. Changes
+# deeper down don't bubble up, so a rescan still stat()s every directory, but that is far cheaper
+# than listing it.
+class ScanCache:
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, mtime_ns):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == mtime_ns:
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+            return None
+
+    def put(self, path, mtime_ns, subdirs, files):
+        with self._lock:
+            self._entries[path] = (mtime_ns, subdirs, files)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @classmethod
+    def load(cls, path=SCAN_CACHE_FILE):
+        cache = cls()
+        try:
+            with open(path, 'r') as f:
+                for directory, (mtime_ns, subdirs, files) in json.load(f).items():
+                    cache._entries[directory] = (mtime_ns, tuple(subdirs), tuple(files))
+        except FileNotFoundError:
+            pass
+        except (ValueError, TypeError) as e:
+            logging.warning(f"Ignoring unreadable scan cache '{path}': {e}")
+        return cache
+
+    def save(self, path=SCAN_CACHE_FILE):
+        with self._lock:
+            data = {directory: [mtime_ns, list(subdirs), list(files)]
+                    for directory, (mtime_ns, subdirs, files) in self._entries.items()}
+        atomic_write(path, json.dumps(data))
+
+
+# (subdirectory names, interesting file names) of a directory, from the cache when its mtime is unchanged
+def list_directory(path, cache):
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return (), ()
+    cached = cache.get(path, mtime_ns)
+    if cached is not None:
+        return cached
+
+    subdirs, files = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.name.lower() in EXECUTABLES or entry.name.lower() == REALMLIST:
+                        files.append(entry.name)
+                except OSError:
+                    continue
+    except OSError as e:
+        logging.warning(f"Cannot scan {path}: {e}")
+        return (), ()
+    listing = (tuple(subdirs), tuple(files))
+    cache.put(path, mtime_ns, *listing)
+    return listing
+
+
+def _find(names, wanted):
+    wanted = {name.lower() for name in wanted}
+    return [name for name in names if name.lower() in wanted]
+
+
+# Realmlist files of an installation: <install>/realmlist.wtf (up to TBC) and
+# <install>/Data/<locale>/realmlist.wtf (WotLK and later)
+def _realmlists(path, subdirs, files, cache):
+    realmlists = [os.path.join(path, name) for name in _find(files, [REALMLIST])]
+    for data_dir in _find(subdirs, ['data']):
+        data_path = os.path.join(path, data_dir)
+        for locale in list_directory(data_path, cache)[0]:
+            locale_path = os.path.join(data_path, locale)
+            realmlists.extend(os.path.join(locale_path, name)
+                              for name in _find(list_directory(locale_path, cache)[1], [REALMLIST]))
+    return realmlists
+
+
+def _scan_directory(path, cache):
+    subdirs, files = list_directory(path, cache)
+    executables = _find(files, EXECUTABLES)
+    if executables:
+        # Found a client: don't descend into its (huge) Data tree any further
+        installation = Installation(path, os.path.join(path, sorted(executables)[0]),
+                                    _realmlists(path, subdirs, files, cache))
+        return installation, []
+    children = [os.path.join(path, name) for name in subdirs
+                if not name.startswith(SKIPPED_PREFIXES) and name.lower() not in SKIPPED_NAMES]
+    return None, children
+
+
+# Walk `roots` in parallel and return every WoW installation found, sorted by path
+def scan_installations(roots, cache=None, max_workers=DEFAULT_SCAN_WORKERS):
+    cache = cache if cache is not None else ScanCache()
+    started = time.perf_counter()
+    installations = []
+    directories = 0
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scan") as executor:
+        pending = {executor.submit(_scan_directory, os.path.abspath(root), cache) for root in roots}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                installation, children = future.result()
+                directories += 1
+                if installation is not None:
+                    installations.append(installation)
+                pending.update(executor.submit(_scan_directory, child, cache) for child in children)
+
+    logging.info(f"Scanned {directories} directories in {time.perf_counter() - started:.2f}s "
+                 f"({cache.hits} cached), found {len(installations)} installation(s).")
+    return sorted(installations, key=lambda installation: installation.path)
+
+
+# Turn scan results into new configurations, skipping clients that are already configured.
+# Server and portal are taken from the realmlist file as it is today, and the version from WoW.exe's
+# version resource (`default_version` when it can't be detected).
+def propose_configurations(installations, existing_configurations, default_version="Vanilla (1.12.x)"):
+    known = {(cfg.get('wow_exe_path'), cfg.get('realmlist_path')) for cfg in existing_configurations}
+    names = {cfg['name'] for cfg in existing_configurations}
+    proposals = []
+    for installation in installations:
+        build = detect_build(installation.wow_exe_path)
+        version = build.version if build is not None and build.version else default_version
+        for realmlist_path in installation.realmlist_paths:
+            if (installation.wow_exe_path, realmlist_path) in known:
+                continue
+            settings = read_realmlist(realmlist_path)
+            name = base = os.path.basename(installation.path) or installation.path
+            suffix = 2
+            while name in names:
+                name = f"{base} ({suffix})"
+                suffix += 1
+            names.add(name)
+            proposals.append({
+                'name': name,
+                'realmlist_path': realmlist_path,
+                'wow_exe_path': installation.wow_exe_path,
+                'server_address': settings.get('realmlist', ''),
+                'portal_address': settings.get('portal', ''),
+                'version': version
+            })
+    return proposals
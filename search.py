@@ -0,0 +1,87 @@
+from collections import defaultdict
+
+# Fields a configuration can be found by
+SEARCH_FIELDS = ('name', 'server_address', 'version')
+NGRAM = 3
+
+
+def _searchable_text(cfg):
+    return '\n'.join(str(cfg.get(field, '')) for field in SEARCH_FIELDS).lower()
+
+
+def _ngrams(text):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+# Case-insensitive substring index over name, server address and version.
+#
+# Queries of three or more characters intersect trigram posting sets and only verify the
+# few surviving candidates; shorter queries scan the precomputed lowercase text. A query that
+# extends the previous one (the usual "typing" case) only searches the previous matches.
+class SearchIndex:
+    def __init__(self, configurations=()):
+        self._texts = {}
+        self._postings = defaultdict(set)
+        self._last_query = None
+        self._last_matches = None
+        for cfg in configurations:
+            self.add(cfg)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, cfg):
+        name = cfg['name']
+        if name in self._texts:
+            self.remove(name)
+        text = _searchable_text(cfg)
+        self._texts[name] = text
+        for gram in _ngrams(text):
+            self._postings[gram].add(name)
+        self._invalidate()
+
+    def remove(self, name):
+        text = self._texts.pop(name, None)
+        if text is None:
+            return
+        for gram in _ngrams(text):
+            names = self._postings[gram]
+            names.discard(name)
+            if not names:
+                del self._postings[gram]
+        self._invalidate()
+
+    def update(self, old_name, cfg):
+        self.remove(old_name)
+        self.add(cfg)
+
+    # Whether an indexed configuration matches `query`, without running a full search
+    def matches(self, name, query):
+        query = query.strip().lower()
+        return name in self._texts and query in self._texts[name]
+
+    # Return the set of configuration names matching `query` (all names for an empty query)
+    def search(self, query):
+        query = query.strip().lower()
+        if not query:
+            return set(self._texts)
+
+        if self._last_query is not None and query.startswith(self._last_query):
+            candidates = self._last_matches
+        elif len(query) >= NGRAM:
+            grams = sorted(_ngrams(query), key=lambda gram: len(self._postings.get(gram, ())))
+            candidates = set(self._postings.get(grams[0], ()))
+            for gram in grams[1:]:
+                if not candidates:
+                    break
+                candidates &= self._postings.get(gram, set())
+        else:
+            candidates = self._texts.keys()
+
+        matches = {name for name in candidates if query in self._texts[name]}
+        self._last_query, self._last_matches = query, matches
+        return set(matches)
+
+    def _invalidate(self):
+        self._last_query = None
+        self._last_matches = None
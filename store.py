@@ -0,0 +1,644 @@
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+from metrics import timed
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Compact the journal into the snapshot after this many records (or once it outgrows the list, whichever is larger)
+DEFAULT_COMPACT_EVERY = 500
+# Permissions for files created by atomic_write (existing files keep theirs)
+DEFAULT_FILE_MODE = 0o644
+# Quiet period the background writer waits for before flushing a burst of mutations
+DEFAULT_FLUSH_DELAY = 0.5
+# A continuous burst is still flushed at least this often
+DEFAULT_MAX_FLUSH_DELAY = 2.0
+
+
+# Read a config.json snapshot, returning an empty configuration list if it doesn't exist
+def read_snapshot(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logging.warning(f"Config file '{path}' not found. Creating a new one.")
+        return {'configurations': []}
+
+
+# Replace `path` atomically with `data`: temp file in the same directory, fsync, then rename.
+# A crash mid-write leaves the previous file untouched.
+def atomic_write(path, data, mode='w'):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        # mkstemp creates the file 0600; keep the permissions of the file being replaced
+        try:
+            os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            os.chmod(temp_path, DEFAULT_FILE_MODE)
+        with os.fdopen(fd, mode) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+
+def write_snapshot(path, config):
+    atomic_write(path, json.dumps(config, indent=4))
+
+
+# Advisory lock shared by every process using the same config.json (other app instances, the CLI).
+# Writers take it exclusively, readers shared; Windows only has exclusive locks.
+@contextmanager
+def file_lock(path, shared=False):
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Identity of the snapshot file on disk; atomic replacement always changes it
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+# What changed between two lists of configurations, for updating a view in place.
+# Unless `reordered`, entries present in both lists kept their relative order.
+@dataclass
+class ConfigDiff:
+    removed: list = field(default_factory=list)   # (old index, cfg)
+    added: list = field(default_factory=list)     # (new index, cfg)
+    changed: list = field(default_factory=list)   # (new index, old cfg, new cfg)
+    reordered: bool = False
+
+    def __bool__(self):
+        return bool(self.removed or self.changed or self.added or self.reordered)
+
+    def describe(self):
+        return (f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed"
+                + (", reordered" if self.reordered else ""))
+
+
+def diff_configurations(old, new):
+    new_names = {cfg['name'] for cfg in new}
+    old_by_name = {cfg['name']: cfg for cfg in old}
+    diff = ConfigDiff()
+    diff.removed = [(i, cfg) for i, cfg in enumerate(old) if cfg['name'] not in new_names]
+    diff.added = [(i, cfg) for i, cfg in enumerate(new) if cfg['name'] not in old_by_name]
+    kept_old = [cfg['name'] for cfg in old if cfg['name'] in new_names]
+    kept_new = [cfg['name'] for cfg in new if cfg['name'] in old_by_name]
+    diff.reordered = kept_old != kept_new
+    diff.changed = [(i, old_by_name[cfg['name']], cfg) for i, cfg in enumerate(new)
+                    if cfg['name'] in old_by_name and cfg != old_by_name[cfg['name']]]
+    return diff
+
+
+# What other processes wrote since a store last read the disk, as read by ConfigStore.read_changes()
+@dataclass
+class DiskChanges:
+    base: tuple                      # the store's disk state the read started from
+    changed: bool = False
+    snapshot: Optional[list] = None  # every configuration, if config.json was replaced
+    snapshot_signature: Optional[tuple] = None
+    records: list = field(default_factory=list)  # (line number, journal record) to apply
+    journal_offset: int = 0
+
+
+def _fsync_directory(directory):
+    if not hasattr(os, 'O_DIRECTORY'):
+        return  # Windows: directory handles can't be fsynced
+    try:
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# Debouncing background writer: callbacks scheduled during a burst run once, on a worker thread,
+# after `delay` seconds without new requests (or `max_delay` after the burst started).
+class ConfigWriter:
+    def __init__(self, delay=DEFAULT_FLUSH_DELAY, max_delay=DEFAULT_MAX_FLUSH_DELAY):
+        self.delay = delay
+        self.max_delay = max_delay
+        self.requests = 0
+        self.flushes = 0
+        self._callbacks = {}
+        self._deadline = None
+        self._burst_started = None
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="config-writer", daemon=True)
+        self._thread.start()
+
+    # Number of requests that were folded into another flush instead of causing their own write
+    @property
+    def coalesced(self):
+        with self._condition:
+            return self.requests - self.flushes - len(self._callbacks)
+
+    def schedule(self, callback):
+        with self._condition:
+            now = time.monotonic()
+            if not self._callbacks:
+                self._burst_started = now
+            self.requests += 1
+            self._callbacks[callback] = None
+            self._deadline = min(now + self.delay, self._burst_started + self.max_delay)
+            self._condition.notify()
+
+    # Run everything that is pending right now, on the calling thread
+    def flush(self):
+        with self._io_lock:
+            self._run_callbacks(self._take_callbacks())
+
+    def stop(self):
+        self.flush()
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _take_callbacks(self):
+        with self._condition:
+            callbacks = list(self._callbacks)
+            self._callbacks.clear()
+            self.flushes += len(callbacks)
+            return callbacks
+
+    def _run_callbacks(self, callbacks):
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"Background write failed: {e}")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._callbacks and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+            self.flush()
+
+
+# Configuration store backed by config.json plus an append-only journal.
+#
+# config.json stays the canonical snapshot (same format as always, so existing files load unchanged).
+# Each mutation appends one small JSON line to `<config>.journal` instead of rewriting the snapshot;
+# the journal is replayed on load and folded back into config.json by `compact()`.
+# Names are unique and indexed, so lookups by name are O(1).
+#
+# Several processes may share one config.json. Writes hold an advisory lock on `<config>.lock`;
+# a snapshot is only rewritten when nothing changed on disk since this store last read it (otherwise
+# the records go to the journal, which every process replays by name). `sync()` picks up changes
+# made by others and returns a ConfigDiff; read_changes() and apply_changes() split it so the file
+# reads can run on a worker thread.
+#
+# With a `writer`, journal appends and compactions are queued and flushed off the calling thread;
+# without one they are written immediately.
+class ConfigStore:
+    def __init__(self, path, journal_path=None, compact_every=DEFAULT_COMPACT_EVERY, writer=None):
+        self.path = path
+        self.journal_path = journal_path or path + '.journal'
+        self.lock_path = path + '.lock'
+        self.compact_every = compact_every
+        self.writer = writer
+        self.configurations = []
+        self._positions = {}
+        self._journal = None
+        self._journal_records = 0
+        self._pending = []
+        self._compact_requested = False
+        # Disk state this store has read: snapshot identity and how far into the journal
+        self._snapshot_signature = None
+        self._journal_offset = 0
+        self._stale = False
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+
+    # Read-only access in the shape of the old config dict, e.g. store['configurations']
+    def __getitem__(self, key):
+        if key != 'configurations':
+            raise KeyError(key)
+        return self.configurations
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def __len__(self):
+        return len(self.configurations)
+
+    def to_dict(self):
+        return {'configurations': self.configurations}
+
+    def find(self, name):
+        position = self._positions.get(name)
+        return None if position is None else self.configurations[position]
+
+    def index_of(self, name):
+        return self._positions.get(name)
+
+    # Load the snapshot and replay any journal left over from the previous session
+    def load(self):
+        with file_lock(self.lock_path, shared=True), self._lock:
+            self._load_from_disk()
+        if self._journal_records:
+            logging.info(f"Replayed {self._journal_records} journal record(s) from '{self.journal_path}'.")
+        return self
+
+    # True if another process changed config.json or its journal since this store last read them
+    def changed_on_disk(self):
+        return (self._stale or _file_signature(self.path) != self._snapshot_signature
+                or _file_size(self.journal_path) != self._journal_offset)
+
+    # Pick up changes written by other processes; returns a ConfigDiff against the previous state.
+    # New journal records are applied directly; a replaced snapshot means a full reload with this
+    # store's unsaved records replayed on top. Call it from the thread that owns the store.
+    def sync(self):
+        while True:
+            diff = self.apply_changes(self.read_changes())
+            if diff is not None:
+                return diff
+
+    # First half of sync(): read and parse what changed on disk without touching this store, so
+    # it can run on any thread
+    def read_changes(self):
+        with self._flush_lock, file_lock(self.lock_path, shared=True):
+            with self._lock:
+                base = self._disk_state()
+                pending = bool(self._pending)
+            if not self.changed_on_disk():
+                return DiskChanges(base)
+            signature = _file_signature(self.path)
+            if not self._stale and not pending and signature == self._snapshot_signature:
+                records, offset = self._read_journal(self._journal_offset)
+                return DiskChanges(base, True, None, signature, records, offset)
+            snapshot = read_snapshot(self.path).get('configurations', [])
+            records, offset = self._read_journal(0)
+            return DiskChanges(base, True, snapshot, signature, records, offset)
+
+    # Second half of sync(), on the thread that owns the store: merge `changes` in one step and
+    # return a ConfigDiff, or None if this store wrote or was edited since `changes` were read, or
+    # is writing right now (read them again then). Never waits for a write in progress, which may
+    # be stuck behind another process's file lock.
+    def apply_changes(self, changes):
+        if not self._flush_lock.acquire(blocking=False):
+            return None
+        try:
+            with self._lock:
+                if changes.base != self._disk_state():
+                    return None
+                if not changes.changed:
+                    return ConfigDiff()
+                # Unsaved edits go after the external ones, which takes a full reload
+                if changes.snapshot is None and self._pending:
+                    return None
+                old = list(self.configurations)
+                if changes.snapshot is not None:
+                    self._snapshot_signature = changes.snapshot_signature
+                    self._set_configurations(changes.snapshot)
+                    self._journal_records = 0
+                    self._stale = False
+                self._journal_offset = changes.journal_offset
+                self._apply_journal(changes.records)
+                if changes.snapshot is not None:
+                    for record in self._pending:
+                        self._apply(record)
+                diff = diff_configurations(old, self.configurations)
+                resume = bool(self._pending or self._compact_requested)
+        finally:
+            self._flush_lock.release()
+        # Write what was held back while the disk had unmerged changes
+        if resume:
+            self._schedule()
+        if diff:
+            logging.info(f"Reloaded '{self.path}' after an external change: {diff.describe()}.")
+        return diff
+
+    def _disk_state(self):
+        return self._snapshot_signature, self._journal_offset, self._stale
+
+    def add(self, cfg):
+        with self._lock:
+            self._insert(cfg)
+            self._append({'op': 'add', 'config': cfg})
+
+    def replace(self, index, cfg):
+        with self._lock:
+            old_name = self.configurations[index]['name']
+            self._replace(index, cfg)
+            self._append({'op': 'replace', 'index': index, 'name': old_name, 'config': cfg})
+
+    def delete(self, index):
+        with self._lock:
+            name = self.configurations[index]['name']
+            self._delete(index)
+            self._append({'op': 'delete', 'index': index, 'name': name})
+
+    def swap(self, i, j):
+        with self._lock:
+            a, b = self.configurations[i]['name'], self.configurations[j]['name']
+            self._swap(i, j)
+            self._append({'op': 'swap', 'i': i, 'j': j, 'a': a, 'b': b})
+
+    # Append many configurations at once (e.g. an import) as a single journal record. Names must be
+    # new. Large batches are folded into the snapshot straight away.
+    def extend(self, configurations):
+        with self._lock:
+            for cfg in configurations:
+                self._insert(cfg)
+            self._append({'op': 'extend', 'configs': list(configurations)})
+            if len(configurations) > self.compact_every:
+                self._compact_requested = True
+        self._schedule()
+
+    # Replace the whole ordering at once (e.g. after sorting); cheaper to snapshot than to journal
+    def reorder(self, configurations):
+        with self._lock:
+            self._set_configurations(configurations)
+            self._append({'op': 'reorder', 'names': [cfg['name'] for cfg in self.configurations]})
+        self.compact()
+
+    # Fold the journal into a fresh config.json snapshot and start an empty journal
+    def compact(self):
+        with self._lock:
+            self._compact_requested = True
+        self._schedule()
+
+    # Write out everything that is still queued
+    def flush(self):
+        if self.writer is not None:
+            self.writer.flush()
+        else:
+            self._flush()
+
+    # Write out what is queued and fold the journal into config.json. The compaction runs here rather
+    # than through the writer, which only runs what is already queued when flushed.
+    def close(self):
+        if self.writer is not None:
+            self.writer.flush()
+        with self._lock:
+            if self._journal_records or self._pending or os.path.exists(self.journal_path):
+                self._compact_requested = True
+        self._flush()
+        self._close_journal()
+
+    # Snapshot plus the whole journal, as currently on disk (call with the file lock held)
+    def _load_from_disk(self):
+        self._snapshot_signature = _file_signature(self.path)
+        self._set_configurations(read_snapshot(self.path).get('configurations', []))
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._stale = False
+        self._replay_journal()
+
+    def _set_configurations(self, configurations):
+        self.configurations = []
+        self._positions = {}
+        for cfg in configurations:
+            name = cfg.get('name', '')
+            if name in self._positions:
+                unique = self._unique_name(name)
+                logging.warning(f"Duplicate configuration name '{name}' renamed to '{unique}'.")
+                cfg = dict(cfg, name=unique)
+            self._positions[cfg['name']] = len(self.configurations)
+            self.configurations.append(cfg)
+
+    def _unique_name(self, name):
+        suffix = 2
+        while f"{name} ({suffix})" in self._positions:
+            suffix += 1
+        return f"{name} ({suffix})"
+
+    def _insert(self, cfg):
+        if cfg['name'] in self._positions:
+            raise ValueError(f"A configuration named '{cfg['name']}' already exists.")
+        self._positions[cfg['name']] = len(self.configurations)
+        self.configurations.append(cfg)
+
+    def _replace(self, index, cfg):
+        old_name = self.configurations[index]['name']
+        if cfg['name'] != old_name:
+            if cfg['name'] in self._positions:
+                raise ValueError(f"A configuration named '{cfg['name']}' already exists.")
+            del self._positions[old_name]
+            self._positions[cfg['name']] = index
+        self.configurations[index] = cfg
+
+    def _delete(self, index):
+        del self._positions[self.configurations[index]['name']]
+        del self.configurations[index]
+        for position in range(index, len(self.configurations)):
+            self._positions[self.configurations[position]['name']] = position
+
+    def _swap(self, i, j):
+        configurations = self.configurations
+        configurations[i], configurations[j] = configurations[j], configurations[i]
+        self._positions[configurations[i]['name']] = i
+        self._positions[configurations[j]['name']] = j
+
+    # Journal records carry both index and name: the index is the fast path, the name keeps
+    # replay correct if the snapshot was changed underneath the journal
+    def _resolve(self, index, name):
+        if 0 <= index < len(self.configurations) and self.configurations[index]['name'] == name:
+            return index
+        return self._positions.get(name)
+
+    def _apply(self, record):
+        op = record['op']
+        if op == 'add':
+            if record['config']['name'] not in self._positions:
+                self._insert(record['config'])
+                return True
+            return False
+        if op == 'replace':
+            index = self._resolve(record['index'], record['name'])
+            if index is None:
+                return False
+            self._replace(index, record['config'])
+            return True
+        if op == 'delete':
+            index = self._resolve(record['index'], record['name'])
+            if index is None:
+                return False
+            self._delete(index)
+            return True
+        if op == 'extend':
+            added = [cfg for cfg in record['configs'] if cfg['name'] not in self._positions]
+            for cfg in added:
+                self._insert(cfg)
+            return bool(added)
+        if op == 'reorder':
+            order = {name: i for i, name in enumerate(record['names'])}
+            ordered = sorted(self.configurations, key=lambda cfg: order.get(cfg['name'], len(order)))
+            self._set_configurations(ordered)
+            return True
+        if op == 'swap':
+            i = self._resolve(record['i'], record['a'])
+            j = self._resolve(record['j'], record['b'])
+            if i is None or j is None:
+                return False
+            self._swap(i, j)
+            return True
+        raise ValueError(f"Unknown journal operation '{op}'")
+
+    # Apply journal records from `_journal_offset` on
+    def _replay_journal(self):
+        records, self._journal_offset = self._read_journal(self._journal_offset)
+        return self._apply_journal(records)
+
+    # Parse the journal from `offset` on; returns [(line number, record)] and the offset after them
+    def _read_journal(self, offset):
+        records = []
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(offset)
+                line_number = 0
+                for line in f:
+                    line_number += 1
+                    offset += len(line)
+                    if not line.endswith(b'\n'):
+                        # Torn by a crash (writes hold the lock, so it can't be one in progress)
+                        logging.warning(f"Skipping torn journal record {line_number} in '{self.journal_path}'.")
+                        break
+                    if not line.strip():
+                        continue
+                    try:
+                        records.append((line_number, json.loads(line)))
+                    except ValueError as e:
+                        logging.warning(f"Skipping journal record {line_number} in '{self.journal_path}': {e}")
+        except FileNotFoundError:
+            pass
+        return records, offset
+
+    def _apply_journal(self, records):
+        replayed = 0
+        for line_number, record in records:
+            try:
+                applied = self._apply(record)
+            except (ValueError, KeyError, TypeError) as e:
+                # A torn final line after a crash is expected; anything else is worth a warning too
+                logging.warning(f"Skipping journal record {line_number} in '{self.journal_path}': {e}")
+                continue
+            if not applied:
+                logging.warning(f"Journal record {line_number} no longer applies and was skipped.")
+            replayed += 1
+        self._journal_records += replayed
+        return replayed
+
+    def _append(self, record):
+        self._pending.append(record)
+        self._journal_records += 1
+        if self._journal_records >= max(self.compact_every, len(self.configurations)):
+            self._compact_requested = True
+        self._schedule()
+
+    def _schedule(self):
+        if self.writer is not None:
+            self.writer.schedule(self._flush)
+        else:
+            self._flush()
+
+    # Take a consistent view under the lock, then do the slow I/O without holding it
+    @timed('config.flush')
+    def _flush(self):
+        with self._flush_lock, file_lock(self.lock_path):
+            external = self.changed_on_disk()
+            with self._lock:
+                records, self._pending = self._pending, []
+                # Never overwrite another process's changes with our snapshot; journal instead
+                # and compact once sync() has merged them
+                compact = self._compact_requested and not external
+                if compact:
+                    self._compact_requested = False
+                    self._journal_records = 0
+                snapshot = {'configurations': list(self.configurations)} if compact else None
+
+            if compact:
+                # The snapshot already contains every queued record
+                self._close_journal()
+                write_snapshot(self.path, snapshot)
+                try:
+                    os.remove(self.journal_path)
+                except FileNotFoundError:
+                    pass
+                self._snapshot_signature = _file_signature(self.path)
+                self._journal_offset = 0
+                logging.info(f"Configurations saved to '{self.path}'.")
+            elif records:
+                if external:
+                    # The journal may have been replaced along with the snapshot
+                    self._close_journal()
+                    self._stale = True
+                if self._journal is None:
+                    self._open_journal()
+                self._journal.write(''.join(json.dumps(record) + '\n' for record in records))
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                if not external:
+                    self._journal_offset = os.fstat(self._journal.fileno()).st_size
+
+    def _open_journal(self):
+        self._journal = open(self.journal_path, 'a')
+        # Terminate a record torn by a crash so the next one starts on its own line
+        if self._journal.tell() > 0:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self._journal.write('\n')
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,204 @@
+import dataclasses
+import logging
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+import core
+from metrics import metrics
+
+# How many clients may be starting up at the same time during a multi-launch
+DEFAULT_LAUNCH_CONCURRENCY = 2
+# A launch slot is held until the client has been running this long (or has exited)
+DEFAULT_STARTUP_GRACE = 5.0
+DEFAULT_POLL_INTERVAL = 1.0
+
+try:
+    CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):  # Windows
+    CLOCK_TICKS = 100
+    PAGE_SIZE = 4096
+
+
+@dataclass
+class ClientProcess:
+    name: str
+    wow_exe_path: str
+    pid: Optional[int] = None
+    started: float = field(default_factory=time.time)
+    ended: Optional[float] = None
+    exit_code: Optional[int] = None
+    cpu_seconds: float = 0.0
+    rss_bytes: int = 0
+    error: Optional[str] = None
+    time_to_start_ms: Optional[float] = None
+    history_id: Optional[int] = None
+    process: object = field(default=None, repr=False, compare=False)
+
+    @property
+    def running(self):
+        return self.process is not None and self.ended is None
+
+    @property
+    def lifetime(self):
+        return (self.ended or time.time()) - self.started
+
+    # Short status line for the GUI
+    def describe(self):
+        if self.error:
+            return f"{self.name}: failed ({self.error})"
+        lifetime = time.strftime('%H:%M:%S', time.gmtime(self.lifetime))
+        usage = f"cpu {self.cpu_seconds:.1f}s, rss {self.rss_bytes / (1024 * 1024):.0f} MB"
+        if self.running:
+            return f"{self.name}: pid {self.pid}, running {lifetime}, {usage}"
+        return f"{self.name}: pid {self.pid}, exited ({self.exit_code}) after {lifetime}, {usage}"
+
+
+# Read (cpu_seconds, rss_bytes) for a pid from /proc; None where /proc isn't available
+def sample_proc(pid):
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name is in parentheses and may contain spaces, so split after the last ')'
+    fields = stat[stat.rindex(')') + 2:].split()
+    utime, stime = int(fields[11]), int(fields[12])
+    rss_pages = int(fields[21])
+    return (utime + stime) / CLOCK_TICKS, rss_pages * PAGE_SIZE
+
+
+# Tracks every client launched from the app: pid, lifetime, exit status and resource usage.
+#
+# Launches run on a small thread pool (so the Tk loop never waits on a spawn) and a single
+# monitor thread polls the running clients. Callbacks run on those worker threads; the GUI
+# marshals them onto the Tk loop itself. With a `history` (history.LaunchHistory), every launch
+# and exit is recorded there as well.
+class ClientSupervisor:
+    def __init__(self, launcher=core.launch_configuration, launch_concurrency=DEFAULT_LAUNCH_CONCURRENCY,
+                 startup_grace=DEFAULT_STARTUP_GRACE, poll_interval=DEFAULT_POLL_INTERVAL, history=None):
+        self.launcher = launcher
+        self.history = history
+        self.startup_grace = startup_grace
+        self.poll_interval = poll_interval
+        self.on_error = None
+        self.on_exit = None
+        self._clients = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=launch_concurrency, thread_name_prefix="client-launch")
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._monitor = threading.Thread(target=self._run_monitor, name="client-monitor", daemon=True)
+        self._monitor.start()
+
+    # Launch one configuration in the background; returns a Future for its ClientProcess.
+    # `requested_at` (time.perf_counter() at the click) is used to measure click-to-process-start.
+    def launch(self, cfg, requested_at=None):
+        requested_at = requested_at if requested_at is not None else time.perf_counter()
+        return self._executor.submit(self._launch, cfg, 0.0, requested_at)
+
+    # Launch several configurations; at most `launch_concurrency` of them start up at the same time
+    def launch_many(self, configurations, requested_at=None):
+        requested_at = requested_at if requested_at is not None else time.perf_counter()
+        return [self._executor.submit(self._launch, cfg, self.startup_grace, requested_at) for cfg in configurations]
+
+    # Copy of every tracked client, safe to read from any thread
+    def clients(self):
+        with self._lock:
+            return [dataclasses.replace(client) for client in self._clients]
+
+    def running(self):
+        return [client for client in self.clients() if client.running]
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._monitor.join()
+
+    def _launch(self, cfg, grace, requested_at):
+        client = ClientProcess(cfg['name'], cfg.get('wow_exe_path', ''))
+        try:
+            process = self.launcher(cfg)
+        except core.LaunchError as e:
+            client.error = str(e)
+        except Exception as e:
+            logging.error(f"Error running WoW: {e}")
+            client.error = f"An error occurred while trying to run WoW: {e}"
+
+        if client.error:
+            client.ended = time.time()
+            self._record(cfg, client)
+            with self._lock:
+                self._clients.append(client)
+            if self.on_error is not None:
+                self.on_error(client)
+            return client
+
+        client.process = process
+        client.pid = process.pid
+        client.time_to_start_ms = (time.perf_counter() - requested_at) * 1000.0
+        metrics.observe('launch.time_to_start', client.time_to_start_ms)
+        self._record(cfg, client)
+        with self._lock:
+            self._clients.append(client)
+        logging.info(f"Started '{client.name}' as pid {client.pid}, "
+                     f"{client.time_to_start_ms:.0f} ms from click to process start.")
+        self._wakeup.set()
+
+        # Hold this launch slot while the client loads, so a multi-launch doesn't start them all at once
+        if grace > 0:
+            try:
+                process.wait(timeout=grace)
+            except subprocess.TimeoutExpired:
+                pass
+        return client
+
+    # History is best effort: a locked or unwritable database never fails a launch
+    def _record(self, cfg, client):
+        if self.history is None:
+            return
+        try:
+            client.history_id = self.history.record_launch(cfg, client.started, client.time_to_start_ms, client.pid,
+                                                           client.error, client.ended)
+        except Exception as e:
+            logging.warning(f"Could not record the launch of '{client.name}' in the history: {e}")
+
+    def _record_exit(self, client):
+        if self.history is None or client.history_id is None:
+            return
+        try:
+            self.history.record_exit(client.history_id, client.ended, client.exit_code)
+        except Exception as e:
+            logging.warning(f"Could not record the exit of '{client.name}' in the history: {e}")
+
+    def _run_monitor(self):
+        while not self._stopped:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            self.poll()
+
+    # Refresh exit status and resource usage of every running client
+    def poll(self):
+        with self._lock:
+            running = [client for client in self._clients if client.running]
+        for client in running:
+            sample = sample_proc(client.pid)
+            exit_code = client.process.poll()
+            with self._lock:
+                if sample is not None:
+                    client.cpu_seconds, client.rss_bytes = sample
+                if exit_code is None:
+                    continue
+                client.exit_code = exit_code
+                client.ended = time.time()
+            logging.info(f"'{client.name}' (pid {client.pid}) exited with code {exit_code} "
+                         f"after {client.lifetime:.0f}s.")
+            self._record_exit(client)
+            if self.on_exit is not None:
+                self.on_exit(client)
@@ -0,0 +1,105 @@
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+
+DEFAULT_WORKERS = 4
+# How often the event loop is checked for stalls, and how late a check may run before it is logged
+DEFAULT_LOOP_INTERVAL_MS = 100
+DEFAULT_STALL_THRESHOLD_MS = 250.0
+
+
+# Runs blocking work (disk, network, subprocesses) on worker threads and hands the outcome back to
+# the UI thread.
+#
+# `post(func, *args)` must be safe to call from any thread and run `func` on the UI thread later
+# (the GUI passes post_to_ui, whose queue is drained by root.after). Success and error callbacks
+# therefore always run on the UI thread, where they may touch widgets and show message boxes.
+# `on_busy(descriptions)` is called on the UI thread whenever the set of running tasks changes.
+class TaskRunner:
+    def __init__(self, post, max_workers=DEFAULT_WORKERS, on_error=None, on_busy=None):
+        self.post = post
+        self.on_error = on_error
+        self.on_busy = on_busy
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="realmlist-task")
+        self._ids = itertools.count()
+        self._active = {}
+        self._lock = threading.Lock()
+
+    # Descriptions of the tasks that have not finished yet, oldest first
+    @property
+    def busy(self):
+        with self._lock:
+            return list(self._active.values())
+
+    # Run `func(*args)` on a worker thread; `on_success(result)` or `on_error(description, exception)`
+    # follows on the UI thread. Without an `on_error`, the runner's default handler is used.
+    def submit(self, description, func, *args, on_success=None, on_error=None):
+        return self.track(description, self._executor.submit(func, *args), on_success, on_error)
+
+    # Like submit() for a future started elsewhere (e.g. a client launch by the supervisor)
+    def track(self, description, future, on_success=None, on_error=None):
+        task_id = next(self._ids)
+        started = time.perf_counter()
+        with self._lock:
+            self._active[task_id] = description
+        self._notify_busy()
+        future.add_done_callback(lambda done: self.post(self._finish, task_id, description, started, done,
+                                                        on_success, on_error))
+        return future
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finish(self, task_id, description, started, future, on_success, on_error):
+        with self._lock:
+            self._active.pop(task_id, None)
+        metrics.observe('ui.task', (time.perf_counter() - started) * 1000.0)
+        self._notify_busy()
+        if future.cancelled():
+            return
+        error = future.exception()
+        try:
+            if error is not None:
+                logging.error(f"{description} failed: {error}")
+                handler = on_error or self.on_error
+                if handler is not None:
+                    handler(description, error)
+            elif on_success is not None:
+                on_success(future.result())
+        except Exception as e:
+            logging.error(f"Error handling the result of '{description}': {e}")
+
+    def _notify_busy(self):
+        if self.on_busy is not None:
+            self.post(self.on_busy, self.busy)
+
+
+# Measures how late the UI event loop runs a callback scheduled every `interval_ms`. Any blocking call
+# on the UI thread shows up as lag: it is recorded as 'ui.loop_lag' and logged above `threshold_ms`.
+# `after(ms, func)` is the loop's scheduler (root.after).
+class LoopMonitor:
+    def __init__(self, after, interval_ms=DEFAULT_LOOP_INTERVAL_MS, threshold_ms=DEFAULT_STALL_THRESHOLD_MS,
+                 clock=time.perf_counter):
+        self.after = after
+        self.interval_ms = interval_ms
+        self.threshold_ms = threshold_ms
+        self.clock = clock
+        self.stalls = 0
+        self._expected = None
+
+    def start(self):
+        self._expected = self.clock() + self.interval_ms / 1000.0
+        self.after(self.interval_ms, self._tick)
+        return self
+
+    def _tick(self):
+        lag_ms = max(0.0, (self.clock() - self._expected) * 1000.0)
+        metrics.observe('ui.loop_lag', lag_ms)
+        if lag_ms > self.threshold_ms:
+            self.stalls += 1
+            logging.warning(f"UI event loop was blocked for {lag_ms:.0f} ms.")
+        self.start()
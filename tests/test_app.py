@@ -1,7 +1,12 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import json
-from main import load_config, save_config, update_realmlist, add_configuration
+import os
+import tempfile
+from core import (load_config, save_config, update_realmlist, update_realmlists, write_realmlist,
+                  render_realmlist)
+from gui import add_configuration, post_to_ui, process_ui_queue, save_configuration
+from store import ConfigStore
 
 
 class TestRealmlistUpdater(unittest.TestCase):
@@ -12,46 +17,72 @@ class TestRealmlistUpdater(unittest.TestCase):
         self.assertEqual(config, {'configurations': []})
         mock_open.assert_called_once_with('config.json', 'r')
 
-    @patch('builtins.open', new_callable=unittest.mock.mock_open)
-    def test_save_config(self, mock_open):
+    def test_save_config(self):
         config_data = {'configurations': [{'name': 'Test Config'}]}
 
-        save_config(config_data)
+        with tempfile.TemporaryDirectory() as tmp:
+            config_path = os.path.join(tmp, 'config.json')
+            with patch('core.CONFIG_FILE', config_path):
+                save_config(config_data)
 
-        # Verify that the file was opened correctly
-        mock_open.assert_called_once_with('config.json', 'w')
+            # The file is written through a temp file and renamed into place, so nothing is left behind
+            self.assertEqual(os.listdir(tmp), ['config.json'])
 
-        # Get the file handle from the mock
-        handle = mock_open()
+            # Check if the written output matches the expected output
+            with open(config_path) as f:
+                self.assertEqual(f.read().strip(), json.dumps(config_data, indent=4).strip())
 
-        # Check how many times 'write' was called
-        self.assertGreaterEqual(handle.write.call_count, 1)  # Should be at least one call
-
-        # Generate the expected output
-        expected_output = json.dumps(config_data, indent=4)
-
-        # Concatenate all calls to 'write' to create the full output
-        actual_written = ''.join(call[0][0] for call in handle.write.call_args_list)
-
-        # Check if the actual written output matches the expected output
-        self.assertEqual(actual_written.strip(), expected_output.strip())
-
-    @patch('builtins.open', new_callable=unittest.mock.mock_open)
-    def test_update_realmlist(self, mock_open):
-        realmlist_path = 'realmlist.wtf'
+    def test_update_realmlist(self):
         server_address = 'test.server.address'
         portal_address = 'test.server.address'
         version = 'Vanilla (1.12.x)'
 
-        update_realmlist(realmlist_path, server_address, portal_address, version)
-
-        mock_open.assert_called_once_with(realmlist_path, 'w')
-        mock_open().write.assert_any_call(f'set realmlist {server_address}\n')
-
-    @patch('main.save_config')
-    @patch('main.messagebox.showwarning')
-    def test_add_configuration_duplicate_name(self, mock_showwarning, mock_save_config):
-        config = {'configurations': [{'name': 'Test Config'}]}
+        with tempfile.TemporaryDirectory() as tmp:
+            realmlist_path = os.path.join(tmp, 'realmlist.wtf')
+            self.assertTrue(update_realmlist(realmlist_path, server_address, portal_address, version))
+
+            with open(realmlist_path) as f:
+                self.assertIn(f'set realmlist {server_address}\n', f.read())
+            self.assertEqual(os.listdir(tmp), ['realmlist.wtf'])
+
+    def test_update_realmlist_skips_unchanged_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            realmlist_path = os.path.join(tmp, 'realmlist.wtf')
+            first = write_realmlist(realmlist_path, 'a.example', '', 'Cataclysm (4.3.4)')
+            with patch('core.atomic_write') as mock_write:
+                second = write_realmlist(realmlist_path, 'a.example', '', 'Cataclysm (4.3.4)')
+            mock_write.assert_not_called()
+            self.assertTrue(first.changed)
+            self.assertFalse(second.changed)
+
+            # A file changed behind our back is detected and rewritten
+            with open(realmlist_path, 'w') as f:
+                f.write('set realmlist somewhere.else\n')
+            self.assertTrue(write_realmlist(realmlist_path, 'a.example', '', 'Cataclysm (4.3.4)').changed)
+            with open(realmlist_path) as f:
+                self.assertEqual(f.read(), render_realmlist('a.example', '', 'Cataclysm (4.3.4)'))
+
+    def test_update_realmlists_batch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            configurations = [{'name': f'Client {i}', 'realmlist_path': os.path.join(tmp, f'realmlist{i}.wtf'),
+                               'server_address': 'family.example', 'portal_address': '', 'version': ''}
+                              for i in range(5)]
+            configurations.append({'name': 'Broken', 'realmlist_path': os.path.join(tmp, 'missing', 'realmlist.wtf'),
+                                   'server_address': 'family.example'})
+            write_realmlist(configurations[0]['realmlist_path'], 'family.example', '', '')
+
+            results = update_realmlists(configurations, max_workers=3)
+
+            self.assertEqual([r.path for r in results], [c['realmlist_path'] for c in configurations])
+            self.assertEqual([r.changed for r in results], [False, True, True, True, True, False])
+            self.assertIsNotNone(results[-1].error)
+            self.assertTrue(all(r.elapsed_ms >= 0 for r in results))
+
+    @patch('store.ConfigStore.add')
+    @patch('gui.messagebox.showwarning')
+    def test_add_configuration_duplicate_name(self, mock_showwarning, mock_add):
+        config = ConfigStore('config.json')
+        config._set_configurations([{'name': 'Test Config'}])
         entry_fields = {'name': MagicMock(), 'realmlist': MagicMock(), 'wow_exe': MagicMock(), 'server_address': MagicMock(),
                         'portal_address': MagicMock(),'version': MagicMock()}
         entry_fields['name'].get.return_value = 'Test Config'  # Simulating a duplicate name
@@ -59,6 +90,70 @@ class TestRealmlistUpdater(unittest.TestCase):
         add_configuration(config, entry_fields, None, None, None)
 
         mock_showwarning.assert_called_once_with("Duplicate Name", "A configuration with this name already exists.")
+        mock_add.assert_not_called()
+
+    def test_save_configuration_keeps_keys_without_form_fields(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = ConfigStore(os.path.join(tmp, 'config.json')).load()
+            config.add({'name': 'Server', 'realmlist_path': 'realmlist.wtf', 'wow_exe_path': 'WoW.exe',
+                        'server_address': 'old.example', 'portal_address': '', 'version': 'Vanilla (1.12.x)',
+                        'auth_account': 'player', 'auth_password': 'secret', 'auth_port': 3725,
+                        'wdb_policy': 'keep', 'pin_ip': True, 'wine_prefix': '/home/me/.wine'})
+            values = {'name': 'Server', 'realmlist': 'realmlist.wtf', 'wow_exe': 'WoW.exe',
+                      'server_address': 'new.example', 'portal_address': '', 'version': 'Vanilla (1.12.x)',
+                      'wine_prefix': '', 'wine_env': '', 'wine_persistent': False}
+            entry_fields = {key: MagicMock(**{'get.return_value': value}) for key, value in values.items()}
+
+            save_configuration(config, MagicMock(), entry_fields, 'Server', MagicMock(), MagicMock(), None, None)
+
+            saved = config.find('Server')
+            self.assertEqual(saved['server_address'], 'new.example')
+            self.assertEqual((saved['auth_account'], saved['auth_password'], saved['auth_port']),
+                             ('player', 'secret', 3725))
+            self.assertEqual(saved['wdb_policy'], 'keep')
+            self.assertTrue(saved['pin_ip'])
+            # A cleared form field removes its key
+            self.assertNotIn('wine_prefix', saved)
+            config.close()
+
+    @patch('gui.messagebox.showwarning')
+    def test_save_configuration_finds_the_entry_by_name(self, mock_showwarning):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = ConfigStore(os.path.join(tmp, 'config.json')).load()
+            for name in ('A', 'B'):
+                config.add({'name': name, 'server_address': f'{name.lower()}.example', 'version': ''})
+            values = {'name': 'B', 'realmlist': '', 'wow_exe': '', 'server_address': 'new.example',
+                      'portal_address': '', 'version': ''}
+            entry_fields = {key: MagicMock(**{'get.return_value': value}) for key, value in values.items()}
+
+            # A was removed elsewhere while B's form was open, so B moved up a row
+            config.delete(0)
+            save_configuration(config, MagicMock(), entry_fields, 'B', MagicMock(), MagicMock(), None, None)
+            self.assertEqual(config.find('B')['server_address'], 'new.example')
+
+            config.delete(0)
+            save_configuration(config, MagicMock(), entry_fields, 'B', MagicMock(), MagicMock(), None, None)
+            self.assertEqual(mock_showwarning.call_args[0][0], "Configuration Removed")
+            self.assertEqual(len(config), 0)
+            config.close()
+
+
+
+class TestUiQueue(unittest.TestCase):
+
+    @patch('gui.logging')
+    def test_failing_callback_keeps_queue_running(self, mock_logging):
+        def fail():
+            raise RuntimeError("widget destroyed")
+
+        calls = []
+        root = MagicMock()
+        post_to_ui(fail)
+        post_to_ui(calls.append, 'after')
+        process_ui_queue(root)
+        self.assertEqual(calls, ['after'])
+        mock_logging.error.assert_called_once()
+        root.after.assert_called_once_with(100, process_ui_queue, root)
 
 
 if __name__ == '__main__':
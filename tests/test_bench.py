@@ -0,0 +1,36 @@
+import contextlib
+import io
+import logging
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import bench  # noqa: E402
+
+
+# Keeps the benchmark suite runnable; timings themselves aren't checked
+class TestBenchmarks(unittest.TestCase):
+
+    def test_smallest_run(self):
+        # The run logs to its own file; keep other handlers (e.g. stderr) out of it
+        stderr = io.StringIO()
+        with patch.object(logging.getLogger(), 'handlers', []), contextlib.redirect_stderr(stderr):
+            report = bench.run([10])
+        self.assertEqual(stderr.getvalue(), "")
+        names = {entry['benchmark'] for entry in report['results']}
+        self.assertTrue({'load_config', 'save_config', 'add_configuration', 'move_config', 'update_listbox',
+                         'update_realmlist', 'launch'} <= names)
+        self.assertIn('realmlist.write', report['metrics'])
+
+    def test_regressions(self):
+        baseline = {'results': [{'benchmark': 'load_config', 'size': 10, 'per_op_ms': 1.0}]}
+        report = {'results': [{'benchmark': 'load_config', 'size': 10, 'per_op_ms': 1.5}]}
+        self.assertEqual(len(bench.regressions(baseline, report, 0.2)), 1)
+        self.assertEqual(bench.regressions(baseline, report, 0.6), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestCommandLine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.realmlist = os.path.join(self.tmp.name, 'realmlist.wtf')
+        self.config_path = os.path.join(self.tmp.name, 'config.json')
+        with open(self.config_path, 'w') as f:
+            json.dump({'configurations': [{
+                'name': 'Local', 'realmlist_path': self.realmlist, 'wow_exe_path': 'WoW.exe',
+                'server_address': 'logon.example.org', 'portal_address': '', 'version': 'Cataclysm (4.3.4)'
+            }]}, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_main(self, *args, env=None):
+        code = ("import sys, main; status = main.main(sys.argv[1:]); "
+                "print('ASYNCIO' if 'asyncio' in sys.modules else 'NO-ASYNCIO'); "
+                "print('TK' if 'tkinter' in sys.modules else 'NO-TK'); sys.exit(status)")
+        return subprocess.run([sys.executable, '-c', code, '--config', self.config_path, *args],
+                              cwd=self.tmp.name, env=dict(env or os.environ, PYTHONPATH=ROOT),
+                              capture_output=True, text=True, timeout=30)
+
+    def test_list_does_not_import_tkinter(self):
+        result = self.run_main('list')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('Local\tlogon.example.org\tCataclysm (4.3.4)', result.stdout)
+        self.assertTrue(result.stdout.strip().endswith('NO-TK'))
+
+    def test_write_realmlist(self):
+        result = self.run_main('write-realmlist', 'Local')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('NO-ASYNCIO', result.stdout)
+        with open(self.realmlist) as f:
+            self.assertIn('set patchlist logon.example.org', f.read())
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), "launches through wine on Linux")
+    def test_run_launches_through_stub_wine(self):
+        bin_dir = os.path.join(self.tmp.name, 'bin')
+        os.mkdir(bin_dir)
+        marker = os.path.join(self.tmp.name, 'launched')
+        with open(os.path.join(bin_dir, 'wine'), 'w') as f:
+            f.write(f'#!/bin/sh\necho "$@" > "{marker}"\n')
+        os.chmod(os.path.join(bin_dir, 'wine'), 0o755)
+        open(os.path.join(self.tmp.name, 'WoW.exe'), 'w').close()
+        open(self.realmlist, 'w').close()
+
+        env = dict(os.environ, PATH=bin_dir + os.pathsep + os.environ['PATH'])
+        result = self.run_main('run', 'Local', '--wait', '--timing', env=env)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('time-to-launch:', result.stderr)
+        self.assertTrue(result.stdout.strip().endswith('NO-TK'))
+        with open(marker) as f:
+            self.assertEqual(f.read().strip(), 'WoW.exe')
+
+        # The launch and its exit were recorded in the history next to config.json
+        result = self.run_main('history')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('logon.example.org\t1 session(s)', result.stdout)
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), "launches through wine on Linux")
+    def test_run_launches_without_history(self):
+        bin_dir = os.path.join(self.tmp.name, 'bin')
+        os.mkdir(bin_dir)
+        marker = os.path.join(self.tmp.name, 'launched')
+        with open(os.path.join(bin_dir, 'wine'), 'w') as f:
+            f.write(f'#!/bin/sh\necho "$@" > "{marker}"\n')
+        os.chmod(os.path.join(bin_dir, 'wine'), 0o755)
+        open(os.path.join(self.tmp.name, 'WoW.exe'), 'w').close()
+        open(self.realmlist, 'w').close()
+        # A directory where the database should be: sqlite can't open it
+        os.mkdir(os.path.join(self.tmp.name, 'history.db'))
+
+        env = dict(os.environ, PATH=bin_dir + os.pathsep + os.environ['PATH'])
+        result = self.run_main('run', 'Local', '--wait', env=env)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertTrue(os.path.exists(marker))
+        self.assertEqual(self.run_main('history').returncode, 1)
+
+    def test_import_formats_match_importer(self):
+        import cli
+        import importer
+        self.assertEqual(cli.IMPORT_FORMATS, importer.FORMATS)
+
+    def test_unknown_configuration(self):
+        result = self.run_main('run', 'Missing')
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("No configuration named 'Missing'", result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import struct
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import core
+import fingerprint
+from fingerprint import ClientBuild, FingerprintCache, detect_builds, read_client_build, version_mismatches
+
+
+# Smallest PE32 image with one .rsrc section holding an RT_VERSION resource
+def make_pe(major, minor, patch, build, padding=0):
+    section_rva, section_offset = 0x1000, 0x200
+    key = 'VS_VERSION_INFO\0'.encode('utf-16-le')
+    fixed = struct.pack('<13I', 0xFEEF04BD, 0x10000, (major << 16) | minor, (patch << 16) | build,
+                        (major << 16) | minor, (patch << 16) | build, 0x3F, 0, 4, 1, 0, 0, 0)
+    version_info = struct.pack('<HHH', 6 + len(key) + 2 + len(fixed), len(fixed), 0) + key + b'\0\0' + fixed
+
+    resources = b''.join([
+        struct.pack('<IIHHHH', 0, 0, 0, 0, 0, 1), struct.pack('<II', 16, 0x80000000 | 24),       # type
+        struct.pack('<IIHHHH', 0, 0, 0, 0, 0, 1), struct.pack('<II', 1, 0x80000000 | 48),        # name
+        struct.pack('<IIHHHH', 0, 0, 0, 0, 0, 1), struct.pack('<II', 0x409, 72),                 # language
+        struct.pack('<IIII', section_rva + 88, len(version_info), 0, 0),                         # data entry
+        version_info,
+    ])
+
+    optional = bytearray(224)
+    struct.pack_into('<H', optional, 0, 0x10b)
+    struct.pack_into('<II', optional, 96 + 2 * 8, section_rva, len(resources))
+    headers = bytearray(b'MZ' + bytes(0x3A) + struct.pack('<I', 0x40))
+    headers += b'PE\0\0' + struct.pack('<HHIIIHH', 0x14c, 1, 0, 0, 0, len(optional), 0x102) + optional
+    headers += b'.rsrc\0\0\0' + struct.pack('<IIIIIIHHI', len(resources), section_rva, len(resources),
+                                            section_offset, 0, 0, 0, 0, 0x40000040)
+    headers += bytes(section_offset - len(headers))
+    return bytes(headers) + resources + bytes(padding)
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_exe(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_reads_version_resource(self):
+        path = self.write_exe('WoW.exe', make_pe(3, 3, 5, 12340, padding=1024 * 1024))
+        build = read_client_build(path)
+        self.assertEqual(build, ClientBuild(3, 3, 5, 12340))
+        self.assertEqual(build.version, "Wrath of the Lich King (3.3.5)")
+
+    def test_falls_back_to_signature_search(self):
+        # Version information present but not reachable through the PE headers
+        data = bytearray(make_pe(1, 12, 1, 5875))
+        data[0x40:0x44] = b'XXXX'
+        path = self.write_exe('WoW.exe', bytes(data))
+        self.assertEqual(read_client_build(path), ClientBuild(1, 12, 1, 5875))
+
+    def test_not_an_executable(self):
+        path = self.write_exe('WoW.exe', b'not a client' * 100)
+        self.assertIsNone(fingerprint.detect_build(path, FingerprintCache()))
+
+    def test_signature_at_end_of_file(self):
+        path = self.write_exe('WoW.exe', bytes(100) + fingerprint.FIXED_FILE_INFO_SIGNATURE + bytes(6))
+        with self.assertRaises(fingerprint.PEFormatError):
+            read_client_build(path)
+        with patch('fingerprint.logging'):
+            self.assertIsNone(fingerprint.detect_build(path, FingerprintCache()))
+
+    def test_cache_keyed_by_size_and_mtime(self):
+        path = self.write_exe('WoW.exe', make_pe(2, 4, 3, 8606))
+        cache = FingerprintCache()
+        with patch('fingerprint.read_client_build', wraps=read_client_build) as read:
+            cache.detect(path)
+            cache.detect(path)
+            self.assertEqual(read.call_count, 1)
+            # Replacing the client (e.g. patching it) invalidates the entry
+            self.write_exe('WoW.exe', make_pe(4, 3, 4, 15595, padding=16))
+            self.assertEqual(cache.detect(path).version, "Cataclysm (4.3.4)")
+            self.assertEqual(read.call_count, 2)
+
+    def test_cache_roundtrip(self):
+        path = self.write_exe('WoW.exe', make_pe(2, 4, 3, 8606))
+        cache_path = os.path.join(self.tmp.name, 'fingerprint_cache.json')
+        cache = FingerprintCache()
+        cache.detect(path)
+        cache.save(cache_path)
+        loaded = FingerprintCache.load(cache_path)
+        with patch('fingerprint.read_client_build') as read:
+            self.assertEqual(loaded.detect(path), ClientBuild(2, 4, 3, 8606))
+            read.assert_not_called()
+
+    def test_bulk_detection_and_mismatches(self):
+        vanilla = self.write_exe('vanilla.exe', make_pe(1, 12, 1, 5875))
+        cata = self.write_exe('cata.exe', make_pe(4, 3, 4, 15595))
+        configurations = [
+            {'name': 'A', 'wow_exe_path': vanilla, 'version': "Vanilla (1.12.x)"},
+            {'name': 'B', 'wow_exe_path': cata, 'version': "Wrath of the Lich King (3.3.5)"},
+            {'name': 'C', 'wow_exe_path': os.path.join(self.tmp.name, 'missing.exe'), 'version': ""},
+        ]
+        builds = detect_builds(configurations, FingerprintCache())
+        self.assertEqual(builds['A'].build, 5875)
+        self.assertIsNone(builds['C'])
+        mismatches = version_mismatches(configurations, builds)
+        self.assertEqual([(cfg['name'], build.version) for cfg, build in mismatches], [('B', "Cataclysm (4.3.4)")])
+
+    def test_launch_writes_realmlist_for_detected_version(self):
+        exe = self.write_exe('WoW.exe', make_pe(4, 3, 4, 15595))
+        realmlist = self.write_exe('realmlist.wtf', b'')
+        cfg = {'name': 'Cata', 'realmlist_path': realmlist, 'wow_exe_path': exe,
+               'server_address': 'logon.example.org', 'portal_address': '', 'version': "Vanilla (1.12.x)"}
+        with patch('core.spawn_wow') as spawn, patch('fingerprint.default_cache', FingerprintCache()):
+            core.launch_configuration(cfg)
+        spawn.assert_called_once()
+        with open(realmlist, 'r') as f:
+            self.assertIn("set patchlist logon.example.org", f.read())
+
+    def test_batch_update_writes_realmlist_for_detected_version(self):
+        exe = self.write_exe('WoW.exe', make_pe(4, 3, 4, 15595))
+        realmlist = self.write_exe('realmlist.wtf', b'')
+        cfg = {'name': 'Cata', 'realmlist_path': realmlist, 'wow_exe_path': exe,
+               'server_address': 'logon.example.org', 'portal_address': '', 'version': "Vanilla (1.12.x)"}
+        with patch('fingerprint.default_cache', FingerprintCache()), patch('core.logging'):
+            result, = core.update_realmlists([cfg])
+        self.assertIsNone(result.error)
+        with open(realmlist, 'r') as f:
+            self.assertIn("set patchlist logon.example.org", f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import gzip
+import logging
+import os
+import tempfile
+import time
+import unittest
+
+import core
+from history import LaunchHistory, format_duration
+from supervisor import ClientSupervisor
+from test_supervisor import stub_launcher, wait_until
+
+
+def cfg(name, server):
+    return {'name': name, 'server_address': server, 'version': "Vanilla (1.12.x)"}
+
+
+class TestLaunchHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.history = LaunchHistory(os.path.join(self.tmp.name, 'history.db'))
+        self.addCleanup(self.history.close)
+
+    def test_sessions_by_server(self):
+        now = time.time()
+        for started, length, server in [(now - 100, 60, 'a'), (now - 50, 30, 'a'), (now - 10, 600, 'b')]:
+            launch_id = self.history.record_launch(cfg('X', server), started, 900.0, 1234)
+            self.history.record_exit(launch_id, started + length, 0)
+        self.history.record_launch(cfg('X', 'a'), now, 500.0, 99)                 # still running
+        self.history.record_launch(cfg('X', 'a'), now, error="missing", ended=now)  # failed
+
+        rows = self.history.sessions_by_server()
+        self.assertEqual([(row.server, row.sessions, row.average_seconds) for row in rows],
+                         [('b', 1, 600.0), ('a', 2, 45.0)])
+        self.assertEqual(format_duration(rows[0].total_seconds), "0:10:00")
+
+    def test_slowest_launches_this_week(self):
+        now = time.time()
+        self.history.record_launch(cfg('Old', 'a'), now - 30 * 24 * 3600, 9000.0, 1)
+        for name, ms in [('Fast', 200.0), ('Slow', 4000.0), ('Medium', 1200.0)]:
+            self.history.record_launch(cfg(name, 'a'), now, ms, 1)
+
+        self.assertEqual([launch.name for launch in self.history.slowest_launches(limit=2)], ['Slow', 'Medium'])
+        self.assertEqual(self.history.slowest_launches(since=0, limit=1)[0].name, 'Old')
+
+    def test_queries_use_indexes(self):
+        plan = ' '.join(str(row) for row in self.history._query(
+            'EXPLAIN QUERY PLAN SELECT * FROM launches WHERE started >= ? AND time_to_start_ms IS NOT NULL '
+            'ORDER BY time_to_start_ms DESC LIMIT 10', (0,)))
+        self.assertIn('launches_started', plan)
+
+    def test_supervisor_records_launch_and_exit(self):
+        supervisor = ClientSupervisor(launcher=stub_launcher(0.1, exit_code=3), poll_interval=0.05,
+                                      history=self.history)
+        try:
+            supervisor.launch(cfg('Test', 'logon.example.org')).result(timeout=10)
+            wait_until(lambda: not supervisor.running())
+        finally:
+            supervisor.stop()
+
+        launch, = self.history.recent()
+        self.assertEqual((launch.name, launch.server, launch.exit_code), ('Test', 'logon.example.org', 3))
+        self.assertIsNotNone(launch.time_to_start_ms)
+        self.assertGreater(launch.session_seconds, 0)
+
+
+class TestLogRotation(unittest.TestCase):
+
+    def test_rotated_logs_are_compressed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'app.log')
+            handler = core.rotating_log_handler(path, max_bytes=200, backup_count=2)
+            logger = logging.Logger('rotation-test')
+            logger.addHandler(handler)
+            for i in range(40):
+                logger.info(f"line {i:03d} " + "x" * 20)
+            handler.close()
+
+            self.assertEqual(sorted(os.listdir(tmp)), ['app.log', 'app.log.1.gz', 'app.log.2.gz'])
+            with gzip.open(os.path.join(tmp, 'app.log.1.gz'), 'rt') as f:
+                self.assertIn('line', f.read())
+            self.assertLessEqual(os.path.getsize(path), 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
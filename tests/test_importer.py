@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import importer
+from importer import ImportCancelled, normalize_version, read_import
+from listview import ConfigListView
+from store import ConfigStore
+
+from test_listview import FakeListbox
+
+
+def existing(name, server, version="Vanilla (1.12.x)"):
+    return {'name': name, 'realmlist_path': '/wow/realmlist.wtf', 'wow_exe_path': '/wow/WoW.exe',
+            'server_address': server, 'portal_address': '', 'version': version}
+
+
+class TestImporter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_csv_with_aliases_and_deduplication(self):
+        path = self.write('servers.csv', "Name,Server,Expansion\n"
+                                         "Alpha,logon.alpha.example,WotLK\n"
+                                         "Alpha,logon.other.example,TBC\n"           # name taken
+                                         "Beta,LOGON.KNOWN.example,vanilla\n"        # server and version known
+                                         "Gamma,logon.known.example,3.3.5a\n"        # same server, other version
+                                         "Empty,,vanilla\n")
+        result = read_import(path, [existing('Known', 'logon.known.example')],
+                             default_paths={"Wrath of the Lich King (3.3.5)": ('/wotlk/realmlist.wtf', '/wotlk/Wow.exe')})
+        self.assertEqual([cfg['name'] for cfg in result.configurations], ['Alpha', 'Gamma'])
+        self.assertEqual(result.configurations[0]['version'], "Wrath of the Lich King (3.3.5)")
+        self.assertEqual(result.configurations[0]['wow_exe_path'], '/wotlk/Wow.exe')
+        self.assertEqual((result.rows, result.duplicate_names, result.duplicate_servers, result.invalid), (5, 1, 1, 1))
+
+    def test_json_lines_skips_bad_lines(self):
+        path = self.write('servers.jsonl', '{"name": "A", "server_address": "a.example", "version": "Cataclysm (4.3.4)"}\n'
+                                           'not json\n\n'
+                                           '{"server": "b.example"}\n')
+        result = read_import(path)
+        self.assertEqual([cfg['name'] for cfg in result.configurations], ['A', 'b.example'])
+        self.assertEqual(result.configurations[0]['patchlist'], 'a.example')
+        self.assertEqual(result.invalid, 1)
+
+    def test_config_json_is_streamed_across_chunks(self):
+        configurations = [existing(f"Server {i}", f"logon{i}.example") for i in range(500)]
+        path = self.write('config.json', json.dumps({'configurations': configurations}, indent=4))
+        with patch('importer.READ_SIZE', 97):
+            result = read_import(path)
+        self.assertEqual(result.configurations, configurations)
+
+        path = self.write('list.json', json.dumps(configurations[:3]))
+        self.assertEqual(len(read_import(path).configurations), 3)
+
+    def test_progress_and_cancel(self):
+        path = self.write('servers.csv', "name,server\n" + ''.join(f"S{i},s{i}.example\n" for i in range(5000)))
+        cancel = threading.Event()
+        reports = []
+
+        def progress(rows, fraction):
+            reports.append(fraction)
+            cancel.set()
+
+        with patch('importer.PROGRESS_INTERVAL', 0):
+            with self.assertRaises(ImportCancelled):
+                read_import(path, progress=progress, cancel=cancel)
+        self.assertEqual(len(reports), 1)
+        self.assertTrue(0 < reports[0] < 1)
+
+    def test_normalize_version(self):
+        self.assertEqual(normalize_version(" Burning Crusade "), "The Burning Crusade (2.4.3)")
+        self.assertEqual(normalize_version("Cataclysm (4.3.4)"), "Cataclysm (4.3.4)")
+        self.assertIsNone(normalize_version("retail"))
+
+    def test_large_import_into_store_and_listview(self):
+        path = self.write('servers.csv', "name,server\n" + ''.join(f"S{i},s{i}.example\n" for i in range(20000)))
+        store = ConfigStore(os.path.join(self.tmp.name, 'config.json'))
+        store.add(existing('Known', 's7.example'))
+        listbox = FakeListbox()
+        view = ConfigListView(listbox, store)
+
+        result = read_import(path, store['configurations'], default_paths=importer.paths_by_version(store['configurations']))
+        store.extend(result.configurations)
+        view.extend(result.configurations)
+        listbox.run_jobs()
+
+        self.assertEqual(len(store), 20000)
+        self.assertEqual(len(listbox.items), 20000)
+        self.assertEqual(store.find('S1')['realmlist_path'], '/wow/realmlist.wtf')
+        # A large batch is written as a snapshot rather than journaled entry by entry
+        self.assertFalse(os.path.exists(store.journal_path))
+        self.assertEqual(len(ConfigStore(store.path).load()), 20000)
+        view.set_filter('s19999')
+        self.assertEqual(listbox.items, ['S19999'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+
+import listview
+from listview import ConfigListView
+from store import ConfigStore, diff_configurations
+
+
+# Headless stand-in for tk.Listbox that records how many rows were touched
+class FakeListbox:
+    def __init__(self):
+        self.items = []
+        self.selected = set()
+        self.inserted = 0
+        self.jobs = []
+
+    def insert(self, index, *labels):
+        index = len(self.items) if index == 'end' else index
+        self.items[index:index] = labels
+        self.inserted += len(labels)
+
+    def delete(self, first, last=None):
+        if last == 'end':
+            del self.items[first:]
+            self.selected.clear()
+        else:
+            del self.items[first]
+            self.selected.discard(first)
+
+    def curselection(self):
+        return tuple(sorted(self.selected))
+
+    def selection_set(self, row):
+        self.selected.add(row)
+
+    def selection_clear(self, first, last=None):
+        self.selected.clear()
+
+    def selection_includes(self, row):
+        return row in self.selected
+
+    def see(self, row):
+        pass
+
+    def activate(self, row):
+        pass
+
+    def after(self, delay, callback, *args):
+        self.jobs.append((callback, args))
+        return len(self.jobs)
+
+    def after_cancel(self, job):
+        self.jobs[job - 1] = None
+
+    def run_jobs(self):
+        while any(self.jobs):
+            for i, job in enumerate(self.jobs):
+                if job:
+                    self.jobs[i] = None
+                    job[0](*job[1])
+
+
+def make_store(names):
+    store = ConfigStore('unused.json')
+    store._set_configurations([{'name': n, 'server_address': f'{n.lower()}.example', 'version': 'v'} for n in names])
+    return store
+
+
+class TestConfigListView(unittest.TestCase):
+
+    def test_swap_touches_only_two_rows(self):
+        store = make_store(['A', 'B', 'C', 'D'])
+        listbox = FakeListbox()
+        view = ConfigListView(listbox, store)
+        listbox.inserted = 0
+
+        store._swap(1, 2)
+        view.swap(1, 2)
+        view.selection_set(2)
+
+        self.assertEqual(listbox.items, ['A', 'C', 'B', 'D'])
+        self.assertEqual(listbox.inserted, 2)
+        self.assertEqual(view.curselection(), (2,))
+
+    def test_filter_maps_rows_to_configuration_indices(self):
+        store = make_store(['Alpha', 'Beta', 'Alphabet', 'Gamma'])
+        listbox = FakeListbox()
+        view = ConfigListView(listbox, store)
+
+        view.set_filter('alpha')
+        self.assertEqual(listbox.items, ['Alpha', 'Alphabet'])
+        listbox.selection_set(1)
+        self.assertEqual(view.curselection(), (2,))
+
+        # Deleting a hidden entry shifts the indices of visible ones
+        removed = store['configurations'][1]
+        store._delete(1)
+        view.remove(1, removed)
+        self.assertEqual(view.curselection(), (1,))
+
+        # Swapping a visible entry with a hidden neighbour keeps its row
+        store._swap(1, 2)
+        view.swap(1, 2)
+        self.assertEqual(listbox.items, ['Alpha', 'Alphabet'])
+        view.selection_set(2)
+        self.assertEqual(view.curselection(), (2,))
+
+    def test_append_and_replace_respect_filter(self):
+        store = make_store(['Alpha', 'Beta'])
+        listbox = FakeListbox()
+        view = ConfigListView(listbox, store)
+        view.set_filter('alp')
+
+        store._insert({'name': 'Alpine', 'server_address': '', 'version': ''})
+        view.append(store['configurations'][2])
+        store._insert({'name': 'Delta', 'server_address': '', 'version': ''})
+        view.append(store['configurations'][3])
+        self.assertEqual(listbox.items, ['Alpha', 'Alpine'])
+
+        old = store['configurations'][1]
+        new = {'name': 'Alpha Beta', 'server_address': '', 'version': ''}
+        store._replace(1, new)
+        view.replace(1, old, new)
+        self.assertEqual(listbox.items, ['Alpha', 'Alpha Beta', 'Alpine'])
+
+        view.set_filter('')
+        self.assertEqual(listbox.items, ['Alpha', 'Alpha Beta', 'Alpine', 'Delta'])
+
+    def test_large_lists_are_populated_in_chunks(self):
+        store = make_store([f'Server {i}' for i in range(listview.FIRST_CHUNK + 2 * listview.CHUNK_SIZE + 5)])
+        listbox = FakeListbox()
+        view = ConfigListView(listbox, store)
+
+        self.assertEqual(len(listbox.items), listview.FIRST_CHUNK)
+        listbox.run_jobs()
+        self.assertEqual(len(listbox.items), len(store))
+        self.assertEqual(len(view), len(store))
+
+    def test_refresh_only_rewrites_changed_labels(self):
+        store = make_store(['A', 'B', 'C'])
+        notes = {}
+        listbox = FakeListbox()
+        view = ConfigListView(listbox, store, label=lambda cfg: cfg['name'] + notes.get(cfg['name'], ''))
+        listbox.inserted = 0
+
+        notes['B'] = ' [12 ms]'
+        view.refresh()
+        self.assertEqual(listbox.items, ['A', 'B [12 ms]', 'C'])
+        self.assertEqual(listbox.inserted, 1)
+
+    def test_apply_diff_touches_only_changed_rows(self):
+        store = make_store(['A', 'B', 'C', 'D'])
+        listbox = FakeListbox()
+        view = ConfigListView(listbox, store)
+        view.set_filter('')
+        listbox.inserted = 0
+
+        old = list(store['configurations'])
+        new = [old[0], dict(old[2], name='C2'), old[3], {'name': 'E', 'server_address': 'e.example', 'version': 'v'}]
+        store._set_configurations(new)
+        view.apply_diff(diff_configurations(old, new))
+
+        self.assertEqual(listbox.items, ['A', 'C2', 'D', 'E'])
+        self.assertEqual(listbox.inserted, 2)
+        view.set_filter('e.example')
+        self.assertEqual(listbox.items, ['E'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import core
+from metrics import Histogram, Metrics, metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_percentiles(self):
+        histogram = Histogram()
+        for ms in [1] * 90 + [100] * 9 + [4000]:
+            histogram.observe(ms)
+        data = histogram.to_dict()
+        self.assertEqual(data['count'], 100)
+        self.assertEqual(data['p50_ms'], 1)
+        self.assertEqual(data['p95_ms'], 100)
+        self.assertEqual(data['max_ms'], 4000)
+        self.assertEqual(data['buckets'], {'<=1': 90, '<=100': 9, '<=5000': 1})
+
+    def test_timer_and_export(self):
+        registry = Metrics()
+        with registry.timer('work'):
+            pass
+        registry.observe('work', 2.0)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'metrics.json')
+            registry.export(path)
+            with open(path, 'r') as f:
+                self.assertEqual(json.load(f)['work']['count'], 2)
+
+    def test_realmlist_writes_are_timed(self):
+        metrics.reset()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'realmlist.wtf')
+            core.write_realmlist(path, 'logon.example.org', '', 'Vanilla (1.12.x)')
+            core.write_realmlist(path, 'logon.example.org', '', 'Vanilla (1.12.x)')
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['realmlist.write']['count'], 1)
+        self.assertEqual(snapshot['realmlist.unchanged']['count'], 1)
+
+    def test_logging_goes_through_queue_listener(self):
+        with tempfile.TemporaryDirectory() as tmp, patch('core.LOG_FILE', os.path.join(tmp, 'app.log')), \
+                patch.object(logging.getLogger(), 'handlers', []):
+            try:
+                core.setup_logging()
+                logging.info("queued record")
+                core.stop_logging()
+                with open(core.LOG_FILE, 'r') as f:
+                    self.assertIn("queued record", f.read())
+                self.assertEqual(logging.getLogger().handlers, [])
+            finally:
+                core.stop_logging()
+
+if __name__ == '__main__':
+    unittest.main()
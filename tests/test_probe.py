@@ -0,0 +1,118 @@
+import asyncio
+import socket
+import threading
+import time
+import unittest
+
+from probe import (ProbeCache, ProbeResult, parse_server_address, probe_configurations, sort_by_latency,
+                   format_probe_result)
+
+
+# Local asyncio stand-in for an auth server, running on its own loop in a background thread
+class StandInServer:
+    def __init__(self):
+        self.connections = 0
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+
+        async def handle(reader, writer):
+            self.connections += 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+        self.server = self.loop.run_until_complete(asyncio.start_server(handle, '127.0.0.1', 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+        self.loop.run_until_complete(self._shutdown())
+        self.loop.close()
+
+    # Stop accepting and let handlers of connections accepted just now close them before the loop closes
+    async def _shutdown(self):
+        self.server.close()
+        await asyncio.sleep(0)
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.gather(*pending, return_exceptions=True)
+        await self.server.wait_closed()
+
+    # The handler runs on the server's loop, slightly after the client sees the connection
+    def wait_for_connections(self, count, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while self.connections < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.connections
+
+    def __enter__(self):
+        self.thread.start()
+        self.ready.wait(5)
+        return self
+
+    def __exit__(self, *exc):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+
+def unused_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class TestProbe(unittest.TestCase):
+
+    def test_parse_server_address(self):
+        self.assertEqual(parse_server_address('logon.example.org'), ('logon.example.org', 3724))
+        self.assertEqual(parse_server_address('logon.example.org:3725'), ('logon.example.org', 3725))
+        self.assertEqual(parse_server_address('[::1]:4000'), ('::1', 4000))
+        self.assertEqual(parse_server_address('logon.example.org', default_port=1234), ('logon.example.org', 1234))
+
+    def test_probe_configurations_reachable_and_dead(self):
+        dead_port = unused_port()
+        with StandInServer() as server:
+            configurations = [
+                {'name': 'Alive', 'server_address': f'127.0.0.1:{server.port}'},
+                {'name': 'Alive Again', 'server_address': '127.0.0.1', 'auth_port': server.port},
+                {'name': 'Dead', 'server_address': f'127.0.0.1:{dead_port}'},
+            ]
+            results = probe_configurations(configurations, timeout=2)
+
+        self.assertTrue(results['Alive'].reachable)
+        self.assertIsNotNone(results['Alive'].latency_ms)
+        # Both configurations point at the same server, so it is only probed once
+        self.assertIs(results['Alive'], results['Alive Again'])
+        self.assertFalse(results['Dead'].reachable)
+        self.assertEqual(format_probe_result(results['Dead']), "unreachable")
+
+    def test_cache_serves_fresh_results_and_expires(self):
+        now = [100.0]
+        cache = ProbeCache(ttl=10, clock=lambda: now[0])
+        with StandInServer() as server:
+            configurations = [{'name': 'Alive', 'server_address': f'127.0.0.1:{server.port}'}]
+            probe_configurations(configurations, cache=cache)
+            probe_configurations(configurations, cache=cache)
+            self.assertEqual(server.wait_for_connections(1), 1)
+
+            now[0] += 11
+            probe_configurations(configurations, cache=cache)
+            self.assertEqual(server.wait_for_connections(2), 2)
+
+    def test_sort_by_latency(self):
+        configurations = [{'name': n} for n in ('slow', 'dead', 'unknown', 'fast')]
+        results = {
+            'slow': ProbeResult('a', 1, True, 90.0, None, 0),
+            'dead': ProbeResult('b', 1, False, None, 'refused', 0),
+            'fast': ProbeResult('c', 1, True, 5.0, None, 0),
+        }
+        ordered = [cfg['name'] for cfg in sort_by_latency(configurations, results)]
+        self.assertEqual(ordered, ['fast', 'slow', 'dead', 'unknown'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import os
+import struct
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from probe import ProbeCache
+from realms import (Realm, RealmQueryResult, query_configurations, format_realm_result, parse_realm_list,
+                    srp6_client_proof)
+from test_probe import unused_port
+
+# The SRP6 modulus and generator used by every WoW auth server
+N = bytes.fromhex('894B645E89E1535BBDAD5B8B290650530801B18EBFBF5E8FAB3C82872A3E9BB7')[::-1]
+G = bytes([7])
+
+
+def sha1(*parts):
+    return hashlib.sha1(b''.join(parts)).digest()
+
+
+def to_int(data):
+    return int.from_bytes(data, 'little')
+
+
+def encode_realm_list(realms, major):
+    body = bytearray(bytes(4))
+    body += bytes([len(realms)]) if major < 2 else struct.pack('<H', len(realms))
+    for realm_type, flags, name, address, population in realms:
+        body += struct.pack('<IB', realm_type, flags) if major < 2 else struct.pack('<BBB', realm_type, 0, flags)
+        body += name.encode() + b'\0' + address.encode() + b'\0'
+        body += struct.pack('<fBBB', population, 2, 1, 1)
+        if major >= 2 and flags & 0x04:
+            body += bytes([3, 3, 5]) + struct.pack('<H', 12340)
+    body += b'\x10\0'
+    return struct.pack('<BH', 0x10, len(body)) + bytes(body)
+
+
+# Scripted stand-in for a realmd/authserver: answers the logon challenge, verifies the SRP6 proof
+# against `accounts` and sends `realms` as the realm list (or the raw `realm_list` packet), on its
+# own loop in a background thread
+class StandInAuthServer:
+    def __init__(self, accounts=None, realms=(), delay=0.0, realm_list=None):
+        self.accounts = {name.upper(): password.upper() for name, password in (accounts or {}).items()}
+        self.realms = list(realms)
+        self.realm_list = realm_list
+        self.delay = delay
+        self.connections = 0
+        self.writers = set()
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    async def _accept(self, reader, writer):
+        self.connections += 1
+        self.writers.add(writer)
+        try:
+            await self.handle(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            # Stopped while the handler was still waiting (the client had already timed out). Ending
+            # normally keeps asyncio from logging the cancellation as an error.
+            pass
+        finally:
+            await self._close(writer)
+
+    async def _close(self, writer):
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        self.writers.discard(writer)
+
+    async def handle(self, reader, writer):
+        await asyncio.sleep(self.delay)
+        _, _, size = struct.unpack('<BBH', await reader.readexactly(4))
+        body = await reader.readexactly(size)
+        major = body[4]
+        account = body[30:30 + body[29]]
+        password = self.accounts.get(account.decode())
+        if password is None:
+            writer.write(bytes([0, 0, 0x04]))
+            return
+
+        salt = os.urandom(32)
+        x = to_int(sha1(salt, sha1(account, b':', password.encode())))
+        n, g = to_int(N), to_int(G)
+        v = pow(g, x, n)
+        b = to_int(os.urandom(19))
+        B = ((3 * v + pow(g, b, n)) % n).to_bytes(32, 'little')
+        writer.write(bytes([0, 0, 0]) + B + bytes([1]) + G + bytes([32]) + N + salt + bytes(16) + bytes([0]))
+
+        proof = await reader.readexactly(75)
+        A, M1 = proof[1:33], proof[33:53]
+        u = to_int(sha1(A, B))
+        S = pow(to_int(A) * pow(v, u, n), b, n).to_bytes(32, 'little')
+        even, odd = sha1(S[0::2]), sha1(S[1::2])
+        K = bytes(byte for pair in zip(even, odd) for byte in pair)
+        xor = bytes(p ^ q for p, q in zip(sha1(N), sha1(G)))
+        if M1 != sha1(xor, sha1(account), salt, A, B, K):
+            writer.write(bytes([1, 0x05, 0, 0]))
+            return
+        writer.write(bytes([1, 0]) + sha1(A, M1, K) + bytes(4 if major < 2 else 10))
+
+        await reader.readexactly(5)
+        writer.write(self.realm_list if self.realm_list is not None else encode_realm_list(self.realms, major))
+        await writer.drain()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_server(self._accept, '127.0.0.1', 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+        self.loop.run_until_complete(self._shutdown())
+        self.loop.close()
+
+    # Stop accepting, cancel handlers that are still running (e.g. sleeping out `delay`), and close
+    # every connection before the loop closes
+    async def _shutdown(self):
+        self.server.close()
+        # Let handlers for connections accepted just now start, so they close their transports too
+        await asyncio.sleep(0)
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await asyncio.gather(*(self._close(writer) for writer in list(self.writers)))
+        await self.server.wait_closed()
+        await self.loop.shutdown_asyncgens()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+    def __enter__(self):
+        self.thread.start()
+        self.ready.wait(5)
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# Answers the logon challenge with an SRP6 challenge whose modulus is empty
+class GarbageAuthServer(StandInAuthServer):
+    async def handle(self, reader, writer):
+        _, _, size = struct.unpack('<BBH', await reader.readexactly(4))
+        await reader.readexactly(size)
+        writer.write(bytes([0, 0, 0]) + bytes(32) + bytes([1]) + G + bytes([0]) + bytes(32) + bytes(16) + bytes([0]))
+        await writer.drain()
+        await reader.read()
+
+
+REALMS = [(1, 0x00, 'Nostalrius', '127.0.0.1:8085', 1.5), (0, 0x02, 'Test Realm', '127.0.0.1:8086', 0.0)]
+
+
+class TestRealms(unittest.TestCase):
+
+    def config(self, server, name='Server', **extra):
+        return dict({'name': name, 'server_address': f'127.0.0.1:{server.port}', 'version': "Vanilla (1.12.x)"},
+                    **extra)
+
+    def test_challenge_only_without_credentials(self):
+        with StandInAuthServer() as server:
+            results = query_configurations([self.config(server)], timeout=2)
+        self.assertEqual(results['Server'].status, "up")
+        self.assertTrue(results['Server'].reachable)
+        self.assertIsNotNone(results['Server'].latency_ms)
+        self.assertEqual(format_realm_result(results['Server']), "auth up")
+
+    def test_login_and_realm_list(self):
+        for version in ("Vanilla (1.12.x)", "Wrath of the Lich King (3.3.5)"):
+            with self.subTest(version=version), StandInAuthServer({'player': 'secret'}, REALMS) as server:
+                cfg = self.config(server, version=version, auth_account='player', auth_password='secret')
+                result = query_configurations([cfg], timeout=2)['Server']
+
+                self.assertEqual(result.status, "realms", result.error)
+                self.assertEqual([realm.name for realm in result.realms], ['Nostalrius', 'Test Realm'])
+                self.assertEqual(result.realms[0].type, "PvP")
+                self.assertEqual(result.realms[0].population_label, "Medium")
+                self.assertFalse(result.realms[1].online)
+                self.assertEqual(format_realm_result(result), "1/2 realms up, Nostalrius: Medium")
+
+    def test_wrong_password(self):
+        with StandInAuthServer({'player': 'secret'}, REALMS) as server:
+            cfg = self.config(server, auth_account='player', auth_password='wrong')
+            result = query_configurations([cfg], timeout=2)['Server']
+        self.assertEqual(result.status, "error")
+        self.assertEqual(result.error, "incorrect password")
+
+    def test_unknown_account(self):
+        with StandInAuthServer() as server:
+            cfg = self.config(server, auth_account='nobody', auth_password='x')
+            result = query_configurations([cfg], timeout=2)['Server']
+        self.assertEqual(result.error, "unknown account")
+
+    def test_per_host_timeout_runs_concurrently(self):
+        dead_port = unused_port()
+        with StandInAuthServer(delay=5) as slow, StandInAuthServer() as fast:
+            configurations = [self.config(slow, 'Slow'), self.config(fast, 'Fast'),
+                              {'name': 'Dead', 'server_address': f'127.0.0.1:{dead_port}'}]
+            started = time.monotonic()
+            results = query_configurations(configurations, timeout=0.5)
+            elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 2.0)
+        self.assertEqual(results['Fast'].status, "up")
+        self.assertEqual(results['Slow'].error, "timed out after 0.5s")
+        self.assertFalse(results['Dead'].reachable)
+
+    def test_cache_ttl(self):
+        now = [1000.0]
+        cache = ProbeCache(ttl=60, clock=lambda: now[0])
+        with StandInAuthServer() as server:
+            configurations = [self.config(server)]
+            first = query_configurations(configurations, timeout=2, cache=cache)
+            self.assertIs(query_configurations(configurations, timeout=2, cache=cache)['Server'], first['Server'])
+            self.assertEqual(server.connections, 1)
+
+            now[0] += 61
+            query_configurations(configurations, timeout=2, cache=cache)
+            self.assertEqual(server.connections, 2)
+
+    def test_broken_server_does_not_fail_the_batch(self):
+        truncated = struct.pack('<BH', 0x10, 4) + bytes(4)  # 1.x realm list without a realm count
+        with GarbageAuthServer() as garbage, StandInAuthServer({'player': 'secret'}, realm_list=truncated) as short, \
+                StandInAuthServer({'player': 'secret'}, REALMS) as good:
+            credentials = {'auth_account': 'player', 'auth_password': 'secret'}
+            results = query_configurations([self.config(garbage, 'Garbage', **credentials),
+                                            self.config(short, 'Short', **credentials),
+                                            self.config(good, 'Good', **credentials)], timeout=2)
+        self.assertEqual(results['Garbage'].error, "server sent an invalid SRP6 challenge")
+        self.assertEqual(results['Short'].status, "error")
+        self.assertEqual(results['Good'].status, "realms", results['Good'].error)
+
+    def test_unexpected_error_becomes_an_error_result(self):
+        with StandInAuthServer() as server, patch('realms._handshake', side_effect=ZeroDivisionError), \
+                patch('realms.logging'):
+            result = query_configurations([self.config(server)], timeout=2)['Server']
+        self.assertEqual(result.status, "error")
+        self.assertIn("ZeroDivisionError", result.error)
+
+    def test_parse_realm_list_build_info(self):
+        payload = encode_realm_list([(0, 0x04, 'Icecrown', '10.0.0.1:8085', 2.0)], 3)[3:]
+        realm, = parse_realm_list(payload, 3)
+        self.assertEqual((realm.name, realm.address, realm.population_label), ('Icecrown', '10.0.0.1:8085', "High"))
+
+    def test_srp6_rejects_zero_challenge(self):
+        with self.assertRaises(Exception):
+            srp6_client_proof('a', 'b', bytes(32), G, N, bytes(32))
+
+    def test_format_realm_result(self):
+        full = Realm('Blackrock', 'x', 'PvP', 0x80, 2.0)
+        self.assertEqual(format_realm_result(RealmQueryResult('h', 1, "realms", [full])), "Blackrock: Full")
+        self.assertEqual(format_realm_result(RealmQueryResult('h', 1, "error", error="timed out after 3s")),
+                         "auth: timed out after 3s")
+        self.assertEqual(format_realm_result(None), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import core
+import resolver
+from resolver import (DnsResolver, Resolution, ResolutionCache, build_query, format_resolution, parse_response,
+                      pin_address, resolve_configurations)
+
+
+# Answers from a table instead of the network: {host: (addresses, ttl)}, an exception, or a delay
+class StubResolver:
+    def __init__(self, answers, delay=0.0):
+        self.answers = answers
+        self.delay = delay
+        self.lookups = []
+
+    async def resolve(self, host):
+        self.lookups.append(host)
+        await asyncio.sleep(self.delay)
+        answer = self.answers.get(host)
+        if answer is None:
+            raise OSError("no such host")
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def dns_response(query, addresses, ttl, rcode=0):
+    query_id = struct.unpack_from('>H', query)[0]
+    question = query[12:]
+    answers = b''.join(b'\xc0\x0c' + struct.pack('>HHIH', 1, 1, ttl, 4) + socket.inet_aton(address)
+                       for address in addresses)
+    header = struct.pack('>HHHHHH', query_id, 0x8180 | rcode, 1, len(addresses), 0, 0)
+    return header + question + answers
+
+
+# UDP stand-in for a DNS server on 127.0.0.1, answering from `records` ({host: ([ips], ttl)})
+class StandInDnsServer:
+    def __init__(self, records):
+        self.records = records
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(('127.0.0.1', 0))
+        self.port = self.socket.getsockname()[1]
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while True:
+            try:
+                query, client = self.socket.recvfrom(512)
+            except OSError:
+                return
+            labels, offset = [], 12
+            while query[offset]:
+                labels.append(query[offset + 1:offset + 1 + query[offset]].decode())
+                offset += 1 + query[offset]
+            record = self.records.get('.'.join(labels))
+            response = dns_response(query, *record) if record else dns_response(query, [], 0, rcode=3)
+            self.socket.sendto(response, client)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.socket.close()
+        self.thread.join(2)
+
+
+class TestResolver(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch('resolver.logging')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_resolves_concurrently_and_reports_failures(self):
+        stub = StubResolver({'logon.example.org': (['192.0.2.10'], 600), 'slow.example.org': (['192.0.2.20'], 60)},
+                            delay=0.2)
+        configurations = [
+            {'name': 'A', 'server_address': 'logon.example.org:3725', 'portal_address': 'slow.example.org'},
+            {'name': 'B', 'server_address': 'missing.example.org'},
+            {'name': 'C', 'server_address': '203.0.113.5'},
+        ]
+        started = time.monotonic()
+        results = resolve_configurations(configurations, resolver=stub)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+        self.assertIn(results['A'].host, ('logon.example.org', 'slow.example.org'))
+        self.assertGreaterEqual(results['A'].latency_ms, 150)
+        self.assertEqual(format_resolution(results['B']), "dns: no such host")
+        self.assertEqual(format_resolution(results['C']), "")
+        self.assertNotIn('203.0.113.5', stub.lookups)
+        self.assertIn('slow.example.org', stub.lookups)
+
+    def test_reports_the_worse_of_server_and_portal(self):
+        stub = StubResolver({'logon.example.org': (['192.0.2.10'], 600), 'fast.example.org': (['192.0.2.20'], 60)})
+        results = resolve_configurations([
+            {'name': 'Portal down', 'server_address': 'logon.example.org', 'portal_address': 'down.example.org'},
+            {'name': 'Both up', 'server_address': 'logon.example.org:3725', 'portal_address': 'fast.example.org'},
+        ], resolver=stub)
+        self.assertEqual(results['Portal down'].host, 'down.example.org')
+        self.assertEqual(format_resolution(results['Portal down']), "dns: no such host")
+        self.assertTrue(results['Both up'].ok)
+
+    def test_cache_honours_record_ttl(self):
+        now = [100.0]
+        cache = ResolutionCache(clock=lambda: now[0])
+        stub = StubResolver({'short.example.org': (['192.0.2.1'], 40), 'long.example.org': (['192.0.2.2'], 3600)})
+        configurations = [{'name': 'Short', 'server_address': 'short.example.org'},
+                          {'name': 'Long', 'server_address': 'long.example.org'}]
+        resolve_configurations(configurations, resolver=stub, cache=cache)
+        now[0] += 41
+        resolve_configurations(configurations, resolver=stub, cache=cache)
+        self.assertEqual(stub.lookups, ['short.example.org', 'long.example.org', 'short.example.org'])
+
+    def test_ttl_is_clamped(self):
+        stub = StubResolver({'zero.example.org': (['192.0.2.1'], 0), 'system.example.org': (['192.0.2.2'], None)})
+        results = resolve_configurations([{'name': 'Zero', 'server_address': 'zero.example.org'},
+                                          {'name': 'System', 'server_address': 'system.example.org'}], resolver=stub)
+        self.assertEqual(results['Zero'].ttl, resolver.MIN_TTL)
+        self.assertEqual(results['System'].ttl, resolver.DEFAULT_TTL)
+
+    def test_timeout_per_host(self):
+        stub = StubResolver({'slow.example.org': (['192.0.2.1'], 60)}, delay=5)
+        results = resolve_configurations([{'name': 'Slow', 'server_address': 'slow.example.org'}], resolver=stub,
+                                         timeout=0.2)
+        self.assertEqual(results['Slow'].error, "timed out after 0.2s")
+
+    def test_pin_address_keeps_port_and_falls_back(self):
+        stub = StubResolver({'logon.example.org': (['192.0.2.10'], 600)})
+        self.assertEqual(pin_address('logon.example.org', stub), '192.0.2.10')
+        self.assertEqual(pin_address('logon.example.org:3725', stub), '192.0.2.10:3725')
+        self.assertEqual(pin_address('down.example.org', stub), 'down.example.org')
+        self.assertEqual(pin_address('', stub), '')
+
+    def test_prefers_ipv4(self):
+        self.assertEqual(Resolution('h', ['2001:db8::1', '192.0.2.1']).address, '192.0.2.1')
+
+    def test_realmlist_gets_ip_while_config_keeps_hostname(self):
+        cache = ResolutionCache()
+        cache.put(Resolution('logon.example.org', ['192.0.2.10'], 600, 12.0, None, time.monotonic()))
+        with tempfile.TemporaryDirectory() as tmp:
+            realmlist = os.path.join(tmp, 'realmlist.wtf')
+            cfg = {'name': 'Pinned', 'realmlist_path': realmlist, 'server_address': 'logon.example.org',
+                   'portal_address': '', 'version': '', 'pin_ip': True}
+            with patch('resolver.default_cache', cache):
+                core.update_realmlists([cfg])
+            self.assertEqual(core.read_realmlist(realmlist)['realmlist'], '192.0.2.10')
+        self.assertEqual(cfg['server_address'], 'logon.example.org')
+
+
+class TestDnsResolver(unittest.TestCase):
+
+    def test_parse_response(self):
+        query = build_query(0x1234, 'logon.example.org')
+        addresses, ttl = parse_response(dns_response(query, ['192.0.2.1', '192.0.2.2'], 300), 0x1234)
+        self.assertEqual((addresses, ttl), (['192.0.2.1', '192.0.2.2'], 300))
+        with self.assertRaisesRegex(OSError, "no such host"):
+            parse_response(dns_response(query, [], 0, rcode=3), 0x1234)
+
+    def test_queries_server_and_falls_back(self):
+        fallback = StubResolver({'hosts-only.lan': (['10.0.0.5'], None)})
+        with StandInDnsServer({'logon.example.org': (['192.0.2.7'], 1200)}) as server:
+            dns = DnsResolver('127.0.0.1', server.port, fallback=fallback)
+            results = resolve_configurations([{'name': 'DNS', 'server_address': 'logon.example.org'},
+                                              {'name': 'Hosts', 'server_address': 'hosts-only.lan'}], resolver=dns)
+        self.assertEqual((results['DNS'].addresses, results['DNS'].ttl), (['192.0.2.7'], 1200))
+        self.assertEqual(results['Hosts'].addresses, ['10.0.0.5'])
+        self.assertEqual(fallback.lookups, ['hosts-only.lan'])
+
+
+if __name__ == '__main__':
+    unittest.main()
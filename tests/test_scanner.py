@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import scanner
+from scanner import ScanCache, scan_installations, propose_configurations
+
+
+def touch(path, content=''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+class TestScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        # Vanilla layout: realmlist.wtf next to the executable
+        touch(os.path.join(self.root, 'Games', 'Vanilla', 'WoW.exe'))
+        touch(os.path.join(self.root, 'Games', 'Vanilla', 'realmlist.wtf'), 'set realmlist logon.vanilla.example\n')
+        # WotLK layout: Data/<locale>/realmlist.wtf, lower-case executable name
+        touch(os.path.join(self.root, 'Games', 'Wotlk', 'wow.exe'))
+        touch(os.path.join(self.root, 'Games', 'Wotlk', 'Data', 'enUS', 'realmlist.wtf'),
+              'set realmlist logon.wotlk.example\nset portal portal.wotlk.example\n')
+        touch(os.path.join(self.root, 'Games', 'Wotlk', 'Data', 'common.MPQ'))
+        # Noise that must not be reported
+        touch(os.path.join(self.root, 'Other', 'deep', 'er', 'notes.txt'))
+        touch(os.path.join(self.root, '.hidden', 'WoW.exe'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_finds_both_layouts(self):
+        installations = scan_installations([self.root])
+        self.assertEqual([os.path.basename(i.path) for i in installations], ['Vanilla', 'Wotlk'])
+        self.assertEqual(installations[1].realmlist_paths,
+                         [os.path.join(self.root, 'Games', 'Wotlk', 'Data', 'enUS', 'realmlist.wtf')])
+        self.assertTrue(installations[1].wow_exe_path.endswith('wow.exe'))
+
+    def test_rescan_uses_cache_and_sees_changes(self):
+        cache = ScanCache()
+        scan_installations([self.root], cache)
+
+        with patch('scanner.os.scandir', wraps=os.scandir) as scandir:
+            self.assertEqual(len(scan_installations([self.root], cache)), 2)
+        scandir.assert_not_called()
+
+        # A new installation changes its parent's mtime, so only that directory is listed again
+        touch(os.path.join(self.root, 'Games', 'Tbc', 'Wow.exe'))
+        with patch('scanner.os.scandir', wraps=os.scandir) as scandir:
+            installations = scan_installations([self.root], cache)
+        self.assertEqual(len(installations), 3)
+        listed = {call.args[0] for call in scandir.call_args_list}
+        self.assertEqual(listed, {os.path.join(self.root, 'Games'), os.path.join(self.root, 'Games', 'Tbc')})
+
+    def test_cache_roundtrip(self):
+        cache = ScanCache()
+        scan_installations([self.root], cache)
+        path = os.path.join(self.root, 'cache.json')
+        cache.save(path)
+        loaded = ScanCache.load(path)
+        self.assertEqual(len(loaded), len(cache))
+
+    def test_propose_configurations(self):
+        installations = scan_installations([self.root])
+        existing = [{'name': 'Vanilla', 'wow_exe_path': installations[0].wow_exe_path,
+                     'realmlist_path': installations[0].realmlist_paths[0]},
+                    {'name': 'Wotlk', 'wow_exe_path': 'elsewhere', 'realmlist_path': 'elsewhere'}]
+        proposals = propose_configurations(installations, existing)
+
+        self.assertEqual(len(proposals), 1)
+        self.assertEqual(proposals[0]['name'], 'Wotlk (2)')
+        self.assertEqual(proposals[0]['server_address'], 'logon.wotlk.example')
+        self.assertEqual(proposals[0]['portal_address'], 'portal.wotlk.example')
+
+    def test_skipped_directories(self):
+        self.assertTrue(all('.hidden' not in i.path for i in scan_installations([self.root])))
+        self.assertIn('node_modules', scanner.SKIPPED_NAMES)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from search import SearchIndex
+
+
+def make_config(name, server, version='Wrath of the Lich King (3.3.5)'):
+    return {'name': name, 'server_address': server, 'version': version}
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SearchIndex([
+            make_config('Warmane Icecrown', 'logon.warmane.com'),
+            make_config('Kronos', 'login.kronos-wow.com', 'Vanilla (1.12.x)'),
+            make_config('Local Test', '127.0.0.1'),
+        ])
+
+    def test_matches_name_server_and_version_case_insensitively(self):
+        self.assertEqual(self.index.search('icecrown'), {'Warmane Icecrown'})
+        self.assertEqual(self.index.search('KRONOS-WOW'), {'Kronos'})
+        self.assertEqual(self.index.search('vanilla'), {'Kronos'})
+        self.assertEqual(self.index.search('3.3.5'), {'Warmane Icecrown', 'Local Test'})
+
+    def test_short_and_empty_queries(self):
+        self.assertEqual(self.index.search('lo'), {'Warmane Icecrown', 'Kronos', 'Local Test'})
+        self.assertEqual(self.index.search(''), {'Warmane Icecrown', 'Kronos', 'Local Test'})
+        self.assertEqual(self.index.search('zzzz'), set())
+
+    def test_narrowing_query_reuses_previous_matches(self):
+        self.assertEqual(self.index.search('war'), {'Warmane Icecrown'})
+        self.assertEqual(self.index.search('warmane'), {'Warmane Icecrown'})
+        self.assertEqual(self.index.search('warmanex'), set())
+
+    def test_updates_are_reflected(self):
+        self.index.search('kro')
+        self.index.update('Kronos', make_config('Kronos IV', 'play.kronos.example'))
+        self.assertEqual(self.index.search('kronos'), {'Kronos IV'})
+        self.index.remove('Kronos IV')
+        self.assertEqual(self.index.search('kro'), set())
+        self.assertTrue(self.index.matches('Local Test', '127.0'))
+
+
+if __name__ == '__main__':
+    unittest.main()
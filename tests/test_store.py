@@ -0,0 +1,329 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from store import ConfigStore, ConfigWriter, diff_configurations, file_lock, write_snapshot
+
+
+def make_config(name, server='logon.example.org'):
+    return {'name': name, 'realmlist_path': 'realmlist.wtf', 'wow_exe_path': 'WoW.exe',
+            'server_address': server, 'portal_address': '', 'version': 'Vanilla (1.12.x)'}
+
+
+# A loaded store that is closed when the test ends
+def open_store(test, path, **kwargs):
+    store = ConfigStore(path, **kwargs).load()
+    test.addCleanup(store.close)
+    return store
+
+
+class TestConfigStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'config.json')
+
+    def write_snapshot(self, names):
+        with open(self.path, 'w') as f:
+            json.dump({'configurations': [make_config(n) for n in names]}, f, indent=4)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def names(self, store):
+        return [cfg['name'] for cfg in store['configurations']]
+
+    def test_imports_existing_config_json(self):
+        self.write_snapshot(['A', 'B', 'C'])
+        store = open_store(self, self.path)
+        self.assertEqual(self.names(store), ['A', 'B', 'C'])
+        self.assertEqual(store.index_of('C'), 2)
+        self.assertEqual(store.find('B')['name'], 'B')
+        self.assertIn('A', store)
+
+    def test_mutations_are_journaled_without_rewriting_snapshot(self):
+        self.write_snapshot(['A', 'B', 'C'])
+        snapshot_before = self.read(self.path)
+
+        store = open_store(self, self.path)
+        store.add(make_config('D'))
+        store.swap(0, 1)
+        store.replace(2, make_config('C2'))
+        store.delete(3)
+        store._close_journal()
+
+        self.assertEqual(self.read(self.path), snapshot_before)
+        with open(store.journal_path) as f:
+            self.assertEqual(len(f.readlines()), 4)
+
+        reloaded = open_store(self, self.path)
+        self.assertEqual(self.names(reloaded), ['B', 'A', 'C2'])
+        self.assertEqual(reloaded.index_of('A'), 1)
+        self.assertIsNone(reloaded.index_of('C'))
+
+    def test_compaction_folds_journal_into_snapshot(self):
+        self.write_snapshot(['A', 'B'])
+        store = open_store(self, self.path, compact_every=3)
+        store.swap(0, 1)
+        store.swap(0, 1)
+        store.swap(0, 1)
+
+        self.assertFalse(os.path.exists(store.journal_path))
+        with open(self.path) as f:
+            self.assertEqual([c['name'] for c in json.load(f)['configurations']], ['B', 'A'])
+
+    def test_close_compacts_pending_journal(self):
+        store = open_store(self, self.path)
+        store.add(make_config('A'))
+        store.close()
+        self.assertFalse(os.path.exists(store.journal_path))
+        self.assertEqual(self.names(open_store(self, self.path)), ['A'])
+
+    def test_duplicate_names_are_rejected_and_renamed_on_import(self):
+        self.write_snapshot(['A', 'A'])
+        store = open_store(self, self.path)
+        self.assertEqual(self.names(store), ['A', 'A (2)'])
+        with self.assertRaises(ValueError):
+            store.add(make_config('A'))
+        with self.assertRaises(ValueError):
+            store.replace(1, make_config('A'))
+
+    def test_torn_journal_line_is_skipped(self):
+        self.write_snapshot(['A'])
+        store = open_store(self, self.path)
+        store.add(make_config('B'))
+        store._close_journal()
+        with open(store.journal_path, 'a') as f:
+            f.write('{"op": "add", "config": {"na')
+
+        self.assertEqual(self.names(open_store(self, self.path)), ['A', 'B'])
+
+    def test_replay_falls_back_to_names_when_snapshot_changed(self):
+        self.write_snapshot(['A', 'B', 'C'])
+        store = open_store(self, self.path)
+        store.delete(2)
+        store._close_journal()
+        # Another tool prepended an entry to the snapshot, shifting every index
+        self.write_snapshot(['Z', 'A', 'B', 'C'])
+
+        self.assertEqual(self.names(open_store(self, self.path)), ['Z', 'A', 'B'])
+
+
+class TestConfigWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'config.json')
+
+    def test_write_snapshot_is_atomic(self):
+        write_snapshot(self.path, {'configurations': [make_config('A')]})
+        with patch('store.os.fsync', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                write_snapshot(self.path, {'configurations': [make_config('B')]})
+
+        # The old snapshot survives and no temp files are left behind
+        self.assertEqual(os.listdir(self.tmp.name), ['config.json'])
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)['configurations'][0]['name'], 'A')
+
+    def test_burst_of_mutations_is_coalesced_into_one_flush(self):
+        writer = ConfigWriter(delay=60, max_delay=60)
+        store = open_store(self, self.path, writer=writer)
+        store.add(make_config('A'))
+        store.add(make_config('B'))
+        for _ in range(10):
+            store.swap(0, 1)
+
+        # Nothing is written until the writer flushes
+        self.assertFalse(os.path.exists(store.journal_path))
+        writer.flush()
+        self.assertEqual(writer.requests, 12)
+        self.assertEqual(writer.coalesced, 11)
+        with open(store.journal_path) as f:
+            self.assertEqual(len(f.readlines()), 12)
+
+        store.close()
+        writer.stop()
+        self.assertEqual([c['name'] for c in open_store(self, self.path)['configurations']], ['A', 'B'])
+
+    def test_writer_flushes_in_background(self):
+        writer = ConfigWriter(delay=0.01, max_delay=0.05)
+        store = open_store(self, self.path, writer=writer)
+        store.add(make_config('A'))
+        for _ in range(200):
+            if os.path.exists(store.journal_path):
+                break
+            time.sleep(0.01)
+        store.close()
+        writer.stop()
+        self.assertEqual(open_store(self, self.path).index_of('A'), 0)
+
+    def test_close_compacts_after_writer_flushed(self):
+        writer = ConfigWriter(delay=0.01, max_delay=0.05)
+        self.addCleanup(writer.stop)
+        store = open_store(self, self.path, writer=writer)
+        store.add(make_config('A'))
+        writer.flush()
+        self.assertTrue(os.path.exists(store.journal_path))
+
+        # Nothing is queued any more, yet closing must still fold the journal into config.json
+        store.close()
+        self.assertFalse(os.path.exists(store.journal_path))
+        with open(self.path) as f:
+            self.assertEqual([c['name'] for c in json.load(f)['configurations']], ['A'])
+
+
+# Two stores on the same file stand in for two app instances (or the app and the CLI)
+class TestSharedConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'config.json')
+        write_snapshot(self.path, {'configurations': [make_config('A'), make_config('B')]})
+
+    def names(self, store):
+        return [cfg['name'] for cfg in store['configurations']]
+
+    def test_sync_applies_new_journal_records(self):
+        first, second = open_store(self, self.path), open_store(self, self.path)
+        second.add(make_config('C'))
+        second.replace(0, make_config('A', server='logon.new.example'))
+
+        with patch.object(first, '_load_from_disk', wraps=first._load_from_disk) as reload:
+            diff = first.sync()
+            reload.assert_not_called()
+        self.assertEqual([cfg['name'] for index, cfg in diff.added], ['C'])
+        self.assertEqual([(index, new['server_address']) for index, old, new in diff.changed],
+                         [(0, 'logon.new.example')])
+        self.assertEqual(self.names(first), ['A', 'B', 'C'])
+        self.assertFalse(first.sync())
+
+    def test_read_changes_leaves_store_alone_until_applied(self):
+        first, second = open_store(self, self.path), open_store(self, self.path)
+        second.add(make_config('C'))
+        second.delete(0)
+
+        changes = first.read_changes()
+        self.assertEqual(self.names(first), ['A', 'B'])
+        diff = first.apply_changes(changes)
+        self.assertEqual([cfg['name'] for index, cfg in diff.removed], ['A'])
+        self.assertEqual(self.names(first), ['B', 'C'])
+        self.assertFalse(first.apply_changes(first.read_changes()))
+
+    def test_changes_read_before_a_local_edit_are_not_applied(self):
+        first, second = open_store(self, self.path), open_store(self, self.path)
+        second.add(make_config('C'))
+        changes = first.read_changes()
+        # Edited and journaled here between the read and the merge
+        first.replace(0, make_config('A', server='logon.new.example'))
+
+        self.assertIsNone(first.apply_changes(changes))
+        self.assertEqual(self.names(first), ['A', 'B'])
+        first.sync()
+        self.assertEqual(self.names(first), ['A', 'B', 'C'])
+        self.assertEqual(first.find('A')['server_address'], 'logon.new.example')
+
+    def test_apply_changes_does_not_wait_for_a_blocked_write(self):
+        writer = ConfigWriter(delay=0, max_delay=0)
+        self.addCleanup(writer.stop)
+        first = open_store(self, self.path, writer=writer)
+        changes = first.read_changes()
+
+        # Another process holds the lock for a second, so the writer's flush is stuck behind it
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            with file_lock(first.lock_path):
+                locked.set()
+                release.wait(1.0)
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        self.addCleanup(holder.join)
+        locked.wait(5)
+        first.add(make_config('C'))
+        for _ in range(200):
+            if first._flush_lock.locked():
+                break
+            time.sleep(0.01)
+
+        started = time.monotonic()
+        self.assertIsNone(first.apply_changes(changes))
+        self.assertLess(time.monotonic() - started, 0.5)
+        release.set()
+        holder.join()
+        writer.flush()
+        self.assertFalse(first.sync())
+        self.assertEqual(self.names(first), ['A', 'B', 'C'])
+
+    def test_compaction_never_overwrites_external_changes(self):
+        first, second = open_store(self, self.path), open_store(self, self.path)
+        second.add(make_config('C'))
+        # first's snapshot doesn't know about C yet, so it must not be written
+        first.add(make_config('D'))
+        first.compact()
+        self.assertEqual(self.names(open_store(self, self.path)), ['A', 'B', 'C', 'D'])
+
+        diff = first.sync()
+        self.assertEqual([cfg['name'] for index, cfg in diff.added], ['C'])
+        self.assertEqual(self.names(first), ['A', 'B', 'C', 'D'])
+        # The held-back compaction ran once the external change was merged
+        self.assertFalse(os.path.exists(first.journal_path))
+        with open(self.path) as f:
+            self.assertEqual(len(json.load(f)['configurations']), 4)
+
+    def test_sync_after_snapshot_replaced_keeps_pending_edits(self):
+        writer = ConfigWriter(delay=60, max_delay=60)
+        first = open_store(self, self.path, writer=writer)
+        first.add(make_config('Mine'))  # queued, not yet written
+        second = open_store(self, self.path)
+        second.delete(0)
+        second.close()  # compacts: config.json is replaced
+
+        diff = first.sync()
+        self.assertEqual([cfg['name'] for index, cfg in diff.removed], ['A'])
+        self.assertEqual(self.names(first), ['B', 'Mine'])
+        first.close()
+        writer.stop()
+        self.assertEqual(self.names(open_store(self, self.path)), ['B', 'Mine'])
+
+    def test_reorder_is_journaled(self):
+        first, second = open_store(self, self.path), open_store(self, self.path)
+        second.add(make_config('C'))
+        # The snapshot can't be rewritten over C, so the new order must survive in the journal
+        first.reorder([make_config('B'), make_config('A')])
+        self.assertEqual(self.names(open_store(self, self.path)), ['B', 'A', 'C'])
+        first.sync()
+        self.assertEqual(self.names(first), ['B', 'A', 'C'])
+
+    def test_diff_configurations(self):
+        old = [make_config('A'), make_config('B'), make_config('C')]
+        diff = diff_configurations(old, [make_config('A', server='x'), make_config('C'), make_config('D')])
+        self.assertEqual([(i, cfg['name']) for i, cfg in diff.removed], [(1, 'B')])
+        self.assertEqual([i for i, old_cfg, new_cfg in diff.changed], [0])
+        self.assertEqual([(i, cfg['name']) for i, cfg in diff.added], [(2, 'D')])
+        self.assertFalse(diff.reordered)
+        self.assertTrue(diff_configurations(old, old[::-1]).reordered)
+
+    def test_file_lock_is_exclusive(self):
+        lock_path = self.path + '.lock'
+        events = []
+        with file_lock(lock_path):
+            thread = threading.Thread(target=lambda: (file_lock(lock_path).__enter__(), events.append('second')))
+            thread.start()
+            thread.join(0.2)
+            events.append('first released')
+        thread.join(5)
+        self.assertEqual(events, ['first released', 'second'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import core
+from supervisor import ClientSupervisor, sample_proc
+
+
+# Stand-in for the game client: a short-lived Python process with a known exit code
+def stub_launcher(seconds=0.3, exit_code=3):
+    def launch(cfg):
+        return subprocess.Popen([sys.executable, '-c', f'import time; time.sleep({seconds}); raise SystemExit({exit_code})'])
+    return launch
+
+
+def wait_until(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.02)
+
+
+class TestClientSupervisor(unittest.TestCase):
+
+    def test_tracks_pid_exit_code_and_lifetime(self):
+        supervisor = ClientSupervisor(launcher=stub_launcher(), poll_interval=0.05)
+        exited = []
+        supervisor.on_exit = exited.append
+        try:
+            client = supervisor.launch({'name': 'Stub'}).result(timeout=10)
+            self.assertIsNotNone(client.pid)
+            self.assertTrue(supervisor.running())
+
+            wait_until(lambda: exited)
+            tracked = supervisor.clients()[0]
+            self.assertEqual(tracked.exit_code, 3)
+            self.assertFalse(tracked.running)
+            self.assertGreaterEqual(tracked.lifetime, 0.2)
+            self.assertIn('exited (3)', tracked.describe())
+        finally:
+            supervisor.stop()
+
+    def test_launch_many_respects_concurrency_limit(self):
+        starts = []
+        active = [0]
+        peak = [0]
+        lock = threading.Lock()
+
+        def launcher(cfg):
+            with lock:
+                starts.append(time.monotonic())
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            process = stub_launcher(seconds=0.05, exit_code=0)(cfg)
+            with lock:
+                active[0] -= 1
+            return process
+
+        supervisor = ClientSupervisor(launcher=launcher, launch_concurrency=2, startup_grace=0.5, poll_interval=0.05)
+        try:
+            futures = supervisor.launch_many([{'name': f'Client {i}'} for i in range(4)])
+            clients = [future.result(timeout=10) for future in futures]
+        finally:
+            supervisor.stop()
+
+        self.assertEqual(len({client.pid for client in clients}), 4)
+        self.assertLessEqual(peak[0], 2)
+        # The third client waits for a startup slot to free up
+        starts.sort()
+        self.assertGreater(starts[2] - starts[0], 0.03)
+
+    def test_launch_errors_are_reported_not_raised(self):
+        def launcher(cfg):
+            raise core.LaunchError("WoW.exe path is invalid or not selected.")
+
+        supervisor = ClientSupervisor(launcher=launcher)
+        errors = []
+        supervisor.on_error = errors.append
+        try:
+            client = supervisor.launch({'name': 'Broken', 'wow_exe_path': 'missing.exe'}).result(timeout=10)
+        finally:
+            supervisor.stop()
+
+        self.assertEqual(client.error, "WoW.exe path is invalid or not selected.")
+        self.assertEqual(errors[0].name, 'Broken')
+
+    @unittest.skipUnless(os.path.exists('/proc/self/stat'), "needs /proc")
+    def test_sample_proc(self):
+        cpu_seconds, rss_bytes = sample_proc(os.getpid())
+        self.assertGreaterEqual(cpu_seconds, 0)
+        self.assertGreater(rss_bytes, 0)
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), "launches through wine on Linux")
+    def test_launch_configuration_with_stub_wine(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            wine = os.path.join(tmp, 'wine')
+            with open(wine, 'w') as f:
+                f.write('#!/bin/sh\nexit 7\n')
+            os.chmod(wine, 0o755)
+            exe = os.path.join(tmp, 'WoW.exe')
+            realmlist = os.path.join(tmp, 'realmlist.wtf')
+            open(exe, 'w').close()
+            open(realmlist, 'w').close()
+            cfg = {'name': 'Wine', 'wow_exe_path': exe, 'realmlist_path': realmlist,
+                   'server_address': 'logon.example.org', 'portal_address': '', 'version': ''}
+
+            supervisor = ClientSupervisor(poll_interval=0.05)
+            try:
+                with patch.dict(os.environ, {'PATH': tmp + os.pathsep + os.environ['PATH']}):
+                    supervisor.launch(cfg).result(timeout=10)
+                wait_until(lambda: not supervisor.running())
+            finally:
+                supervisor.stop()
+            self.assertEqual(supervisor.clients()[0].exit_code, 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import queue
+import threading
+import unittest
+from concurrent.futures import Future
+from unittest.mock import patch
+
+from metrics import metrics
+from tasks import LoopMonitor, TaskRunner
+
+
+# Stands in for post_to_ui/process_ui_queue: posted calls run only when the test pumps the queue
+class FakeUI:
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = threading.current_thread()
+
+    def post(self, func, *args):
+        self.queue.put((func, args))
+
+    def pump_until(self, condition, timeout=2.0):
+        while not condition():
+            func, args = self.queue.get(timeout=timeout)
+            func(*args)
+
+
+class TestTaskRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.ui = FakeUI()
+        self.busy_states = []
+        self.errors = []
+        self.runner = TaskRunner(self.ui.post, on_busy=self.busy_states.append,
+                                 on_error=lambda description, e: self.errors.append((description, str(e))))
+        self.addCleanup(self.runner.shutdown)
+        patcher = patch('tasks.logging')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_result_delivered_on_ui_thread(self):
+        results = []
+        worker_threads = []
+
+        def work(x):
+            worker_threads.append(threading.current_thread())
+            return x * 2
+
+        self.runner.submit("Doubling", work, 21,
+                           on_success=lambda result: results.append((result, threading.current_thread())))
+        self.ui.pump_until(lambda: results)
+
+        self.assertEqual(results, [(42, self.ui.thread)])
+        self.assertIsNot(worker_threads[0], self.ui.thread)
+
+    def test_errors_go_to_the_default_handler(self):
+        def fail():
+            raise OSError("disk asleep")
+
+        self.runner.submit("Saving", fail)
+        self.ui.pump_until(lambda: self.errors)
+        self.assertEqual(self.errors, [("Saving", "disk asleep")])
+
+    def test_specific_error_handler_wins(self):
+        handled = []
+
+        def fail():
+            raise ValueError("bad")
+
+        self.runner.submit("Parsing", fail, on_error=lambda description, e: handled.append(description))
+        self.ui.pump_until(lambda: handled)
+        self.assertEqual(handled, ["Parsing"])
+        self.assertEqual(self.errors, [])
+
+    def test_busy_states(self):
+        release = threading.Event()
+        done = []
+        self.runner.submit("Writing realmlist.wtf", release.wait, on_success=done.append)
+        self.assertEqual(self.runner.busy, ["Writing realmlist.wtf"])
+
+        release.set()
+        self.ui.pump_until(lambda: done and self.busy_states and self.busy_states[-1] == [])
+        self.assertEqual(self.busy_states[0], ["Writing realmlist.wtf"])
+        self.assertEqual(self.runner.busy, [])
+
+    def test_track_external_future(self):
+        future = Future()
+        results = []
+        self.runner.track("Launching Test", future, on_success=results.append)
+        self.assertEqual(self.runner.busy, ["Launching Test"])
+        future.set_result("client")
+        self.ui.pump_until(lambda: results)
+        self.assertEqual(results, ["client"])
+
+    def test_callback_errors_are_contained(self):
+        def broken(result):
+            raise RuntimeError("widget gone")
+
+        self.runner.submit("Probing", lambda: 1, on_success=broken)
+        self.ui.pump_until(lambda: self.runner.busy == [] and self.busy_states[-1] == [])
+
+
+class TestLoopMonitor(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_records_lag_and_counts_stalls(self):
+        now = [0.0]
+        scheduled = []
+        monitor = LoopMonitor(lambda ms, func: scheduled.append(func), interval_ms=100, threshold_ms=250,
+                              clock=lambda: now[0]).start()
+
+        now[0] = 0.105  # on time
+        scheduled.pop()()
+        now[0] += 0.1 + 0.5  # the loop was blocked for half a second
+        with patch('tasks.logging') as log:
+            scheduled.pop()()
+
+        self.assertEqual(monitor.stalls, 1)
+        log.warning.assert_called_once()
+        snapshot = metrics.snapshot()['ui.loop_lag']
+        self.assertEqual(snapshot['count'], 2)
+        self.assertGreaterEqual(snapshot['max_ms'], 499)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import watcher
+from store import atomic_write
+from watcher import FileWatcher
+
+
+class TestFileWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'config.json')
+        with open(self.path, 'w') as f:
+            f.write('{}')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check_reports_changes(self, **options):
+        changed = threading.Event()
+        file_watcher = FileWatcher([self.path], changed.set, poll_interval=0.02, settle_delay=0.02, **options).start()
+        try:
+            # Unrelated files in the same directory are ignored
+            with open(os.path.join(self.tmp.name, 'other.txt'), 'w') as f:
+                f.write('x')
+            self.assertFalse(changed.wait(0.3))
+
+            atomic_write(self.path, '{"configurations": []}')
+            self.assertTrue(changed.wait(5))
+        finally:
+            file_watcher.stop()
+        return file_watcher
+
+    @unittest.skipUnless(watcher._load_inotify() is not None, "inotify not available")
+    def test_inotify(self):
+        self.assertEqual(self.check_reports_changes().mode, 'inotify')
+
+    def test_polling_fallback(self):
+        self.assertEqual(self.check_reports_changes(use_inotify=False).mode, 'polling')
+
+
+if __name__ == '__main__':
+    unittest.main()
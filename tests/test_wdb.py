@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import core
+import wdb
+
+
+class TestClientCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.client = self.tmp.name
+        self.exe = os.path.join(self.client, 'WoW.exe')
+        self.realmlist = os.path.join(self.client, 'realmlist.wtf')
+        open(self.exe, 'w').close()
+        open(self.realmlist, 'w').close()
+        self.cache = os.path.join(self.client, 'Cache', 'WDB')
+        patcher = patch('wdb.logging')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def cfg(self, server, **extra):
+        return dict({'name': 'Test', 'wow_exe_path': self.exe, 'realmlist_path': self.realmlist,
+                     'server_address': server, 'portal_address': '', 'version': ''}, **extra)
+
+    def fill_cache(self, marker, files=3, size=1000):
+        os.makedirs(os.path.join(self.cache, 'enUS'), exist_ok=True)
+        for i in range(files):
+            with open(os.path.join(self.cache, 'enUS', f'{marker}{i}.wdb'), 'wb') as f:
+                f.write(b'x' * size)
+
+    def trash(self):
+        return [name for name in os.listdir(os.path.dirname(self.cache)) if name.startswith(wdb.TRASH_PREFIX)]
+
+    def test_same_server_keeps_cache(self):
+        self.fill_cache('a')
+        self.assertEqual(wdb.switch_cache(self.cfg('a.example.org')), [])
+        self.assertEqual(wdb.switch_cache(self.cfg('A.example.org ')), [])
+        self.assertTrue(os.path.isdir(self.cache))
+        self.assertEqual(wdb.last_server(self.client), 'a.example.org')
+
+    def test_switch_purges_by_rename_then_delete(self):
+        wdb.switch_cache(self.cfg('a.example.org'))
+        self.fill_cache('a', files=3, size=1000)
+
+        trash = wdb.switch_cache(self.cfg('b.example.org'))
+        self.assertFalse(os.path.exists(self.cache))
+        self.assertEqual(len(trash), 1)
+        self.assertEqual(wdb.last_server(self.client), 'b.example.org')
+
+        result = wdb.remove_trees(trash)
+        self.assertEqual((result.files, result.bytes, result.error), (3, 3000, None))
+        self.assertEqual(self.trash(), [])
+
+    def test_previous_server_from_realmlist(self):
+        self.fill_cache('a')
+        self.assertEqual(wdb.switch_cache(self.cfg('a.example.org'), previous='a.example.org'), [])
+        os.remove(os.path.join(self.client, wdb.MARKER_FILE))
+        self.assertEqual(len(wdb.switch_cache(self.cfg('b.example.org'), previous='a.example.org')), 1)
+
+    def test_unknown_previous_server_keeps_cache(self):
+        self.fill_cache('a')
+        self.assertEqual(wdb.switch_cache(self.cfg('b.example.org')), [])
+        self.assertTrue(os.path.isdir(self.cache))
+
+    def test_rotate_keeps_one_cache_per_server(self):
+        wdb.switch_cache(self.cfg('a.example.org', wdb_policy='rotate'))
+        self.fill_cache('a')
+        self.assertEqual(wdb.switch_cache(self.cfg('b.example.org', wdb_policy='rotate')), [])
+        self.assertFalse(os.path.exists(self.cache))
+        self.fill_cache('b')
+
+        wdb.switch_cache(self.cfg('a.example.org', wdb_policy='rotate'))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.cache, 'enUS'))), ['a0.wdb', 'a1.wdb', 'a2.wdb'])
+        self.assertTrue(os.path.isdir(os.path.join(self.client, 'Cache', 'WDB-b.example.org')))
+
+    def test_leftovers_are_picked_up(self):
+        leftover = os.path.join(self.client, 'Cache', wdb.TRASH_PREFIX + '1')
+        os.makedirs(leftover)
+        self.assertEqual(wdb.switch_cache(self.cfg('a.example.org')), [leftover])
+
+    def test_vanilla_cache_location(self):
+        os.makedirs(os.path.join(self.client, 'WDB'))
+        self.assertEqual(wdb.cache_dir(self.client), os.path.join(self.client, 'WDB'))
+
+    def test_launch_moves_cache_aside_and_purges_in_background(self):
+        core.write_realmlist(self.realmlist, 'a.example.org', '', '')
+        self.fill_cache('a', files=2, size=10)
+        purged = []
+
+        def purge(paths, on_done):
+            on_done(wdb.remove_trees(paths))
+
+        with patch('core.spawn_wow') as spawn, patch('wdb.purge_in_background', side_effect=purge), \
+                patch('fingerprint.detect_build', return_value=None), \
+                patch('core.cache_purge_handler', lambda cfg, result: purged.append((cfg['name'], result))):
+            core.launch_configuration(self.cfg('b.example.org'))
+
+        spawn.assert_called_once()
+        self.assertFalse(os.path.exists(self.cache))
+        name, result = purged[0]
+        self.assertEqual((name, result.files, result.bytes), ('Test', 2, 20))
+        self.assertEqual(core.read_realmlist(self.realmlist)['realmlist'], 'b.example.org')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import core
+import wine
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), "Wine sessions are only used on Linux")
+class TestWineSession(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.calls = os.path.join(self.tmp.name, 'calls.log')
+        bin_dir = os.path.join(self.tmp.name, 'bin')
+        os.mkdir(bin_dir)
+        # Fake wine/wineserver that record how they were called and with which prefix
+        for tool in ('wine', 'wineserver'):
+            path = os.path.join(bin_dir, tool)
+            with open(path, 'w') as f:
+                f.write(f'#!/bin/sh\necho "{tool} $* prefix=$WINEPREFIX extra=$EXTRA_VAR" >> "{self.calls}"\n')
+            os.chmod(path, 0o755)
+        self.env = patch.dict(os.environ, {'PATH': bin_dir + os.pathsep + os.environ['PATH']})
+        self.env.start()
+        self.sessions = wine.sessions
+        wine.sessions = wine.WineSessionManager(persist_seconds=600)
+
+        self.exe = os.path.join(self.tmp.name, 'WoW.exe')
+        self.realmlist = os.path.join(self.tmp.name, 'realmlist.wtf')
+        open(self.exe, 'w').close()
+        open(self.realmlist, 'w').close()
+
+    def tearDown(self):
+        wine.sessions = self.sessions
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def read_calls(self):
+        if not os.path.exists(self.calls):
+            return []
+        with open(self.calls) as f:
+            return f.read().splitlines()
+
+    def make_config(self, name, prefix, **extra):
+        cfg = {'name': name, 'wow_exe_path': self.exe, 'realmlist_path': self.realmlist,
+               'server_address': 'logon.example.org', 'portal_address': '', 'version': '', 'wine_prefix': prefix}
+        cfg.update(extra)
+        return cfg
+
+    def test_warm_all_starts_one_server_per_opted_in_prefix(self):
+        prefix_a = os.path.join(self.tmp.name, 'a')
+        prefix_b = os.path.join(self.tmp.name, 'b')
+        configurations = [
+            self.make_config('A1', prefix_a, wine_persistent=True),
+            self.make_config('A2', prefix_a, wine_persistent=True),
+            self.make_config('B', prefix_b),
+        ]
+        for thread in wine.sessions.warm_all(configurations):
+            thread.join(10)
+
+        self.assertEqual(self.read_calls(), [f'wineserver -p600 prefix={prefix_a} extra='])
+
+    def test_launch_reuses_warm_session_with_per_configuration_env(self):
+        prefix = os.path.join(self.tmp.name, 'prefix')
+        cfg = self.make_config('A', prefix, wine_persistent=True, wine_env={'EXTRA_VAR': '1'})
+
+        core.launch_configuration(cfg).wait(10)
+        core.launch_configuration(cfg).wait(10)
+
+        calls = self.read_calls()
+        self.assertEqual(calls.count(f'wineserver -p600 prefix={prefix} extra=1'), 1)
+        self.assertEqual(calls.count(f'wine {self.exe} prefix={prefix} extra=1'), 2)
+
+    def test_expired_session_is_rewarmed(self):
+        cfg = self.make_config('A', os.path.join(self.tmp.name, 'prefix'), wine_persistent=True)
+        session = wine.sessions.ensure(cfg)
+        session.last_used -= 10000
+        wine.sessions.ensure(cfg)
+        self.assertEqual(len([call for call in self.read_calls() if call.startswith('wineserver')]), 2)
+
+
+class TestWineEnv(unittest.TestCase):
+
+    def test_parse_and_format_roundtrip(self):
+        env = wine.parse_wine_env("WINEDEBUG=-all DXVK_HUD='fps, memory'")
+        self.assertEqual(env, {'WINEDEBUG': '-all', 'DXVK_HUD': 'fps, memory'})
+        self.assertEqual(wine.parse_wine_env(wine.format_wine_env(env)), env)
+        with self.assertRaises(ValueError):
+            wine.parse_wine_env('NOT_AN_ASSIGNMENT')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+
+DEFAULT_POLL_INTERVAL = 1.0
+# Events arriving within this window are reported once
+DEFAULT_SETTLE_DELAY = 0.1
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_inotify():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        return libc if hasattr(libc, 'inotify_init1') else None
+    except OSError:
+        return None
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+# Calls `on_change()` from a background thread whenever one of `paths` is written, replaced or removed.
+#
+# Uses inotify on the files' directory where available (atomic replacement shows up as IN_MOVED_TO),
+# and otherwise polls the files' (inode, size, mtime) every `poll_interval` seconds. Changes made by
+# this process are reported too; the callback is expected to check whether anything really changed.
+class FileWatcher:
+    def __init__(self, paths, on_change, poll_interval=DEFAULT_POLL_INTERVAL, settle_delay=DEFAULT_SETTLE_DELAY,
+                 use_inotify=True):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.settle_delay = settle_delay
+        self._stopped = threading.Event()
+        self._libc = _load_inotify() if use_inotify else None
+        self._wake_read, self._wake_write = os.pipe() if self._libc is not None else (None, None)
+        self.mode = 'inotify' if self._libc is not None else 'polling'
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._wake_write is not None:
+            os.write(self._wake_write, b'x')
+        self._thread.join()
+        for fd in (self._wake_read, self._wake_write):
+            if fd is not None:
+                os.close(fd)
+        self._wake_read = self._wake_write = None
+
+    def _notify(self):
+        try:
+            self.on_change()
+        except Exception as e:
+            logging.error(f"Error handling a change to {', '.join(self.paths)}: {e}")
+
+    def _run(self):
+        if self._libc is not None:
+            try:
+                self._run_inotify()
+                return
+            except OSError as e:
+                logging.warning(f"inotify unavailable ({e}); polling {', '.join(self.paths)} instead.")
+                self.mode = 'polling'
+        self._run_polling()
+
+    def _run_polling(self):
+        signatures = {path: _signature(path) for path in self.paths}
+        while not self._stopped.wait(self.poll_interval):
+            current = {path: _signature(path) for path in self.paths}
+            if current != signatures:
+                signatures = current
+                self._notify()
+
+    def _run_inotify(self):
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        try:
+            names = {}
+            for directory in {os.path.dirname(path) for path in self.paths}:
+                mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+                wd = self._libc.inotify_add_watch(fd, os.fsencode(directory), mask)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+                names[wd] = {os.fsencode(os.path.basename(path)) for path in self.paths
+                             if os.path.dirname(path) == directory}
+
+            while not self._stopped.is_set():
+                readable, _, _ = select.select([fd, self._wake_read], [], [])
+                if self._wake_read in readable or not self._relevant(fd, names):
+                    continue
+                # Let a burst (temp file, rename, journal append) settle, then report it once
+                while select.select([fd, self._wake_read], [], [], self.settle_delay)[0]:
+                    if self._stopped.is_set():
+                        return
+                    self._relevant(fd, names)
+                self._notify()
+        finally:
+            os.close(fd)
+
+    # Drain pending events; True if any concerned one of the watched files
+    def _relevant(self, fd, names):
+        try:
+            data = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        relevant = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + length
+            if name in names.get(wd, ()):
+                relevant = True
+        return relevant
@@ -0,0 +1,169 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from metrics import metrics
+from store import atomic_write
+
+# Where clients keep their WDB cache, relative to WoW.exe (3.x+ first, then 1.x/2.x)
+CACHE_DIRS = (os.path.join('Cache', 'WDB'), 'WDB')
+# What to do with the cache when a client is launched for a different server than last time:
+# delete it, keep one cache per server and swap them, or leave it alone
+WDB_POLICIES = ('purge', 'rotate', 'keep')
+DEFAULT_POLICY = 'purge'
+# Records the server a client was last launched for, next to WoW.exe
+MARKER_FILE = 'realmlist_manager.server'
+# Caches moved aside for deletion; leftovers from an interrupted delete are removed on the next switch
+TRASH_PREFIX = 'WDB.stale-'
+
+
+@dataclass
+class PurgeResult:
+    path: str
+    files: int = 0
+    bytes: int = 0
+    elapsed_ms: float = 0.0
+    error: Optional[str] = None
+
+    def describe(self):
+        return f"reclaimed {self.bytes / (1024 * 1024):.1f} MB in {self.files} file(s) from {self.path}"
+
+
+def _server_key(server_address):
+    return (server_address or '').strip().lower()
+
+
+def _slug(server_address):
+    return re.sub(r'[^a-z0-9.-]+', '_', _server_key(server_address)) or 'unknown'
+
+
+def client_dir(cfg):
+    return os.path.dirname(os.path.abspath(cfg['wow_exe_path']))
+
+
+# The client's WDB directory: the existing one, or where this client version would create it
+def cache_dir(directory):
+    for relative in CACHE_DIRS:
+        path = os.path.join(directory, relative)
+        if os.path.isdir(path):
+            return path
+    if os.path.isdir(os.path.join(directory, 'Cache')):
+        return os.path.join(directory, CACHE_DIRS[0])
+    return os.path.join(directory, CACHE_DIRS[1])
+
+
+# Server the client in `directory` was last launched for, or None if it is unknown
+def last_server(directory):
+    try:
+        with open(os.path.join(directory, MARKER_FILE), 'r', errors='replace') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _move_to_trash(path):
+    trash = os.path.join(os.path.dirname(path), f"{TRASH_PREFIX}{time.time_ns()}")
+    os.rename(path, trash)
+    return trash
+
+
+# Make the client's cache fit `cfg['server_address']` before it starts. Only renames happen here
+# (one metadata operation each, however large the cache), so the launch doesn't wait on deletion.
+# `previous` is the server the client last ran against (e.g. from realmlist.wtf) when no marker
+# exists yet. Returns the directories to delete with remove_trees().
+def switch_cache(cfg, previous=None, policy=None):
+    policy = policy or cfg.get('wdb_policy') or DEFAULT_POLICY
+    directory = client_dir(cfg)
+    server = cfg.get('server_address', '')
+    recorded = last_server(directory)
+    previous = recorded or previous
+    if policy not in WDB_POLICIES:
+        logging.warning(f"Unknown WDB policy '{policy}' for '{cfg['name']}'; leaving the cache alone.")
+        policy = 'keep'
+
+    cache = cache_dir(directory)
+    parent = os.path.dirname(cache)
+    trash = [os.path.join(parent, name) for name in _list(parent) if name.startswith(TRASH_PREFIX)]
+    if policy != 'keep' and previous is not None and _server_key(previous) != _server_key(server):
+        if policy == 'rotate':
+            # Park this server's cache under its name and bring back the one kept for the new server
+            parked = os.path.join(parent, f"WDB-{_slug(previous)}")
+            if os.path.isdir(cache):
+                if os.path.isdir(parked):
+                    trash.append(_move_to_trash(parked))
+                os.rename(cache, parked)
+            kept = os.path.join(parent, f"WDB-{_slug(server)}")
+            if os.path.isdir(kept):
+                os.rename(kept, cache)
+            logging.info(f"Rotated the WDB cache of '{cfg['name']}' from {previous} to {server}.")
+        elif os.path.isdir(cache):
+            trash.append(_move_to_trash(cache))
+            logging.info(f"'{cfg['name']}' switches from {previous} to {server}; purging {cache}.")
+
+    if _server_key(recorded) != _server_key(server):
+        atomic_write(os.path.join(directory, MARKER_FILE), server + '\n')
+    return trash
+
+
+# Move the client's cache aside whichever server it belongs to (e.g. to purge it by hand)
+def discard_cache(cfg):
+    cache = cache_dir(client_dir(cfg))
+    parent = os.path.dirname(cache)
+    trash = [os.path.join(parent, name) for name in _list(parent) if name.startswith(TRASH_PREFIX)]
+    if os.path.isdir(cache):
+        trash.append(_move_to_trash(cache))
+    return trash
+
+
+def _list(directory):
+    try:
+        return os.listdir(directory)
+    except OSError:
+        return []
+
+
+# Another purge may be deleting the same leftovers
+def _ignore_missing(function, path, exc_info):
+    if not issubclass(exc_info[0], FileNotFoundError):
+        raise exc_info[1]
+
+
+# Delete directories moved aside by switch_cache(), counting what was reclaimed
+def remove_trees(paths):
+    started = time.perf_counter()
+    result = PurgeResult(', '.join(paths))
+    for path in paths:
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    result.bytes += os.lstat(os.path.join(root, name)).st_size
+                    result.files += 1
+                except OSError:
+                    pass
+        try:
+            shutil.rmtree(path, onerror=_ignore_missing)
+        except OSError as e:
+            result.error = str(e)
+            logging.warning(f"Could not delete {path}: {e}")
+    result.elapsed_ms = (time.perf_counter() - started) * 1000.0
+    metrics.observe('cache.purge', result.elapsed_ms)
+    logging.info(f"WDB cache purge {result.describe()} in {result.elapsed_ms:.0f} ms.")
+    return result
+
+
+# Delete `paths` on a daemon thread; `on_done(PurgeResult)` is called from that thread. An exit
+# before it finishes only leaves trash behind, which the next switch_cache() picks up again.
+def purge_in_background(paths, on_done=None):
+    def run():
+        result = remove_trees(paths)
+        if on_done is not None:
+            on_done(result)
+
+    thread = threading.Thread(target=run, name="wdb-purge", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,113 @@
+import logging
+import os
+import shlex
+import subprocess
+import threading
+import time
+
+# How long wineserver stays up after its last client exits (`wineserver -p<seconds>`)
+DEFAULT_PERSIST_SECONDS = 900
+DEFAULT_PREFIX = '~/.wine'
+
+
+# WINEPREFIX for a configuration (falls back to the environment, then wine's default)
+def wine_prefix(cfg):
+    prefix = cfg.get('wine_prefix') or os.environ.get('WINEPREFIX') or DEFAULT_PREFIX
+    return os.path.abspath(os.path.expanduser(prefix))
+
+
+# Parse "KEY=VALUE KEY2='with spaces'" into a dict
+def parse_wine_env(text):
+    env = {}
+    for item in shlex.split(text or ''):
+        key, sep, value = item.partition('=')
+        if not sep or not key:
+            raise ValueError(f"Expected KEY=VALUE, got '{item}'")
+        env[key] = value
+    return env
+
+
+def format_wine_env(env):
+    return ' '.join(f"{key}={shlex.quote(value)}" for key, value in (env or {}).items())
+
+
+# Environment a configuration's client runs with: the app's environment plus its prefix and overrides
+def wine_environment(cfg):
+    env = dict(os.environ)
+    env.update(cfg.get('wine_env') or {})
+    env['WINEPREFIX'] = wine_prefix(cfg)
+    return env
+
+
+# A wineserver kept running for one WINEPREFIX so launches skip the server/prefix startup cost
+class WineSession:
+    def __init__(self, prefix, env, persist_seconds=DEFAULT_PERSIST_SECONDS):
+        self.prefix = prefix
+        self.env = env
+        self.persist_seconds = persist_seconds
+        self.warmed_at = None
+        self.last_used = None
+        self._lock = threading.Lock()
+
+    # Start (or re-arm) the persistent wineserver. If one is already running for the prefix this
+    # returns almost immediately, so it is safe to call whenever the session might have expired.
+    def warm(self):
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                subprocess.run(['wineserver', f'-p{self.persist_seconds}'], env=self.env, timeout=60,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except (OSError, subprocess.SubprocessError) as e:
+                logging.warning(f"Could not start wineserver for {self.prefix}: {e}")
+                return False
+            self.warmed_at = self.last_used = time.monotonic()
+            logging.info(f"wineserver for {self.prefix} warm in {(time.perf_counter() - started) * 1000.0:.0f} ms.")
+            return True
+
+    # The server exits `persist_seconds` after its last client; re-warm if it may have done so
+    def expired(self):
+        return self.last_used is None or time.monotonic() - self.last_used > self.persist_seconds * 0.9
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+
+# One WineSession per WINEPREFIX, for configurations that opt in with 'wine_persistent'
+class WineSessionManager:
+    def __init__(self, persist_seconds=DEFAULT_PERSIST_SECONDS):
+        self.persist_seconds = persist_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session_for(self, cfg):
+        prefix = wine_prefix(cfg)
+        with self._lock:
+            session = self._sessions.get(prefix)
+            if session is None:
+                session = WineSession(prefix, wine_environment(cfg), self.persist_seconds)
+                self._sessions[prefix] = session
+            return session
+
+    # Warm every opted-in prefix in the background (called when the app starts)
+    def warm_all(self, configurations):
+        prefixes = {}
+        for cfg in configurations:
+            if cfg.get('wine_persistent'):
+                prefixes.setdefault(wine_prefix(cfg), cfg)
+        threads = []
+        for cfg in prefixes.values():
+            thread = threading.Thread(target=self.session_for(cfg).warm, name="wine-warm", daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    # Make sure the session for `cfg` is up before a launch
+    def ensure(self, cfg):
+        session = self.session_for(cfg)
+        if session.expired():
+            session.warm()
+        session.touch()
+        return session
+
+
+sessions = WineSessionManager()